@@ -6,12 +6,16 @@ from flask_jwt_extended import JWTManager
 from datetime import timedelta
 
 from db import init_db
-from routes.jobs import jobs_bp
+from routes.jobs import jobs_bp, sweep_stale_extractions, JOB_EXTRACTION_SWEEP_SECONDS
 from routes.cvs import cvs_bp
 from routes.matchings import match_bp
 from routes.dashboard import dashboard_bp
 from routes.auth import auth_bp 
 from extensions import blacklist  
+from services.llm_client import limiter_stats
+from services import background
+from services.blob_store import collect_orphan_blobs, BLOB_GC_SWEEP_SECONDS
+from services.scoring import ensure_input_hashes
 
 
 
@@ -39,11 +43,18 @@ def create_app():
     app.register_blueprint(match_bp, url_prefix="/api/matchings")
     app.register_blueprint(dashboard_bp, url_prefix="/api/dashboard")
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
+
+    # Job extractions lost by a restart (of this or another process) are resubmitted
+    background.every(JOB_EXTRACTION_SWEEP_SECONDS, sweep_stale_extractions)
+    # Blobs released by deleted CVs or failed uploads, once past their grace period
+    background.every(BLOB_GC_SWEEP_SECONDS, collect_orphan_blobs)
+    # Input hashes of jobs and CVs extracted before they were stored
+    background.submit(ensure_input_hashes)
     
 
     @app.get("/api/health")
     def health():
-        return jsonify({"status": "ok"})
+        return jsonify({"status": "ok", "llm": limiter_stats()})
 
     return app
 
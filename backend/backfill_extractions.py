@@ -0,0 +1,69 @@
+"""
+Re-extract jobs and CVs whose extraction was made with an older prompt
+version or another model (see PROMPT_VERSION in services/job_extraction.py
+and services/cv_extraction.py), from their stored text:
+
+    python backfill_extractions.py                 # jobs, then CVs
+    python backfill_extractions.py --kind cvs --rate 60
+    python backfill_extractions.py --status        # what is left, last run's progress
+
+Calls are paced (--rate per minute) and run in the bulk class of the LLM
+budget shared with the API, which keeps room for interactive calls. Scores
+computed from a changed extraction are flagged stale and recomputed by the
+next scoring run. Interrupting is safe: the same command resumes. A running
+API server picks the new CV fields up in its talent pool index on its next start.
+"""
+import argparse
+import json
+import sys
+
+from dotenv import load_dotenv
+
+from db import init_db
+from services.extraction_backfill import (
+    KINDS, BACKFILL_BATCH_SIZE, BACKFILL_RATE_PER_MINUTE, BACKFILL_CONCURRENCY, backfill_status, run_backfill
+)
+
+
+def print_run(run):
+    c = run["counts"]
+    print(
+        f"{run['_id']} -> {run['target']}: updated {c['updated']}  unchanged {c['unchanged']}  "
+        f"conflicts {c['conflict']}  failed {c['failed']}",
+        file=sys.stderr
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-extract outdated jobs and CVs")
+    parser.add_argument("--kind", choices=KINDS, action="append", help="default: both")
+    parser.add_argument("--status", action="store_true", help="only print what is left to do")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=BACKFILL_RATE_PER_MINUTE, help="documents per minute")
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    parser.add_argument("--limit", type=int, help="stop after this many documents")
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = init_db()
+    if args.status:
+        print(json.dumps(backfill_status(db), default=str, indent=2))
+        return
+
+    try:
+        runs = run_backfill(
+            db, args.kind or KINDS,
+            batch_size=args.batch_size,
+            rate_per_minute=args.rate,
+            concurrency=args.concurrency,
+            limit=args.limit,
+            on_batch=print_run,
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted: run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    print(json.dumps(runs, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Measure MongoDB time per 1,000 CVs for ingestion and score persistence,
+one round trip per document vs the WriteBatcher.
+
+    cd backend
+    python -m benchmarks.bench_bulk_writes              # 1,000 synthetic CVs
+    python -m benchmarks.bench_bulk_writes -n 5000
+
+Runs against MONGODB_URI in a scratch database (BENCH_DB_NAME, default
+"cv_ranker_bench") that is dropped at the end.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from dotenv import load_dotenv  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+from services.write_batcher import WriteBatcher  # noqa: E402
+
+
+def make_cv(i, job_id):
+    now = datetime.utcnow()
+    return {
+        "job_id": job_id,
+        "created_at": now,
+        "updated_at": now,
+        "text": "Experienced engineer. " * 200,
+        "extracted": {
+            "name": f"Candidate {i}",
+            "email": f"candidate{i}@example.com",
+            "education": ["Master's in Computer Science"],
+            "experiences": ["5 years backend development"],
+            "tech_skills": ["python", "mongodb", "docker"],
+            "soft_skills": ["communication"],
+        },
+        "extraction": {"status": "succeeded", "method": "llm"},
+        "filename": f"cv_{i}.pdf",
+        "file_hash": f"{i:064x}",
+    }
+
+
+def score_update(i):
+    return {"$set": {
+        "score": 0.5,
+        "subscores": {k: {"score": 0.5, "short_justification": None}
+                      for k in ("education", "experience", "tech_skills", "soft_skills")},
+        "scoring": {"status": "succeeded", "key": f"{i:064x}", "scored_at": datetime.utcnow()},
+    }}
+
+
+def per_thousand(seconds, n):
+    return round(seconds * 1000 / n * 1000, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=1000, help="number of CVs")
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    db_name = os.getenv("BENCH_DB_NAME", "cv_ranker_bench")
+    db = client[db_name]
+    client.drop_database(db_name)
+    job_id = ObjectId()
+
+    try:
+        # Ingestion: insert_one + find_one read-back per file (previous upload path)
+        start = time.perf_counter()
+        ids = []
+        for i in range(args.n):
+            res = db.cvs.insert_one(make_cv(i, job_id))
+            db.cvs.find_one({"_id": res.inserted_id})
+            ids.append(res.inserted_id)
+        insert_single = time.perf_counter() - start
+
+        # Scores: update_one per CV
+        start = time.perf_counter()
+        for i, cv_id in enumerate(ids):
+            db.cvs.update_one({"_id": cv_id}, score_update(i))
+        update_single = time.perf_counter() - start
+
+        db.cvs.drop()
+
+        with WriteBatcher(db) as writes:
+            start = time.perf_counter()
+            results = [writes.insert("cvs", make_cv(i, job_id)) for i in range(args.n)]
+            writes.flush()
+            insert_batched = time.perf_counter() - start
+            insert_trips = writes.round_trips
+
+            start = time.perf_counter()
+            for i, r in enumerate(results):
+                writes.update("cvs", {"_id": r.doc["_id"]}, score_update(i))
+            writes.flush()
+            update_batched = time.perf_counter() - start
+            update_trips = writes.round_trips - insert_trips
+
+        failed = sum(1 for r in results if not r.ok)
+        print(f"{args.n} CVs, DB ms per 1,000 CVs")
+        print(f"  ingestion  one-by-one: {per_thousand(insert_single, args.n):>9} ms  ({2 * args.n} round trips)")
+        print(f"  ingestion  batched:    {per_thousand(insert_batched, args.n):>9} ms  ({insert_trips} round trips, {failed} failed)")
+        print(f"  scores     one-by-one: {per_thousand(update_single, args.n):>9} ms  ({args.n} round trips)")
+        print(f"  scores     batched:    {per_thousand(update_batched, args.n):>9} ms  ({update_trips} round trips)")
+    finally:
+        client.drop_database(db_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measure prompt savings of CV text compaction on the sample corpus.
+
+    cd backend
+    python -m benchmarks.bench_compaction                 # tokens saved only, no API calls
+    python -m benchmarks.bench_compaction --extract -n 5  # also check extraction stays equivalent
+
+With --extract, each CV is extracted twice (raw text vs compacted text) and
+the outputs are compared field by field: scalar fields must match, list
+fields are compared with a Jaccard similarity on normalized items.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pdfplumber  # noqa: E402
+from services.text_compaction import compact_cv_text  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "cvs")
+SCALAR_FIELDS = ("name", "email")
+LIST_FIELDS = ("education", "experiences", "responsabilities", "tech_skills", "soft_skills", "certificates")
+
+
+def _norm(value):
+    return " ".join(str(value or "").lower().split())
+
+
+def _jaccard(a, b):
+    a, b = {_norm(x) for x in a or []}, {_norm(x) for x in b or []}
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def compare_extractions(raw, compact):
+    out = {f: _norm(getattr(raw, f)) == _norm(getattr(compact, f)) for f in SCALAR_FIELDS}
+    out.update({f: round(_jaccard(getattr(raw, f), getattr(compact, f)), 2) for f in LIST_FIELDS})
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--max-chars", type=int, default=None)
+    parser.add_argument("--extract", action="store_true", help="Call Gemini to check output equivalence")
+    parser.add_argument("-n", type=int, default=0, help="Only use the first N files")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+    if args.n:
+        files = files[:args.n]
+
+    total_before = total_after = 0
+    compact_seconds = 0.0
+    comparisons = []
+
+    print(f"{'file':<28} {'tok_before':>10} {'tok_after':>10} {'saved':>7}")
+    for path in files:
+        with pdfplumber.open(path) as pdf:
+            pages = [page.extract_text() or "" for page in pdf.pages]
+
+        start = time.perf_counter()
+        text, stats = compact_cv_text(pages, max_chars=args.max_chars)
+        compact_seconds += time.perf_counter() - start
+
+        total_before += stats["tokens_before"]
+        total_after += stats["tokens_after"]
+        saved_pct = 100.0 * stats["tokens_saved"] / max(1, stats["tokens_before"])
+        print(f"{os.path.basename(path):<28} {stats['tokens_before']:>10} {stats['tokens_after']:>10} {saved_pct:>6.1f}%")
+
+        if args.extract:
+            from services.cv_extraction import extract_cv_details
+            raw = extract_cv_details("\n".join(pages))
+            compact = extract_cv_details(text)
+            comparisons.append(compare_extractions(raw, compact))
+
+    if not files:
+        print("No PDF found in", args.corpus)
+        return
+
+    print()
+    print(f"files: {len(files)}  tokens: {total_before} -> {total_after} "
+          f"({100.0 * (total_before - total_after) / max(1, total_before):.1f}% saved)  "
+          f"compaction time: {1000 * compact_seconds / len(files):.2f} ms/file")
+
+    if comparisons:
+        print()
+        print("Extraction equivalence (raw vs compacted):")
+        for f in SCALAR_FIELDS:
+            same = sum(1 for c in comparisons if c[f])
+            print(f"  {f:<18} identical in {same}/{len(comparisons)}")
+        for f in LIST_FIELDS:
+            avg = sum(c[f] for c in comparisons) / len(comparisons)
+            print(f"  {f:<18} mean jaccard {avg:.2f}")
+
+
+if __name__ == "__main__":
+    main()
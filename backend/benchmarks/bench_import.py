@@ -0,0 +1,92 @@
+"""
+Throughput of the bulk importer on the sample corpus replicated to 10k files.
+
+    cd backend
+    python -m benchmarks.bench_import                    # 10,000 files, fast mode (no LLM calls)
+    python -m benchmarks.bench_import -n 500 --mode full # with LLM extraction
+
+Each copy of a sample PDF gets a unique trailing comment so it hashes
+differently (no dedupe). Runs against MONGODB_URI in a scratch database
+(BENCH_DB_NAME, default "cv_ranker_bench") and a temporary blob store, both
+removed at the end. A second run over the same checkpoint measures the resume.
+"""
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+from import_cvs import Checkpoint, Progress, discover, import_files, PARSE_WORKERS, LLM_CONCURRENCY  # noqa: E402
+from services.blob_store import LocalBlobStore  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "cvs")
+
+
+def replicate(corpus: str, target: str, n: int):
+    samples = sorted(glob.glob(os.path.join(corpus, "*.pdf")))
+    if not samples:
+        raise SystemExit(f"No PDF in {corpus}")
+    contents = []
+    for path in samples:
+        with open(path, "rb") as f:
+            contents.append(f.read())
+    for i in range(n):
+        # 100 files per directory, like a client's dump
+        directory = os.path.join(target, f"{i // 100:04d}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"cv_{i:05d}.pdf"), "wb") as f:
+            f.write(contents[i % len(contents)])
+            f.write(f"\n% copy {i}\n".encode())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", type=int, default=10000, help="number of files")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--mode", choices=("full", "fast"), default="fast")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY)
+    args = parser.parse_args()
+
+    load_dotenv()
+    client = MongoClient(os.getenv("MONGODB_URI", "mongodb://localhost:27017"))
+    db_name = os.getenv("BENCH_DB_NAME", "cv_ranker_bench")
+    client.drop_database(db_name)
+    db = client[db_name]
+    work = tempfile.mkdtemp(prefix="bench_import_")
+
+    try:
+        files_dir = os.path.join(work, "files")
+        start = time.perf_counter()
+        replicate(args.corpus, files_dir, args.n)
+        print(f"replicated {args.n} files in {time.perf_counter() - start:.1f}s")
+
+        paths = discover(files_dir)
+        store = LocalBlobStore(os.path.join(work, "blobs"))
+        checkpoint_path = os.path.join(work, "checkpoint.jsonl")
+        for run in ("import", "resume"):
+            checkpoint = Checkpoint(checkpoint_path)
+            try:
+                stats = import_files(
+                    db, paths, checkpoint, mode=args.mode, store=store,
+                    parse_workers=args.parse_workers, llm_concurrency=args.llm_concurrency,
+                    progress=Progress(len(paths))
+                )
+            finally:
+                checkpoint.close()
+            handled = sum(stats[k] for k in ("imported", "duplicate", "failed", "skipped"))
+            rate = handled / stats["seconds"] if stats["seconds"] else 0
+            print(f"{run}: {stats}  ->  {rate:.1f} files/s")
+    finally:
+        client.drop_database(db_name)
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
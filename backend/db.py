@@ -1,8 +1,10 @@
 import os
 from datetime import datetime
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING
 from pymongo.errors import CollectionInvalid
 
+from services.cv_search import text_index_spec
+
 _client = None
 _db = None
 
@@ -82,5 +84,37 @@ def init_db(app=None):
             pass
 
     _db["cvs"].create_index([("job_id", ASCENDING)])
+    # Best CVs of a job first (radar chart top-N)
+    _db["cvs"].create_index([("job_id", ASCENDING), ("score", DESCENDING)])
+    _db["cvs"].create_index([("file_hash", ASCENDING)])
+    _db["cvs"].create_index([("preview.thumbnail_hash", ASCENDING)])
+    # Blobs no CV may reference any more, collected after a grace period
+    _db["blob_orphans"].create_index([("used_at", ASCENDING)])
+    # Weighted full-text index over the extracted CV content (candidate search)
+    keys, options = text_index_spec()
+    _db["cvs"].create_index(keys, **options)
+    # LSH band keys of the CVs' MinHash signatures (near-duplicate lookup)
+    _db["cvs"].create_index([("minhash.bands", ASCENDING)])
+    # Incremental talent pool sync: CVs changed since a process last looked
+    _db["cvs"].create_index([("updated_at", ASCENDING)])
+    _db["cv_deletions"].create_index([("deleted_at", ASCENDING)])
+    _db["cv_deletions"].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+    # --- CV <-> job associations (CVs considered for jobs they weren't uploaded for) ---
+    _db["applications"].create_index([("cv_id", ASCENDING), ("job_id", ASCENDING)], unique=True)
+    _db["applications"].create_index([("job_id", ASCENDING), ("score", DESCENDING)])
+
+    # --- Gemini call budget shared by all processes (one counter per window) ---
+    _db["llm_quota"].create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+
+    # --- Scoring work queue: at most one active (queued/leased) task per pair ---
+    _db["scoring_tasks"].create_index(
+        [("job_id", ASCENDING), ("cv_id", ASCENDING)],
+        unique=True,
+        partialFilterExpression={"active": True}
+    )
+    _db["scoring_tasks"].create_index(
+        [("active", ASCENDING), ("status", ASCENDING), ("priority_rank", ASCENDING), ("created_at", ASCENDING)]
+    )
 
     return _db
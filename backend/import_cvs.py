@@ -0,0 +1,299 @@
+"""
+Bulk import of existing CVs (client onboarding), outside the HTTP upload path:
+
+    python import_cvs.py /path/to/cvs                      # every *.pdf below it
+    python import_cvs.py --manifest files.txt --job-id <id>
+    python import_cvs.py /path/to/cvs --mode fast          # no LLM, complete later
+
+Files flow through a staged pipeline:
+  1. hash + store in the blob store, skip files already stored (dedupe)
+  2. parse text and render the preview in a process pool
+  3. extraction through a bounded pool of concurrent LLM calls, in the bulk
+     class of the LLM budget shared with the API (held below interactive use)
+  4. unordered bulk inserts
+
+Every file whose outcome is written is appended to a checkpoint file; running
+the same command again skips them and resumes where the import stopped.
+Files that failed are retried. A running API server picks the imported CVs up
+in its talent pool index on its next start.
+"""
+import argparse
+import contextvars
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from db import init_db
+from services.blob_store import get_blob_store, release_blob
+from services.cv_ingest import extract_cv_data, read_pdf_text
+from services.llm_client import llm_context
+from services.matching import extraction_fields
+from services.near_duplicates import minhash_doc
+from services.previews import render_thumbnail, text_snippet
+from services.write_batcher import WriteBatcher
+
+PARSE_WORKERS = int(os.getenv("IMPORT_PARSE_WORKERS", os.cpu_count() or 2))
+LLM_CONCURRENCY = int(os.getenv("IMPORT_LLM_CONCURRENCY", 8))
+MAX_IN_FLIGHT = int(os.getenv("IMPORT_MAX_IN_FLIGHT", 256))
+
+
+def discover(root: Optional[str] = None, manifest: Optional[str] = None) -> List[str]:
+    """PDF paths below `root` or listed in `manifest` (one per line), sorted for stable resumes."""
+    paths = []
+    if manifest:
+        with open(manifest, encoding="utf-8") as f:
+            paths += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if root:
+        for dirpath, _, filenames in os.walk(root):
+            paths += [os.path.join(dirpath, n) for n in filenames if n.lower().endswith(".pdf")]
+    return sorted({os.path.abspath(p) for p in paths})
+
+
+def parse_file(path: str) -> Dict:
+    """Process-pool stage: CPU-bound text extraction and thumbnail rendering."""
+    text, compaction = read_pdf_text(path)
+    out = {"text": text, "compaction": compaction, "thumbnail": None, "thumbnail_error": None}
+    try:
+        with open(path, "rb") as f:
+            out["thumbnail"] = render_thumbnail(f)
+    except Exception as e:
+        out["thumbnail_error"] = str(e)
+    return out
+
+
+class Checkpoint:
+    """Append-only JSON lines: one per file whose outcome is final."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line of an interrupted run
+                    self.done[entry["path"]] = entry["status"]
+        self._file = open(path, "a", encoding="utf-8")
+
+    def skip(self, path: str) -> bool:
+        return self.done.get(path) in ("imported", "duplicate")
+
+    def record(self, path: str, status: str, **fields):
+        self.done[path] = status
+        self._file.write(json.dumps({"path": path, "status": status, **fields}, default=str) + "\n")
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class Progress:
+    def __init__(self, total: int, every: float = 1.0, out=sys.stderr):
+        self.total = total
+        self.counts = {"imported": 0, "duplicate": 0, "failed": 0, "skipped": 0}
+        self.start = time.monotonic()
+        self.every = every
+        self.out = out
+        self._last = 0.0
+
+    def add(self, status: str):
+        self.counts[status] += 1
+        now = time.monotonic()
+        if now - self._last >= self.every:
+            self._last = now
+            self.print()
+
+    def print(self, end="\r"):
+        handled = sum(self.counts.values())
+        elapsed = max(1e-9, time.monotonic() - self.start)
+        rate = (handled - self.counts["skipped"]) / elapsed
+        remaining = self.total - handled
+        eta = f"{remaining / rate:.0f}s" if rate > 0 else "?"
+        c = self.counts
+        self.out.write(
+            f"{handled}/{self.total} files  {rate:.1f} files/s  imported {c['imported']}  "
+            f"duplicates {c['duplicate']}  failed {c['failed']}  resumed {c['skipped']}  ETA {eta}   {end}"
+        )
+        self.out.flush()
+
+
+def import_files(db, paths: Iterable[str], checkpoint: Checkpoint, job_id: Optional[ObjectId] = None,
+                 mode: str = "full", store=None, parse_workers: int = PARSE_WORKERS,
+                 llm_concurrency: int = LLM_CONCURRENCY, max_in_flight: int = MAX_IN_FLIGHT,
+                 progress: Optional[Progress] = None) -> Dict:
+    """Run the pipeline over `paths`; returns the outcome counts and stage timings."""
+    paths = list(paths)
+    store = store or get_blob_store()
+    progress = progress or Progress(len(paths))
+    timings = {"hash": 0.0, "insert": 0.0}
+    known = {d["file_hash"] for d in db.cvs.find({"file_hash": {"$ne": None}}, {"file_hash": 1})}
+    tenant = f"import:{os.getpid()}"
+
+    def extract(item):
+        with llm_context("bulk", tenant=tenant):
+            return extract_cv_data(item["text"], mode)
+
+    in_flight = {}  # future -> (stage, item)
+    inserted = []   # (item, WriteResult) waiting for their batch to be flushed
+    pending_paths = iter(paths)
+    writes = WriteBatcher(db)
+
+    def feed():
+        while len(in_flight) < max_in_flight:
+            path = next(pending_paths, None)
+            if path is None:
+                return
+            if checkpoint.skip(path):
+                progress.add("skipped")
+                continue
+            start = time.perf_counter()
+            try:
+                with open(path, "rb") as f:
+                    file_hash, file_size = store.put(f)
+            except OSError as e:
+                checkpoint.record(path, "failed", error=str(e))
+                progress.add("failed")
+                continue
+            finally:
+                timings["hash"] += time.perf_counter() - start
+            if file_hash in known:
+                checkpoint.record(path, "duplicate", file_hash=file_hash)
+                progress.add("duplicate")
+                continue
+            known.add(file_hash)
+            item = {"path": path, "file_hash": file_hash, "file_size": file_size}
+            in_flight[parse_pool.submit(parse_file, path)] = ("parse", item)
+
+    def fail(item, stage, error, thumbnail_hash=None):
+        # Its blobs are referenced by no CV, unless another one shares them: the GC checks
+        known.discard(item["file_hash"])
+        release_blob(db, item["file_hash"])
+        if thumbnail_hash:
+            release_blob(db, thumbnail_hash)
+        checkpoint.record(item["path"], "failed", stage=stage, error=error)
+        progress.add("failed")
+
+    def record_flushed():
+        still = []
+        for item, result in inserted:
+            if not result.flushed:
+                still.append((item, result))
+            elif result.ok:
+                checkpoint.record(item["path"], "imported", cv_id=result.doc["_id"], file_hash=item["file_hash"])
+                progress.add("imported")
+            else:
+                fail(item, "insert", result.error, thumbnail_hash=result.doc["preview"].get("thumbnail_hash"))
+        inserted[:] = still
+
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool, \
+            ThreadPoolExecutor(max_workers=llm_concurrency, thread_name_prefix="import-llm") as llm_pool:
+        feed()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, item = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    fail(item, stage, str(e))
+                    continue
+
+                if stage == "parse":
+                    item.update(result)
+                    in_flight[llm_pool.submit(contextvars.copy_context().run, extract, item)] = ("extract", item)
+                    continue
+
+                extracted, meta = result
+                meta["compaction"] = item["compaction"]
+                preview = {"snippet": text_snippet(item["text"]), "thumbnail_hash": None,
+                           "thumbnail_error": item["thumbnail_error"]}
+                if item["thumbnail"]:
+                    preview["thumbnail_hash"], preview["thumbnail_size"] = store.put(io.BytesIO(item["thumbnail"]))
+                now = datetime.utcnow()
+                doc = {
+                    "job_id": job_id,
+                    "created_at": now,
+                    "updated_at": now,
+                    "text": item["text"],
+                    **extraction_fields(extracted),
+                    "extraction": meta,
+                    "filename": os.path.basename(item["path"]),
+                    "file_hash": item["file_hash"],
+                    "file_size": item["file_size"],
+                    "preview": preview,
+                    "minhash": minhash_doc(item["text"], extracted),
+                }
+                start = time.perf_counter()
+                inserted.append((item, writes.insert("cvs", doc)))
+                timings["insert"] += time.perf_counter() - start
+            record_flushed()
+            feed()
+
+    start = time.perf_counter()
+    writes.flush()
+    timings["insert"] += time.perf_counter() - start
+    record_flushed()
+    checkpoint.flush()
+    progress.print(end="\n")
+    return {
+        **progress.counts,
+        "seconds": round(time.monotonic() - progress.start, 2),
+        "hash_seconds": round(timings["hash"], 2),
+        "insert_seconds": round(timings["insert"], 2),
+        "insert_round_trips": writes.round_trips,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import CV PDFs")
+    parser.add_argument("root", nargs="?", help="directory walked recursively for *.pdf")
+    parser.add_argument("--manifest", help="file listing one PDF path per line")
+    parser.add_argument("--job-id", help="job the CVs are uploaded for (default: none)")
+    parser.add_argument("--mode", choices=("full", "fast"), default="full",
+                        help="fast: heuristic fields only, LLM extraction deferred")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <root or manifest>.import-checkpoint.jsonl)")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS)
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_CONCURRENCY)
+    args = parser.parse_args()
+    if not args.root and not args.manifest:
+        parser.error("a directory or --manifest is required")
+
+    load_dotenv()
+    db = init_db()
+    paths = discover(args.root, args.manifest)
+    base = (args.root or args.manifest).rstrip("/\\")
+    checkpoint = Checkpoint(args.checkpoint or f"{base}.import-checkpoint.jsonl")
+    print(f"{len(paths)} PDF files, checkpoint {checkpoint.path}", file=sys.stderr)
+
+    try:
+        stats = import_files(
+            db, paths, checkpoint,
+            job_id=ObjectId(args.job_id) if args.job_id else None,
+            mode=args.mode,
+            parse_workers=args.parse_workers,
+            llm_concurrency=args.llm_concurrency,
+        )
+    except KeyboardInterrupt:
+        print("\nInterrupted: run the same command again to resume", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        checkpoint.close()
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,20 @@
 from typing import List, Optional, Literal
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
 
+class Weights(BaseModel):
+    """Weight of each dimension in the global score (normalized to sum to 1 when used)."""
+    education: float = Field(default=0.15, ge=0)
+    experiences: float = Field(default=0.25, ge=0)
+    tech_skills: float = Field(default=0.50, ge=0)
+    soft_skills: float = Field(default=0.10, ge=0)
+
+    @model_validator(mode="after")
+    def check_not_all_zero(self):
+        if self.education + self.experiences + self.tech_skills + self.soft_skills <= 0:
+            raise ValueError("At least one weight must be positive")
+        return self
+
 
 class JobBase(BaseModel):
     name: str = Field(min_length=1)
@@ -10,12 +23,14 @@ class JobBase(BaseModel):
 
 class JobCreate(JobBase):
     status: Literal["open","closed"] = "open"
+    weights: Optional[Weights] = None
 
 
 class JobUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
     status: Optional[Literal["open","closed"]] = None
+    weights: Optional[Weights] = None
 
 
 class Extracted(BaseModel):
@@ -2,15 +2,29 @@ from flask import Blueprint, request, jsonify, abort
 from datetime import datetime
 from bson import ObjectId
 from pymongo import ReturnDocument
-from models.cv import CVCreate
+from models.cv import CVCreate, ExtractedCV
 from services.cv_extraction import extract_cv_details, CVExtractionError
+from services.cv_ingest import extract_cv_data, read_pdf_text
+from services.applications import link_cvs_to_job, serialize_application
+from services.talent_pool import talent_pool, record_deletion
+from services.llm_client import llm_context
+from services.write_batcher import WriteBatcher, WriteResult
+from services.blob_store import get_blob_store, release_blob, touch_blob
+from services.previews import build_preview
+from services.archive_reader import iter_archive_pdfs, archive_kind, ArchiveError
+from services.streaming_multipart import StreamingMultipartReader, MultipartError
+from services.cv_search import search_query, score_range, highlight
+from services.matching import extraction_fields
+from services.near_duplicates import (
+    minhash_doc, find_near_duplicates, similarity, ensure_signatures, duplicate_clusters, NEAR_DUPLICATE_THRESHOLD
+)
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from db import get_db
 import os
 from werkzeug.utils import secure_filename
-import pdfplumber
-from flask import send_from_directory
+from flask import send_from_directory, send_file, Response
+from werkzeug.wsgi import wrap_file
 
 
 cvs_bp = Blueprint("cvs", __name__)
@@ -50,8 +64,15 @@ def upload_cv():
     return jsonify(serialize_cv(saved)), 201 """
 
 
+# Flat directory of CVs uploaded before the content-addressed blob store
 UPLOAD_FOLDER = os.path.join(os.getcwd(), "uploads", "cvs")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# A blob never changes (its name is its hash): browsers may keep it
+CV_FILE_MAX_AGE = int(os.getenv("CV_FILE_MAX_AGE_SECONDS", 31536000))
+
+INGEST_MODE = os.getenv("CV_INGEST_MODE", "full")
+# Uploads of up to this many files get interactive LLM priority, bigger batches normal
+UPLOAD_INTERACTIVE_MAX_FILES = int(os.getenv("UPLOAD_INTERACTIVE_MAX_FILES", 3))
 
 """@cvs_bp.post("")
 def upload_cv():
@@ -100,55 +121,210 @@ def upload_cv():
 @cvs_bp.post("")
 @jwt_required()
 def upload_cvs():
-    job_id = request.form.get("job_id")
-    files = request.files.getlist("files")  # Grab a glorious list of files instead of just one
+    """
+    Upload PDFs for a job (multipart fields: job_id, mode, then files).
+    The body is parsed as it arrives: each file part is hashed while it is
+    written once to the blob store, then parsed from there, so memory use
+    does not depend on the number or size of the files. job_id and mode may
+    also be given as query parameters; as form fields they must precede the files.
+    """
+    try:
+        reader = StreamingMultipartReader(request.stream, request.content_type)
+    except MultipartError as e:
+        return {"error": str(e)}, 400
 
-    if not job_id or not files:
+    fields = {"job_id": request.args.get("job_id"), "mode": request.args.get("mode", INGEST_MODE)}
+    batch = None
+    count = 0
+    try:
+        for kind, name, value in reader.parts():
+            if kind == "field":
+                if batch is None:
+                    fields[name] = value
+                continue
+            if name != "files":
+                continue  # skipped unread by the reader
+            if batch is None:
+                # "fast": heuristic fields only, LLM extraction deferred
+                if not fields["job_id"]:
+                    return {"error": "job_id and at least one file are required"}, 400
+                if fields["mode"] not in ("full", "fast"):
+                    return {"error": "mode must be 'full' or 'fast'"}, 400
+                batch = IngestBatch(get_db(), ObjectId(fields["job_id"]), fields["mode"], "interactive")
+            # The file count is only known at the end: the first files of an
+            # upload get interactive priority, the rest of a big batch normal
+            count += 1
+            if count > UPLOAD_INTERACTIVE_MAX_FILES:
+                batch.priority = "normal"
+            batch.add(value, value.filename)
+    except MultipartError as e:
+        if batch is None:
+            return {"error": str(e)}, 400
+        batch.items.append({"error": str(e)})
+
+    if batch is None:
         return {"error": "job_id and at least one file are required"}, 400
+    return jsonify(batch.results()), 201
 
-    db = get_db()
-    now = datetime.utcnow()
-    saved_docs = []
 
-    for file in files:
-        # Save each file elegantly
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(file_path)
+@cvs_bp.post("/archive")
+@jwt_required()
+def upload_cv_archive():
+    """
+    Upload a ZIP or tar.gz export of CVs (form fields: job_id, archive, mode).
+    Entries are decompressed one at a time, each PDF going straight into the
+    ingestion pipeline; non-PDF entries are skipped. Entry count, decompressed
+    sizes and compression ratio are limited (ARCHIVE_* settings): when one is
+    broken, the CVs read so far are kept and the rest of the archive is not read.
+    """
+    job_id = request.form.get("job_id")
+    archive = request.files.get("archive")
+    mode = request.form.get("mode", INGEST_MODE)
+
+    if not job_id or not archive:
+        return {"error": "job_id and archive are required"}, 400
+    if mode not in ("full", "fast"):
+        return {"error": "mode must be 'full' or 'fast'"}, 400
+    try:
+        archive_kind(archive.filename)
+    except ArchiveError as e:
+        return {"error": str(e)}, 400
+
+    batch = IngestBatch(get_db(), ObjectId(job_id), mode, "normal")
+    error = None
+    try:
+        for name, stream in iter_archive_pdfs(archive.stream, archive.filename):
+            batch.add(stream, name)
+    except ArchiveError as e:
+        error = str(e)
+
+    items = batch.results()
+    return jsonify({
+        "archive": secure_filename(archive.filename),
+        "items": items,
+        "error": error
+    }), 413 if error and not items else 201
+
+
+class IngestBatch:
+    """
+    Ingestion of the files of one upload request: each file is stored in the
+    blob store, deduplicated, parsed, previewed and extracted; new CVs are
+    inserted in unordered batches, not one round trip per file.
+    """
+
+    def __init__(self, db, job_oid, mode: str, priority: str):
+        self.db = db
+        self.job_oid = job_oid
+        self.mode = mode
+        self.priority = priority
+        self.tenant = f"user:{get_jwt_identity()}"
+        self.store = get_blob_store()
+        self.writes = WriteBatcher(db)
+        self.pending = {}  # file_hash -> WriteResult, also dedupes identical files of this upload
+        self.near_duplicates = {}  # id(WriteResult) -> similar stored CVs
+        self.items = []
+        self.now = datetime.utcnow()
+
+    def add(self, stream, original_name: str):
+        # Stored under its content hash: same-named files never overwrite each other
+        filename = secure_filename(os.path.basename(original_name or ""))
+        file_hash, file_size = self.store.put(stream)
+        touch_blob(self.db, file_hash)  # keeps a blob released by a deleted CV from being collected
+
+        if file_hash in self.pending:
+            self.items.append(self.pending[file_hash])
+            return
+
+        # Same PDF already stored: reuse its parsing and extraction, just associate it
+        existing = self.db.cvs.find_one({"file_hash": file_hash})
+        if existing:
+            link_cvs_to_job(self.db, [existing["_id"]], self.job_oid)
+            self.items.append({**serialize_cv(existing), "reused": True})
+            return
 
         # Extract gorgeously structured text
         try:
-            with pdfplumber.open(file) as pdf:
-                text_pages = [page.extract_text() or "" for page in pdf.pages]
-                file_content = "\n".join(text_pages)
+            # Parsed from the stored file itself when the store has one on disk
+            path = self.store.path(file_hash)
+            if path:
+                file_content, compaction = read_pdf_text(path)
+            else:
+                with self.store.open(file_hash) as blob:
+                    file_content, compaction = read_pdf_text(blob)
         except Exception as e:
-            saved_docs.append({
+            release_blob(self.db, file_hash)  # referenced by no CV, unless another upload is using it
+            self.items.append({
                 "filename": filename,
                 "error": f"Could not extract PDF text: {str(e)}"
             })
-            continue
+            return
 
-        # Extract thrilling CV details
-        try:
-            extracted = extract_cv_details(file_content)
-            extracted_dict = extracted.model_dump()
-        except CVExtractionError as e:
-            extracted_dict = {"error": str(e)}
+        # Thumbnail and snippet, so list views never download the PDF
+        preview = build_preview(self.store, file_hash, file_content)
+        if preview.get("thumbnail_hash"):
+            touch_blob(self.db, preview["thumbnail_hash"])
+
+        # Extract thrilling CV details. A batch upload must not starve the
+        # recruiters waiting on a single CV or on scores: it runs as normal work,
+        # queued fairly against other users' uploads.
+        with llm_context(self.priority, tenant=self.tenant):
+            extracted_dict, meta = extract_cv_data(file_content, self.mode)
+        meta["compaction"] = compaction
 
         # Create shiny new document
         doc = {
-            "job_id": ObjectId(job_id),
-            "created_at": now,
-            "updated_at": now,
-            "extracted": extracted_dict,
-            "filename": filename
+            "job_id": self.job_oid,
+            "created_at": self.now,
+            "updated_at": self.now,
+            "text": file_content,
+            **extraction_fields(extracted_dict),
+            "extraction": meta,
+            "filename": filename,
+            "file_hash": file_hash,
+            "file_size": file_size,
+            "preview": preview,
+            "minhash": minhash_doc(file_content, extracted_dict)
         }
 
-        res = db.cvs.insert_one(doc)
-        saved = db.cvs.find_one({"_id": res.inserted_id})
-        saved_docs.append(serialize_cv(saved))
-
-    return jsonify(saved_docs), 201
+        # Same candidate re-exported with small edits: found through the LSH
+        # band index in the database, and among this upload's unflushed CVs
+        near = find_near_duplicates(self.db, doc["minhash"])
+        for other in self.pending.values():
+            score = similarity((doc["minhash"] or {}).get("signature"), (other.doc["minhash"] or {}).get("signature"))
+            if score >= NEAR_DUPLICATE_THRESHOLD:
+                near.append({"cv_id": str(other.doc["_id"]), "filename": other.doc["filename"], "similarity": round(score, 3)})
+
+        result = self.writes.insert("cvs", doc)
+        if near:
+            self.near_duplicates[id(result)] = near
+        self.pending[file_hash] = result
+        self.items.append(result)
+
+    def results(self):
+        """Flush the inserts; one result row (CV or error) per file, in order."""
+        self.writes.flush()
+        out, seen = [], set()
+        for item in self.items:
+            if not isinstance(item, WriteResult):
+                out.append(item)
+            elif item.ok:
+                if id(item) in seen:
+                    # Same file twice in this upload: stored once
+                    out.append({**serialize_cv(item.doc), "reused": True})
+                    continue
+                seen.add(id(item))
+                talent_pool.add_cv(item.doc["_id"], item.doc["extracted"])
+                row = serialize_cv(item.doc)
+                if id(item) in self.near_duplicates:
+                    row["near_duplicates"] = self.near_duplicates[id(item)]
+                out.append(row)
+            else:
+                for digest in (item.doc["file_hash"], item.doc["preview"].get("thumbnail_hash")):
+                    if digest:
+                        release_blob(self.db, digest)
+                out.append({"filename": item.doc["filename"], "error": f"Could not save CV: {item.error}"})
+        return out
 
 
 def serialize_cv(doc):
@@ -163,10 +339,30 @@ def serialize_cv(doc):
         "subscores": doc.get("subscores", {}),
         "created_at": doc["created_at"].isoformat() if isinstance(doc["created_at"], datetime) else doc["created_at"],
         "updated_at": doc["updated_at"].isoformat() if isinstance(doc["updated_at"], datetime) else doc["updated_at"],
-        "extracted": doc.get("extracted", {})
+        "extracted": doc.get("extracted") or {},
+        "extraction": serialize_extraction(doc.get("extraction")),
+        "scoring": doc.get("scoring"),
+        "preview": serialize_preview(doc.get("preview"))
     }
 
 
+def serialize_preview(preview):
+    if not preview:
+        return None
+    return {"snippet": preview.get("snippet"), "has_thumbnail": bool(preview.get("thumbnail_hash"))}
+
+
+def serialize_extraction(meta):
+    if not meta:
+        return meta
+    out = {**meta}
+    if isinstance(out.get("extracted_at"), datetime):
+        out["extracted_at"] = out["extracted_at"].isoformat()
+    return out
+
+
+
+
 
 @cvs_bp.get("")
 @jwt_required()
@@ -194,6 +390,66 @@ def list_cvs():
     return jsonify(items)
 
 
+@cvs_bp.get("/search")
+@jwt_required()
+def search_cvs():
+    """
+    Ranked candidate search over the extracted CV content (skills, name,
+    summary, experiences, responsibilities; weighted in that order).
+    Query: q (words, "phrases", -excluded), job_id (CVs uploaded for the job
+    or linked to it), min_score, max_score (with job_id, the score for that
+    job; otherwise the score for the job the CV was uploaded for), page, limit.
+    Each hit carries its relevance and highlighted snippets.
+    """
+    q = (request.args.get("q") or "").strip()
+    if not q:
+        return {"error": "q is required"}, 400
+    try:
+        job_oid = ObjectId(request.args["job_id"]) if request.args.get("job_id") else None
+        min_score = float(request.args["min_score"]) if request.args.get("min_score") else None
+        max_score = float(request.args["max_score"]) if request.args.get("max_score") else None
+        page = max(1, int(request.args.get("page", 1)))
+        limit = max(1, min(100, int(request.args.get("limit", 20))))
+    except Exception:
+        abort(400, description="Invalid job_id, score range or paging")
+
+    db = get_db()
+    applications = {}
+    if job_oid is not None:
+        # Linked CVs are filtered and scored on their application, not on the CV's own job
+        app_query = {"job_id": job_oid}
+        scores = score_range(min_score, max_score)
+        if scores:
+            app_query["score"] = scores
+        applications = {
+            a["cv_id"]: a for a in db.applications.find(app_query, {"cv_id": 1, "score": 1, "subscores": 1, "scoring": 1})
+        }
+    query = search_query(q, job_oid, min_score, max_score, linked_ids=list(applications))
+    relevance = {"relevance": {"$meta": "textScore"}}
+    cursor = db.cvs.find(query, {**relevance, "text": 0, "minhash": 0, "preview.thumbnail_error": 0}) \
+        .sort([("relevance", {"$meta": "textScore"})]).skip((page - 1) * limit).limit(limit)
+
+    items = []
+    for doc in cursor:
+        application = applications.get(doc["_id"]) if doc.get("job_id") != job_oid else None
+        item = serialize_cv(doc)
+        if application:
+            item.update({
+                "score": application.get("score", {}),
+                "subscores": application.get("subscores", {}),
+                "scoring": application.get("scoring"),
+                "application_id": str(application["_id"])
+            })
+        item["relevance"] = round(doc["relevance"], 3)
+        item["snippets"] = highlight(doc.get("extracted"), q)
+        items.append(item)
+    return jsonify({
+        "items": items,
+        "page": page,
+        "limit": limit,
+        "total": db.cvs.count_documents(query)
+    })
+
 
 @cvs_bp.delete("/<cv_id>")
 @jwt_required()
@@ -207,6 +463,14 @@ def delete_cv(cv_id):
     deleted = db.cvs.find_one_and_delete({"_id": oid})
     if not deleted:
         abort(404, description="CV not found")
+    db.applications.delete_many({"cv_id": oid})
+    talent_pool.remove_cv(oid)
+    record_deletion(db, oid)
+    # Files no other CV references are deleted by the blob sweep, after a
+    # grace period: an upload in progress may be about to reference them
+    for digest in (deleted.get("file_hash"), (deleted.get("preview") or {}).get("thumbnail_hash")):
+        if digest and not db.cvs.find_one({"$or": [{"file_hash": digest}, {"preview.thumbnail_hash": digest}]}, {"_id": 1}):
+            release_blob(db, digest)
 
     return jsonify({"status": "deleted", "id": cv_id})
 
@@ -226,6 +490,47 @@ def get_cvs_by_job(job_id):
     return jsonify(cvs)
 
 
+@cvs_bp.get("/duplicates")
+@jwt_required()
+def list_duplicate_clusters():
+    """
+    Clusters of near-duplicate CVs (same candidate uploaded several times with
+    small edits), optionally among one job's CVs (?job_id=). ?threshold= is the
+    minimum estimated similarity, 0..1. CVs stored before signatures existed
+    get theirs first.
+    """
+    db = get_db()
+    try:
+        threshold = float(request.args.get("threshold", NEAR_DUPLICATE_THRESHOLD))
+        job_oid = ObjectId(request.args["job_id"]) if request.args.get("job_id") else None
+    except Exception:
+        abort(400, description="Invalid threshold or job ID")
+
+    ensure_signatures(db)
+    clusters = duplicate_clusters(db, threshold, job_oid)
+    return jsonify({"threshold": threshold, "clusters": clusters})
+
+
+@cvs_bp.get("/<cv_id>/duplicates")
+@jwt_required()
+def list_cv_duplicates(cv_id):
+    """Stored CVs that are near duplicates of this one."""
+    db = get_db()
+    try:
+        oid = ObjectId(cv_id)
+    except Exception:
+        abort(400, description="Invalid CV ID")
+    cv = db.cvs.find_one({"_id": oid}, {"minhash": 1, "text": 1, "extracted": 1})
+    if not cv:
+        abort(404, description="CV not found")
+
+    minhash = cv.get("minhash")
+    if "minhash" not in cv:
+        minhash = minhash_doc(cv.get("text"), cv.get("extracted"))
+        db.cvs.update_one({"_id": oid}, {"$set": {"minhash": minhash}})
+    return jsonify({"cv_id": cv_id, "near_duplicates": find_near_duplicates(db, minhash, exclude_id=oid)})
+
+
 @cvs_bp.patch("/<cv_id>/dissociate")
 @jwt_required()
 def dissociate_cv(cv_id):
@@ -263,6 +568,11 @@ def get_cv_file(cv_id):
     if not cv:
         abort(404, description="CV not found")
 
+    store = get_blob_store()
+    file_hash = cv.get("file_hash")
+    if file_hash and store.exists(file_hash):
+        return send_blob(store, file_hash, cv.get("filename") or f"{file_hash}.pdf")
+
     filename = cv.get("filename")
     if not filename:
         abort(404, description="No file associated with this CV")
@@ -271,10 +581,169 @@ def get_cv_file(cv_id):
     if not os.path.exists(file_path):
         abort(404, description="File not found on server")
 
-    # This serves the file directly to the browser (inline = display)
+    # CVs stored before the blob store: served from the flat upload directory
     return send_from_directory(
         UPLOAD_FOLDER,
         filename,
         as_attachment=False,  # False → opens in browser, True → forces download
         mimetype="application/pdf"
-    )
\ No newline at end of file
+    )
+
+
+@cvs_bp.get("/<cv_id>/preview")
+@jwt_required()
+def get_cv_preview(cv_id):
+    """
+    First-page thumbnail of the CV (a few KB PNG), cached like the file itself.
+    CVs stored before previews existed get theirs rendered on first request.
+    """
+    db = get_db()
+    try:
+        oid = ObjectId(cv_id)
+    except Exception:
+        abort(400, description="Invalid CV ID")
+
+    cv = db.cvs.find_one({"_id": oid}, {"preview": 1, "file_hash": 1, "text": 1})
+    if not cv:
+        abort(404, description="CV not found")
+
+    store = get_blob_store()
+    preview = cv.get("preview") or {}
+    if not preview.get("thumbnail_hash") and not preview.get("thumbnail_error"):
+        if not cv.get("file_hash") or not store.exists(cv["file_hash"]):
+            abort(404, description="No stored file to preview")
+        preview = build_preview(store, cv["file_hash"], cv.get("text"))
+        db.cvs.update_one({"_id": oid}, {"$set": {"preview": preview}})
+
+    if not preview.get("thumbnail_hash"):
+        abort(404, description="No preview available for this CV")
+    return send_blob(store, preview["thumbnail_hash"], f"{cv_id}.png", mimetype="image/png")
+
+
+def send_blob(store, file_hash: str, filename: str, mimetype: str = "application/pdf"):
+    """
+    Serve a stored CV inline with a strong ETag (the content hash) and a
+    long-lived private cache: a repeated view is a 304, Range requests get a 206.
+    Local blobs go through send_file, whose file wrapper lets the WSGI server
+    use sendfile; GridFS blobs are streamed in chunks.
+    """
+    path = store.path(file_hash)
+    if path:
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            download_name=filename,
+            conditional=True,
+            etag=file_hash,
+            max_age=CV_FILE_MAX_AGE
+        )
+    else:
+        blob = store.open(file_hash)
+        response = Response(wrap_file(request.environ, blob), mimetype=mimetype, direct_passthrough=True)
+        response.headers["Content-Disposition"] = f'inline; filename="{filename}"'
+        response.set_etag(file_hash)
+        response.cache_control.max_age = CV_FILE_MAX_AGE
+        response = response.make_conditional(request, accept_ranges=True, complete_length=blob.length)
+
+    # Behind authentication: browsers may cache it, shared caches may not
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+
+@cvs_bp.post("/<cv_id>/extract")
+@jwt_required()
+def extract_cv(cv_id):
+    """
+    Re-run extraction for a CV (typically one whose extraction failed and is retryable).
+    Uses the stored text, falls back to re-reading the stored PDF for older CVs.
+    """
+    db = get_db()
+    try:
+        oid = ObjectId(cv_id)
+    except Exception:
+        abort(400, description="Invalid CV ID")
+
+    cv = db.cvs.find_one({"_id": oid})
+    if not cv:
+        abort(404, description="CV not found")
+
+    file_content = cv.get("text")
+    compaction = (cv.get("extraction") or {}).get("compaction")
+    if file_content is None:
+        store = get_blob_store()
+        filename = cv.get("filename")
+        if cv.get("file_hash") and store.exists(cv["file_hash"]):
+            source = store.open(cv["file_hash"])
+        elif filename and os.path.exists(os.path.join(UPLOAD_FOLDER, filename)):
+            source = open(os.path.join(UPLOAD_FOLDER, filename), "rb")
+        else:
+            abort(404, description="No stored text or file for this CV")
+        try:
+            with source:
+                file_content, compaction = read_pdf_text(source)
+        except Exception as e:
+            return {"error": f"Could not extract PDF text: {str(e)}"}, 400
+
+    with llm_context("interactive", tenant=f"user:{get_jwt_identity()}"):
+        extracted_dict, meta = extract_cv_data(file_content)
+    meta["compaction"] = compaction
+
+    update = {"extraction": meta, "text": file_content, "updated_at": datetime.utcnow()}
+    if meta["status"] == "succeeded" or not cv.get("extracted"):
+        # Never replace a complete extraction with heuristic leftovers of a failed one
+        update.update(extraction_fields(extracted_dict))
+    update["minhash"] = minhash_doc(file_content, update.get("extracted", cv.get("extracted")))
+
+    updated = db.cvs.find_one_and_update(
+        {"_id": oid},
+        {"$set": update},
+        return_document=ReturnDocument.AFTER
+    )
+    talent_pool.add_cv(oid, updated.get("extracted"))
+
+    return jsonify(serialize_cv(updated))
+
+
+@cvs_bp.post("/<cv_id>/jobs/<job_id>")
+@jwt_required()
+def associate_cv(cv_id, job_id):
+    """
+    Consider an already stored CV for another job. No re-upload, no re-extraction:
+    only the scoring for that job remains to be done.
+    """
+    db = get_db()
+    try:
+        cv_oid, job_oid = ObjectId(cv_id), ObjectId(job_id)
+    except Exception:
+        abort(400, description="Invalid CV or job ID")
+
+    if not db.cvs.find_one({"_id": cv_oid}, {"_id": 1}):
+        abort(404, description="CV not found")
+    if not db.jobs.find_one({"_id": job_oid}, {"_id": 1}):
+        abort(404, description="Job not found")
+
+    link_cvs_to_job(db, [cv_oid], job_oid)
+    application = db.applications.find_one({"cv_id": cv_oid, "job_id": job_oid})
+    if not application:
+        # The CV was uploaded for this job: its own document holds the score
+        return jsonify({"cv_id": cv_id, "job_id": job_id, "primary": True})
+
+    return jsonify(serialize_application(application)), 201
+
+
+@cvs_bp.delete("/<cv_id>/jobs/<job_id>")
+@jwt_required()
+def unlink_cv(cv_id, job_id):
+    db = get_db()
+    try:
+        cv_oid, job_oid = ObjectId(cv_id), ObjectId(job_id)
+    except Exception:
+        abort(400, description="Invalid CV or job ID")
+
+    res = db.applications.delete_one({"cv_id": cv_oid, "job_id": job_oid})
+    if res.deleted_count == 0:
+        abort(404, description="Association not found")
+
+    return jsonify({"status": "deleted", "cv_id": cv_id, "job_id": job_id})
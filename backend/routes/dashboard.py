@@ -1,7 +1,8 @@
 # routes/dashboard.py
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from db import get_db
 from bson import ObjectId
+from pymongo.errors import OperationFailure
 from flask import abort
 from collections import Counter
 from difflib import SequenceMatcher
@@ -184,36 +185,115 @@ def jobs_average_score():
 
     return jsonify(out)
 
+
+RADAR_DIMENSIONS = ("experience", "education", "tech_skills", "soft_skills")
+RADAR_DEFAULT_TOP = 50
+RADAR_MAX_TOP = 500
+RADAR_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _pool_percentiles(db, match, numbers):
+    """
+    {field: {pNN: value}} of each expression in `numbers` over the matched
+    CVs, computed in the database: only the percentiles come back.
+    """
+    try:
+        # MongoDB 7.0+: one pass, approximate percentiles
+        rows = list(db.cvs.aggregate([
+            {"$match": match},
+            {"$group": {"_id": None, **{
+                k: {"$percentile": {"input": expr, "p": [p / 100 for p in RADAR_PERCENTILES], "method": "approximate"}}
+                for k, expr in numbers.items()
+            }}},
+        ]))
+        pool = rows[0] if rows else {}
+        return {
+            k: {f"p{p}": round(v, 2) for p, v in zip(RADAR_PERCENTILES, pool[k])} if pool.get(k) and None not in pool[k] else None
+            for k in numbers
+        }
+    except OperationFailure:
+        pass
+
+    # Older servers: sort each dimension in the database and read back only
+    # the ranks the percentiles interpolate between
+    out = {}
+    for k, expr in numbers.items():
+        values = [
+            {"$match": match},
+            {"$project": {"_id": 0, "v": expr}},
+            {"$match": {"v": {"$type": "number"}}},
+        ]
+        counted = list(db.cvs.aggregate(values + [{"$count": "n"}]))
+        n = counted[0]["n"] if counted else 0
+        if not n:
+            out[k] = None
+            continue
+        positions = {p: (n - 1) * p / 100 for p in RADAR_PERCENTILES}
+        ranks = sorted({r for pos in positions.values() for r in (int(pos), min(int(pos) + 1, n - 1))})
+        facets = {f"r{r}": [{"$skip": r}, {"$limit": 1}] for r in ranks}
+        rows = list(db.cvs.aggregate(values + [{"$sort": {"v": 1}}, {"$facet": facets}], allowDiskUse=True))
+        at = {r: rows[0][f"r{r}"][0]["v"] for r in ranks}
+        out[k] = {}
+        for p, pos in positions.items():
+            lo, hi = int(pos), min(int(pos) + 1, n - 1)
+            out[k][f"p{p}"] = round(at[lo] + (at[hi] - at[lo]) * (pos - lo), 2)
+    return out
+
+
 @dashboard_bp.get("/job/<job_id>/candidate_fit_radar")
 @jwt_required()
 def candidate_fit_radar(job_id):
+    """
+    Subscores of the job's CVs for the radar chart, best first.
+    Query: top (default 50, max 500), min_score, and bands=1 to get the
+    10/25/50/75/90th percentiles of each dimension over the whole pool
+    instead of one point per CV, computed in the database. Only the numbers
+    are read (sorted and cut on the job_id/score index).
+    """
     db = get_db()
-    
+
     try:
         oid = ObjectId(job_id)
     except Exception:
         return jsonify({"error": "Invalid job_id"}), 400
+    try:
+        top = max(1, min(RADAR_MAX_TOP, int(request.args.get("top", RADAR_DEFAULT_TOP))))
+        min_score = float(request.args["min_score"]) if request.args.get("min_score") else None
+    except ValueError:
+        return jsonify({"error": "Invalid top or min_score"}), 400
+    bands = request.args.get("bands", "").lower() in ("1", "true", "yes")
 
-    # Fetch all CVs for this job
-    cvs = list(db.cvs.find({"job_id": oid}, {"extracted": 1, "subscores": 1, "score": 1, "id": 1, "filename": 1}))
-    if not cvs:
+    total = db.cvs.count_documents({"job_id": oid})
+    if not total:
         return jsonify({"job_id": job_id, "cvs": [], "message": "No CVs found"}), 404
 
-    radar_data = []
-
-    for cv in cvs:
-        subscores = cv.get("subscores", {})
-        radar_data.append({
-            "cv_id": str(cv.get("id", cv.get("_id"))),
-            "name": cv.get("extracted", {}).get("name", "Unknown"),
-            "experience": subscores.get("experience", {}).get("score", 0),
-            "education": subscores.get("education", {}).get("score", 0),
-            "tech_skills": subscores.get("tech_skills", {}).get("score", 0),
-            "soft_skills": subscores.get("soft_skills", {}).get("score", 0),
-            "global_score": cv.get("score", 0)
+    match = {"job_id": oid}
+    if min_score is not None:
+        match["score"] = {"$gte": min_score}
+    numbers = {dim: {"$ifNull": [f"$subscores.{dim}.score", 0]} for dim in RADAR_DIMENSIONS}
+    numbers["global_score"] = {"$ifNull": ["$score", 0]}
+
+    if bands:
+        return jsonify({
+            "job_id": job_id,
+            "total": total,
+            "count": db.cvs.count_documents(match),
+            "radar_bands": _pool_percentiles(db, match, numbers)
         })
 
+    cursor = db.cvs.aggregate([
+        {"$match": match},
+        {"$sort": {"score": -1}},
+        {"$limit": top},
+        {"$project": {"name": {"$ifNull": ["$extracted.name", "Unknown"]}, **numbers}},
+    ])
+    radar_data = [
+        {"cv_id": str(row["_id"]), "name": row["name"], **{k: row[k] for k in numbers}}
+        for row in cursor
+    ]
+
     return jsonify({
         "job_id": job_id,
+        "total": total,
         "radar_chart_data": radar_data
-    })
\ No newline at end of file
+    })
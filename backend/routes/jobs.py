@@ -1,17 +1,30 @@
-from datetime import datetime
+import os
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify, abort
 from bson import ObjectId
 from pymongo import ReturnDocument
+from pydantic import ValidationError
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from db import get_db
-from models.job import JobCreate, JobUpdate
+import time
+from models.job import JobCreate, JobUpdate, Weights
 from utils.serialization import serialize_job
-from services.job_extraction import extract_job_requirements, JobExtractionError
+from services.job_extraction import extract_job_data
+from services.job_extraction import model_name as extraction_model, PROMPT_VERSION as EXTRACTION_PROMPT_VERSION
+from services import background
+from services.matching import score_expression, extraction_fields
+from services.applications import link_cvs_to_job, serialize_application
+from services.talent_pool import talent_pool
+from services.llm_client import llm_context
 
 
 jobs_bp = Blueprint("jobs", __name__)
 
+# A pending extraction older than this was lost (process restarted) and is restarted
+JOB_EXTRACTION_STALE_SECONDS = int(os.getenv("JOB_EXTRACTION_STALE_SECONDS", 600))
+JOB_EXTRACTION_SWEEP_SECONDS = int(os.getenv("JOB_EXTRACTION_SWEEP_SECONDS", 300))
+
 
 def parse_object_id(id_str: str) -> ObjectId:
     try:
@@ -20,29 +33,39 @@ def parse_object_id(id_str: str) -> ObjectId:
         abort(400, description="Invalid job id")
 
 
+def invalid_payload(e: ValidationError, message: str = "Invalid job"):
+    """400 listing the validation errors (only their JSON-safe parts)."""
+    errors = [{"loc": list(err["loc"]), "msg": err["msg"], "type": err["type"]} for err in e.errors()]
+    return jsonify({"error": message, "details": errors}), 400
+
+
 @jobs_bp.post("")
 @jwt_required()
 def create_job():
     payload = request.get_json(silent=True) or {}
-    data = JobCreate(**payload).model_dump()
+    try:
+        data = JobCreate.model_validate(payload).model_dump()
+    except ValidationError as e:
+        return invalid_payload(e)
     now = datetime.utcnow()
 
-    # Run extraction immediately
-    extracted_dict, meta = extract_job_data(data.get("description", ""))
+    # Extraction runs in the background: the save is just a Mongo write
+    meta = pending_extraction_meta()
 
     doc = {
         **data,
         "status": "open",
         "created_at": now,
         "updated_at": now,
-        "extracted": extracted_dict,
+        **extraction_fields(None),
         "extraction": meta,
     }
 
     db = get_db()
     res = db.jobs.insert_one(doc)
-    saved = db.jobs.find_one({"_id": res.inserted_id})
-    return jsonify(serialize_job(saved)), 201
+    doc["_id"] = res.inserted_id
+    background.submit(run_job_extraction, res.inserted_id, data.get("description", ""), meta["request_id"])
+    return jsonify(serialize_job(doc)), 201
 
 
 
@@ -92,16 +115,17 @@ def get_job(job_id):
 @jwt_required()
 def update_job(job_id):
     payload = request.get_json(silent=True) or {}
-    data = JobUpdate(**payload).model_dump(exclude_unset=True)
+    try:
+        data = JobUpdate.model_validate(payload).model_dump(exclude_unset=True)
+    except ValidationError as e:
+        return invalid_payload(e)
 
     db = get_db()
     oid = parse_object_id(job_id)
 
     if "description" in data:
-        # If description changed, run extraction again
-        extracted_dict, meta = extract_job_data(data["description"])
-        data["extracted"] = extracted_dict
-        data["extraction"] = meta
+        # If description changed, run extraction again (in the background)
+        data["extraction"] = pending_extraction_meta()
 
     data["updated_at"] = datetime.utcnow()
 
@@ -114,9 +138,69 @@ def update_job(job_id):
     if not updated:
         abort(404, description="Job not found")
 
+    if "description" in data:
+        background.submit(run_job_extraction, oid, data["description"], data["extraction"]["request_id"])
+
+    if "weights" in data:
+        reweight_job_scores(db, oid, updated.get("weights"))
+
     return jsonify(serialize_job(updated))
 
 
+@jobs_bp.put("/<job_id>/weights")
+@jwt_required()
+def set_job_weights(job_id):
+    """
+    Save the job's weight profile and recompute the global score of all its
+    CVs from their stored subscores. No LLM call is made.
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        weights = Weights.model_validate(payload).model_dump()
+    except ValidationError as e:
+        return invalid_payload(e, "Invalid weights")
+
+    db = get_db()
+    oid = parse_object_id(job_id)
+
+    res = db.jobs.update_one(
+        {"_id": oid},
+        {"$set": {"weights": weights, "updated_at": datetime.utcnow()}}
+    )
+    if res.matched_count == 0:
+        abort(404, description="Job not found")
+
+    start = time.perf_counter()
+    rescored = reweight_job_scores(db, oid, weights)
+
+    return jsonify({
+        "job_id": job_id,
+        "weights": weights,
+        "rescored": rescored,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+    })
+
+
+def reweight_job_scores(db, job_oid, weights):
+    """
+    Server-side updates recomputing `score` from `subscores.*.score` for every
+    scored CV of the job, uploaded for it or linked to it. Returns the number updated.
+    """
+    modified = 0
+    for coll in (db.cvs, db.applications):
+        res = coll.update_many(
+            {"job_id": job_oid, "score": {"$exists": True}, "subscores": {"$exists": True}},
+            [{"$set": {"score": score_expression(weights)}}]
+        )
+        modified += res.modified_count
+        # The "can't reach the threshold" proof depended on the old weights
+        coll.update_many(
+            {"job_id": job_oid, "scoring.status": "below_threshold"},
+            {"$unset": {"scoring": ""}}
+        )
+    return modified
+
+
 
 @jobs_bp.delete("/<job_id>")
 @jwt_required()
@@ -126,38 +210,123 @@ def delete_job(job_id):
     res = db.jobs.delete_one({"_id": oid})
     if res.deleted_count == 0:
         abort(404, description="Job not found")
+    db.applications.delete_many({"job_id": oid})
+    talent_pool.forget_job(oid)
     return ("", 204)
 
 
-def extract_job_data(description: str):
+@jobs_bp.post("/<job_id>/candidates")
+@jwt_required()
+def add_candidates(job_id):
     """
-    Returns (extracted_dict, meta) from Gemini.
-    Does NOT touch the database.
+    Associate stored CVs with this job without re-extracting them.
+    Body: {"cv_ids": [...]} or {"all": true} for the whole candidate pool.
+    Scores are then computed by /api/matchings/generate_scores/<job_id>.
     """
-    now = datetime.utcnow()
-    try:
-        extracted = extract_job_requirements(description)
-        extracted_dict = extracted.model_dump()
-        meta = {
-            "provider": "gemini",
-            "model": "gemini-2.5-pro",
-            "prompt_version": "v1",
-            "status": "succeeded",
-            "extracted_at": now,
-            "error": None,
-        }
-    except JobExtractionError as e:
-        extracted_dict = None
-        meta = {
-            "provider": "gemini",
-            "model": "gemini-2.5-pro",
-            "prompt_version": "v1",
-            "status": "failed",
-            "extracted_at": now,
-            "error": str(e),
-        }
-
-    return extracted_dict, meta
+    payload = request.get_json(silent=True) or {}
+    db = get_db()
+    oid = parse_object_id(job_id)
+    if not db.jobs.find_one({"_id": oid}, {"_id": 1}):
+        abort(404, description="Job not found")
+
+    if payload.get("all"):
+        cv_ids = [d["_id"] for d in db.cvs.find({"job_id": {"$ne": oid}}, {"_id": 1})]
+    else:
+        try:
+            cv_ids = [ObjectId(i) for i in payload.get("cv_ids", [])]
+        except Exception:
+            abort(400, description="Invalid CV id")
+        cv_ids = [d["_id"] for d in db.cvs.find({"_id": {"$in": cv_ids}}, {"_id": 1})]
+
+    linked = link_cvs_to_job(db, cv_ids, oid)
+    return jsonify({"job_id": job_id, "linked": linked, "requested": len(cv_ids)})
+
+
+@jobs_bp.get("/<job_id>/applications")
+@jwt_required()
+def list_applications(job_id):
+    """
+    CVs linked to this job through `applications` (i.e. not uploaded for it),
+    best score first.
+    """
+    db = get_db()
+    oid = parse_object_id(job_id)
+    applications = list(db.applications.find({"job_id": oid}).sort("score", -1))
+    cvs = {
+        d["_id"]: d
+        for d in db.cvs.find({"_id": {"$in": [a["cv_id"] for a in applications]}}, {"extracted.name": 1, "filename": 1})
+    }
+    return jsonify([serialize_application(a, cvs.get(a["cv_id"], {})) for a in applications])
+
+
+def pending_extraction_meta():
+    return {
+        "provider": "gemini",
+        "model": extraction_model,
+        "prompt_version": EXTRACTION_PROMPT_VERSION,
+        "status": "pending",
+        # Identifies this run: a result from an older, superseded run is discarded
+        "request_id": str(ObjectId()),
+        "requested_at": datetime.utcnow(),
+        "error": None,
+    }
+
+
+def run_job_extraction(job_oid, description: str, request_id: str):
+    """
+    Background worker: extract requirements and store them on the job,
+    unless the description changed (new request_id) in the meantime.
+    """
+    with llm_context("normal", tenant=f"job:{job_oid}"):
+        extracted_dict, meta = extract_job_data(description)
+    meta["request_id"] = request_id
+    get_db().jobs.update_one(
+        {"_id": job_oid, "extraction.request_id": request_id},
+        {"$set": {**extraction_fields(extracted_dict), "extraction": meta, "updated_at": datetime.utcnow()}}
+    )
+
+
+def sweep_stale_extractions(db=None) -> int:
+    """
+    Restart extractions left "pending" for longer than JOB_EXTRACTION_STALE_SECONDS:
+    the background pool is in-process, so a restart loses what it was running.
+    Each job is re-armed with a new request_id by a conditional update, so
+    when several processes sweep at once only one of them resubmits it.
+    """
+    db = db or get_db()
+    cutoff = datetime.utcnow() - timedelta(seconds=JOB_EXTRACTION_STALE_SECONDS)
+    restarted = 0
+    stale = db.jobs.find(
+        {"extraction.status": "pending", "extraction.requested_at": {"$lt": cutoff}},
+        {"description": 1, "extraction.request_id": 1}
+    )
+    for job in stale:
+        meta = pending_extraction_meta()
+        res = db.jobs.update_one(
+            {"_id": job["_id"], "extraction.request_id": job["extraction"].get("request_id")},
+            {"$set": {"extraction": meta}}
+        )
+        if res.modified_count:
+            background.submit(run_job_extraction, job["_id"], job.get("description", ""), meta["request_id"])
+            restarted += 1
+    return restarted
+
+
+@jobs_bp.get("/<job_id>/extraction")
+@jwt_required()
+def get_job_extraction(job_id):
+    """Poll the state of the job's requirement extraction."""
+    db = get_db()
+    oid = parse_object_id(job_id)
+    job = db.jobs.find_one({"_id": oid}, {"extraction": 1, "extracted": 1})
+    if not job:
+        abort(404, description="Job not found")
+
+    return jsonify({
+        "job_id": job_id,
+        "extraction": job.get("extraction"),
+        "extracted": job.get("extracted")
+    })
 
 
 '''@jobs_bp.post("/<job_id>/extract")
@@ -186,12 +355,13 @@ def extract_job(job_id):
     if not job:
         abort(404, description="Job not found")
 
-    # Extract data from the description
-    extracted_dict, meta = extract_job_data(job.get("description", ""))
+    # Extract data from the description, the recruiter is waiting on it
+    with llm_context("interactive", tenant=f"job:{oid}"):
+        extracted_dict, meta = extract_job_data(job.get("description", ""))
 
     # Update the job document with the extracted data
     update_data = {
-        "extracted": extracted_dict,
+        **extraction_fields(extracted_dict),
         "extraction": meta,
         "updated_at": datetime.utcnow()
     }
@@ -1,61 +1,106 @@
-from flask import Blueprint, jsonify
+import time
+from flask import Blueprint, jsonify, request
 from db import get_db
-from services.matching import score_calculate  # the scoring function we wrote
+from services.matching import MatchingError
+from services.work_queue import (
+    enqueue_scoring, claim, process_task, queue_stats, new_worker_id, extraction_ready, JobNotReady
+)
+from services.applications import link_cvs_to_job
+from services.talent_pool import talent_pool
+from services.scoring import justify_scores
+from services.llm_client import llm_context
+from services.write_batcher import WriteBatcher
 from bson import ObjectId
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 match_bp = Blueprint("matchings", __name__)
 
+
+def not_ready(job):
+    """409 for a job whose requirements are still being (or failed to be) extracted."""
+    extraction = job.get("extraction") or {}
+    return jsonify({
+        "error": "Job requirements are not extracted yet",
+        "extraction": {"status": extraction.get("status"), "error": extraction.get("error")}
+    }), 409
+
+
 @match_bp.get("/generate_scores/<job_id>")
 @jwt_required()
 def generate_scores(job_id):
     """
-    For all CVs associated with job_id that have no score,
+    For all CVs associated with job_id that have no score, or whose score was
+    computed from other inputs (requirements, CV fields, model, prompt version),
     calculate the matching score vs job description and save it in DB.
+
+    Optional `?threshold=0.6`: stop scoring a CV as soon as it provably can't
+    reach the cutoff; it is saved as "below_threshold" with its partial subscores
+    and only picked up again if a later threshold is low enough.
+
+    Pairs go through the `scoring_tasks` queue. `?async=1` only queues them for
+    the standalone workers (normal priority); otherwise this request works the
+    job's queue itself, with interactive LLM priority.
     """
     try:
+        threshold = request.args.get("threshold", type=float)
         db = get_db()
 
         # 1. Fetch job
         job = db.jobs.find_one({"_id": ObjectId(job_id)})
         if not job:
             return jsonify({"error": "Job not found"}), 404
+        if not extraction_ready(job):
+            return not_ready(job)
 
-        job_extracted = job.get("extracted", {})
+        # 2. Queue CVs for this job whose score is missing or stale, uploaded
+        #    for it or linked to it through `applications`. A pair already queued
+        #    by a concurrent call or a worker is not queued twice.
+        run_async = bool(request.args.get("async", type=int))
+        try:
+            queued = enqueue_scoring(db, job, threshold, priority="normal" if run_async else "interactive")
+        except JobNotReady:
+            return not_ready(job)  # extraction restarted since the check above
 
-        # 2. Fetch only CVs for this job that don't yet have a score
-        cvs = list(db.cvs.find({
-            "job_id": ObjectId(job_id),
-            "score": {"$exists": False}  # only CVs with no score
-        }))
-        
-        if not cvs:
+        if run_async:
+            # Left to the standalone workers (worker.py)
             return jsonify({
                 "job_id": str(job["_id"]),
-                "cvs": [],
-                "message": "No new CVs without scores or no cvs associated"
-            })
+                "queued": queued,
+                "tasks": queue_stats(db, job["_id"])
+            }), 202
 
         results = []
 
-        # 3. Score each CV
-
-        for cv in cvs:
-            cv_extracted = cv.get("extracted", {})
-            score_details = score_calculate(job_extracted, cv_extracted)
-
-            db.cvs.update_one(
-                {"_id": cv["_id"]},
-                {"$set": {
-                    "score": score_details["score"],      # ✅ global score
-                    "subscores": score_details["subscores"]  # ✅ detailed breakdown
-                }}
-            )
+        # 3. Score this job's tasks in this request, side by side with any
+        #    other caller or worker: each task is leased by exactly one of them
+        #    Scores and task outcomes are written in unordered batches.
+        worker_id = new_worker_id()
+        requeued = []  # left to a later run even once their backoff is over
+        with WriteBatcher(db) as writes:
+            while True:
+                task = claim(db, worker_id, job["_id"], exclude_ids=requeued)
+                if not task:
+                    break
+                try:
+                    result = process_task(db, task, worker_id, priority="interactive", writes=writes)
+                    results.append(result)
+                    if result.get("requeued"):
+                        requeued.append(task["_id"])
+                except MatchingError as e:
+                    # Provider is down: don't burn through the rest of the batch
+                    results.append({
+                        "cv_id": str(task["cv_id"]),
+                        "status": "failed",
+                        "retryable": e.retryable,
+                        "error": str(e)
+                    })
+                    break
 
-            results.append({
-                "cv_id": str(cv["_id"]),
-                "score": score_details["score"],
-                "subscores": score_details["subscores"]
+        if not results:
+            return jsonify({
+                "job_id": str(job["_id"]),
+                "cvs": [],
+                "message": "No new CVs without scores or no cvs associated"
             })
 
         return jsonify({
@@ -68,6 +113,170 @@ def generate_scores(job_id):
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@match_bp.get("/tasks/<job_id>")
+@jwt_required()
+def scoring_tasks(job_id):
+    """Scoring queue state for a job: number of tasks per status."""
+    try:
+        oid = ObjectId(job_id)
+    except Exception:
+        return jsonify({"error": "Invalid job_id"}), 400
+    return jsonify({"job_id": job_id, "tasks": queue_stats(get_db(), oid)})
+
+
+def _pool_job(db, job_id):
+    """(job, None) for a job ready to be ranked, else (None, error response)."""
+    try:
+        oid = ObjectId(job_id)
+    except Exception:
+        return None, (jsonify({"error": "Invalid job_id"}), 400)
+    job = db.jobs.find_one({"_id": oid})
+    if not job:
+        return None, (jsonify({"error": "Job not found"}), 404)
+    if not extraction_ready(job):
+        return None, not_ready(job)
+    return job, None
+
+
+@match_bp.get("/pool/<job_id>")
+@jwt_required()
+def rank_talent_pool(job_id):
+    """
+    Rank every stored CV against the job's extracted requirements with cheap
+    local features (skill overlap, degree level), from the in-process talent
+    pool index, synced with the database first. Only candidates sharing at
+    least one required skill are listed. Query params: page, limit.
+    """
+    db = get_db()
+    job, error = _pool_job(db, job_id)
+    if error:
+        return error
+
+    page = max(1, request.args.get("page", 1, type=int))
+    limit = max(1, min(100, request.args.get("limit", 20, type=int)))
+
+    start = time.perf_counter()
+    talent_pool.ensure_loaded(db)
+    rows = talent_pool.rank(job["_id"], job.get("extracted") or {}, job.get("weights"))
+    page_rows = rows[(page - 1) * limit: page * limit]
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    page_ids = [ObjectId(cv_id) for _, cv_id in page_rows]
+    cvs = {str(d["_id"]): d for d in db.cvs.find({"_id": {"$in": page_ids}}, {"extracted.name": 1, "filename": 1, "job_id": 1})}
+    items = [
+        {
+            "cv_id": cv_id,
+            "name": (cvs.get(cv_id, {}).get("extracted") or {}).get("name"),
+            "filename": cvs.get(cv_id, {}).get("filename"),
+            "local_score": -neg_score
+        }
+        for neg_score, cv_id in page_rows
+    ]
+
+    return jsonify({
+        "job_id": job_id,
+        "items": items,
+        "page": page,
+        "limit": limit,
+        "total": len(rows),
+        "elapsed_ms": elapsed_ms
+    })
+
+
+@match_bp.post("/pool/<job_id>/score")
+@jwt_required()
+def score_talent_pool(job_id):
+    """
+    Link the job's N best talent pool candidates (local ranking) to it and run
+    full LLM scoring on them in this request, with interactive priority.
+    JSON body: {"top": N}, at most 50.
+    """
+    db = get_db()
+    job, error = _pool_job(db, job_id)
+    if error:
+        return error
+
+    payload = request.get_json(silent=True) or {}
+    try:
+        top = max(1, min(50, int(payload.get("top", 10))))
+    except (TypeError, ValueError):
+        return jsonify({"error": "top must be an integer"}), 400
+
+    talent_pool.ensure_loaded(db)
+    rows = talent_pool.rank(job["_id"], job.get("extracted") or {}, job.get("weights"))
+    top_ids = [ObjectId(cv_id) for _, cv_id in rows[:top]]
+    if not top_ids:
+        return jsonify({"job_id": job_id, "linked": 0, "scored": []})
+
+    linked = link_cvs_to_job(db, top_ids, job["_id"])
+    try:
+        enqueue_scoring(db, job, cv_ids=top_ids, priority="interactive")
+    except JobNotReady:
+        return not_ready(job)
+
+    scored = []
+    worker_id = new_worker_id()
+    requeued = []
+    with WriteBatcher(db) as writes:
+        while True:
+            task = claim(db, worker_id, job["_id"], top_ids, exclude_ids=requeued)
+            if not task:
+                break
+            try:
+                result = process_task(db, task, worker_id, priority="interactive", writes=writes)
+                scored.append(result)
+                if result.get("requeued"):
+                    requeued.append(task["_id"])
+            except MatchingError as e:
+                scored.append({"cv_id": str(task["cv_id"]), "status": "failed", "retryable": e.retryable, "error": str(e)})
+                break
+
+    return jsonify({"job_id": job_id, "linked": linked, "scored": scored})
+
+
+@match_bp.get("/details/<job_id>/<cv_id>")
+@jwt_required()
+def score_details(job_id, cv_id):
+    """
+    Subscores of one scored CV for a job, with their justifications. Scores
+    computed in scores-only mode get their justifications written now (only
+    for the LLM-scored dimensions) and cached, so later views cost nothing.
+    """
+    db = get_db()
+    try:
+        job_oid, cv_oid = ObjectId(job_id), ObjectId(cv_id)
+    except Exception:
+        return jsonify({"error": "Invalid job_id or cv_id"}), 400
+
+    job = db.jobs.find_one({"_id": job_oid}, {"extracted": 1})
+    cv = db.cvs.find_one({"_id": cv_oid}, {"extracted": 1, "job_id": 1, "score": 1, "subscores": 1, "scoring": 1})
+    if not job or not cv:
+        return jsonify({"error": "Job or CV not found"}), 404
+    application = None
+    if cv.get("job_id") != job_oid:
+        application = db.applications.find_one({"cv_id": cv_oid, "job_id": job_oid})
+        if not application:
+            return jsonify({"error": "CV is not associated with this job"}), 404
+    record = application or cv
+    if not record.get("subscores"):
+        return jsonify({"error": "CV is not scored for this job"}), 404
+
+    try:
+        with llm_context("interactive", tenant=f"user:{get_jwt_identity()}"):
+            subscores = justify_scores(db, job, cv, application)
+    except MatchingError as e:
+        return jsonify({"error": str(e), "retryable": e.retryable}), 503
+
+    return jsonify({
+        "job_id": job_id,
+        "cv_id": cv_id,
+        "score": record.get("score"),
+        "subscores": subscores
+    })
+
+
 """
 
         for cv in cvs:
@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Dict, Iterable
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+
+def link_cvs_to_job(db, cv_ids: Iterable[ObjectId], job_id: ObjectId) -> int:
+    """
+    Associate already stored (parsed and extracted) CVs with a job, without
+    re-extraction. The CV's own `job_id` stays its primary association; every
+    other job gets one `applications` document per (cv, job) holding its score.
+    Returns the number of new associations.
+    """
+    cv_ids = list(cv_ids)
+    if not cv_ids:
+        return 0
+
+    # A CV already uploaded for this job needs no extra association
+    primary = {d["_id"] for d in db.cvs.find({"_id": {"$in": cv_ids}, "job_id": job_id}, {"_id": 1})}
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"cv_id": cv_id, "job_id": job_id},
+            {"$setOnInsert": {"cv_id": cv_id, "job_id": job_id, "created_at": now, "updated_at": now}},
+            upsert=True
+        )
+        for cv_id in cv_ids if cv_id not in primary
+    ]
+    if not ops:
+        return 0
+    res = db.applications.bulk_write(ops, ordered=False)
+    return res.upserted_count
+
+
+def serialize_application(doc: Dict, cv: Dict = None) -> Dict:
+    out = {
+        "id": str(doc["_id"]),
+        "cv_id": str(doc["cv_id"]),
+        "job_id": str(doc["job_id"]),
+        "score": doc.get("score"),
+        "subscores": doc.get("subscores", {}),
+        "scoring": doc.get("scoring"),
+        "created_at": doc["created_at"].isoformat() if isinstance(doc.get("created_at"), datetime) else doc.get("created_at"),
+    }
+    if cv is not None:
+        out["name"] = (cv.get("extracted") or {}).get("name")
+        out["filename"] = cv.get("filename")
+    return out
@@ -0,0 +1,131 @@
+import os
+import tarfile
+import zipfile
+import zlib
+from typing import BinaryIO, Iterator, Tuple
+
+ARCHIVE_MAX_ENTRIES = int(os.getenv("ARCHIVE_MAX_ENTRIES", 1000))
+ARCHIVE_MAX_TOTAL_BYTES = int(os.getenv("ARCHIVE_MAX_TOTAL_BYTES", 500 * 1024 * 1024))
+ARCHIVE_MAX_ENTRY_BYTES = int(os.getenv("ARCHIVE_MAX_ENTRY_BYTES", 20 * 1024 * 1024))
+ARCHIVE_MAX_RATIO = float(os.getenv("ARCHIVE_MAX_RATIO", 100))
+# Below this, ratios are meaningless (tiny or highly repetitive PDFs)
+RATIO_MIN_BYTES = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """The archive is unreadable or breaks a limit; nothing after it is read."""
+    pass
+
+
+class _CountingReader:
+    """Counts the bytes read from the underlying (compressed) stream."""
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        self.count = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.count += len(data)
+        return data
+
+
+class _LimitedReader:
+    """
+    Entry stream enforcing the size limits on the bytes actually decompressed,
+    not on the sizes the archive headers claim.
+    """
+
+    def __init__(self, raw: BinaryIO, name: str, budget: "_Budget", compressed_size=None):
+        self.raw = raw
+        self.name = name
+        self.budget = budget
+        self.compressed_size = compressed_size
+        self.size = 0
+
+    def read(self, size=-1):
+        try:
+            data = self.raw.read(size)
+        except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError) as e:
+            raise ArchiveError(f"{self.name}: corrupt entry: {e}")
+        self.size += len(data)
+        self.budget.add(len(data))
+        if self.size > ARCHIVE_MAX_ENTRY_BYTES:
+            raise ArchiveError(f"{self.name}: larger than {ARCHIVE_MAX_ENTRY_BYTES} bytes")
+        if self.compressed_size is not None and self.size > RATIO_MIN_BYTES \
+                and self.size > ARCHIVE_MAX_RATIO * max(1, self.compressed_size):
+            raise ArchiveError(f"{self.name}: compression ratio above {ARCHIVE_MAX_RATIO:g}")
+        return data
+
+
+class _Budget:
+    def __init__(self, compressed: _CountingReader = None):
+        self.total = 0
+        self.entries = 0
+        self.compressed = compressed
+
+    def add(self, n: int):
+        self.total += n
+        if self.total > ARCHIVE_MAX_TOTAL_BYTES:
+            raise ArchiveError(f"archive expands to more than {ARCHIVE_MAX_TOTAL_BYTES} bytes")
+        if self.compressed is not None and self.total > RATIO_MIN_BYTES \
+                and self.total > ARCHIVE_MAX_RATIO * max(1, self.compressed.count):
+            raise ArchiveError(f"archive compression ratio above {ARCHIVE_MAX_RATIO:g}")
+
+    def entry(self):
+        self.entries += 1
+        if self.entries > ARCHIVE_MAX_ENTRIES:
+            raise ArchiveError(f"archive has more than {ARCHIVE_MAX_ENTRIES} entries")
+
+
+def archive_kind(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar.gz"
+    raise ArchiveError("archive must be a .zip, .tar.gz or .tgz file")
+
+
+def iter_archive_pdfs(fileobj: BinaryIO, filename: str) -> Iterator[Tuple[str, BinaryIO]]:
+    """
+    Yield (entry name, stream) for each PDF of a ZIP or tar.gz archive, one
+    entry at a time: an entry is decompressed while its stream is read and
+    must be consumed before the next one is requested. Nothing is unpacked to
+    disk. Entry count, per-entry and total decompressed size and compression
+    ratio are enforced while reading; breaking one raises ArchiveError.
+    """
+    kind = archive_kind(filename)
+    if kind == "zip":
+        # The ZIP index is at the end: needs a seekable file (the spooled upload)
+        try:
+            archive = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile as e:
+            raise ArchiveError(f"invalid ZIP archive: {e}")
+        budget = _Budget()
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                budget.entry()
+                if not info.filename.lower().endswith(".pdf") or info.flag_bits & 0x1:
+                    continue  # not a CV, or encrypted
+                with archive.open(info) as raw:
+                    yield info.filename, _LimitedReader(raw, info.filename, budget, info.compress_size)
+        return
+
+    # tar.gz is read as a pure stream ("r|gz"): no seeking, no temp copy
+    counting = _CountingReader(fileobj)
+    budget = _Budget(counting)
+    try:
+        with tarfile.open(fileobj=counting, mode="r|gz") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                budget.entry()
+                if not member.name.lower().endswith(".pdf"):
+                    continue
+                raw = archive.extractfile(member)
+                yield member.name, _LimitedReader(raw, member.name, budget)
+    except (tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"invalid tar.gz archive: {e}")
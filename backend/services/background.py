@@ -0,0 +1,36 @@
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Work that must not hold the recruiter's request (LLM extraction after a save, ...)
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("BACKGROUND_WORKERS", 4)),
+    thread_name_prefix="background",
+)
+
+
+def _run(fn, *args, **kwargs):
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        # Nobody waits on the future: make failures visible in the server log
+        traceback.print_exc()
+
+
+def submit(fn, *args, **kwargs):
+    """Run `fn(*args, **kwargs)` in the background worker pool."""
+    return _executor.submit(_run, fn, *args, **kwargs)
+
+
+def every(seconds: float, fn, *args, **kwargs):
+    """Run `fn(*args, **kwargs)` now and then every `seconds`, in a daemon thread."""
+    def loop():
+        while True:
+            _run(fn, *args, **kwargs)
+            time.sleep(seconds)
+
+    thread = threading.Thread(target=loop, name=f"every-{fn.__name__}", daemon=True)
+    thread.start()
+    return thread
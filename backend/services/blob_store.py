@@ -0,0 +1,183 @@
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import BinaryIO, Optional, Tuple
+
+BLOB_BACKEND = os.getenv("CV_STORAGE_BACKEND", "local")  # "local" or "gridfs"
+BLOB_ROOT = os.getenv("CV_STORAGE_ROOT") or os.path.join(os.getcwd(), "uploads", "blobs")
+READ_BLOCK = 1 << 20
+# A blob no CV references is only removed once it has been unused this long:
+# an upload still extracting (its CV not inserted yet) may be holding it
+BLOB_GC_GRACE_SECONDS = int(os.getenv("CV_STORAGE_GC_GRACE_SECONDS", 86400))
+BLOB_GC_SWEEP_SECONDS = int(os.getenv("CV_STORAGE_GC_SWEEP_SECONDS", 3600))
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+def _spool_and_hash(stream: BinaryIO, out: BinaryIO) -> Tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    for block in iter(lambda: stream.read(READ_BLOCK), b""):
+        digest.update(block)
+        out.write(block)
+        size += len(block)
+    return digest.hexdigest(), size
+
+
+class LocalBlobStore:
+    """
+    Content-addressed files on disk: a blob lives at <root>/ab/cd/<sha256>.
+    Two-level sharding keeps directories small; identical uploads share one file.
+    Writes go to a temp file in the same filesystem and are renamed into place,
+    so a reader never sees a partial blob.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self.path(digest))
+
+    def size(self, digest: str) -> int:
+        return os.path.getsize(self.path(digest))
+
+    def put(self, stream: BinaryIO) -> Tuple[str, int]:
+        """Store the stream, returns (sha256, size)."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                digest, size = _spool_and_hash(stream, out)
+                out.flush()
+                os.fsync(out.fileno())
+            final = self.path(digest)
+            if os.path.exists(final):
+                os.remove(tmp_path)  # already stored: dedup
+            else:
+                os.makedirs(os.path.dirname(final), exist_ok=True)
+                os.replace(tmp_path, final)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, size
+
+    def open(self, digest: str) -> BinaryIO:
+        try:
+            return open(self.path(digest), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(digest)
+
+    def delete(self, digest: str):
+        try:
+            os.remove(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+
+class GridFSBlobStore:
+    """
+    Same contract backed by GridFS (bucket `cv_files`, file _id = sha256), for
+    deployments where the API servers share no disk.
+    """
+
+    def __init__(self, db):
+        import gridfs  # ships with pymongo
+        from gridfs import errors
+
+        self.fs = gridfs.GridFS(db, collection="cv_files")
+        self.errors = errors
+
+    def path(self, digest: str) -> Optional[str]:
+        return None  # not on a local filesystem: no sendfile
+
+    def exists(self, digest: str) -> bool:
+        return self.fs.exists(digest)
+
+    def size(self, digest: str) -> int:
+        return self.open(digest).length
+
+    def put(self, stream: BinaryIO) -> Tuple[str, int]:
+        # The hash (the _id) is only known at the end: spool first
+        with tempfile.SpooledTemporaryFile(max_size=8 * READ_BLOCK) as spool:
+            digest, size = _spool_and_hash(stream, spool)
+            if not self.fs.exists(digest):
+                spool.seek(0)
+                try:
+                    self.fs.put(spool, _id=digest, content_type="application/pdf")
+                except self.errors.FileExists:
+                    pass  # stored concurrently
+        return digest, size
+
+    def open(self, digest: str) -> BinaryIO:
+        try:
+            return self.fs.get(digest)
+        except self.errors.NoFile:
+            raise BlobNotFound(digest)
+
+    def delete(self, digest: str):
+        self.fs.delete(digest)
+
+
+_store = None
+
+
+def get_blob_store():
+    global _store
+    if _store is None:
+        if BLOB_BACKEND == "gridfs":
+            from db import get_db
+
+            _store = GridFSBlobStore(get_db())
+        else:
+            _store = LocalBlobStore(BLOB_ROOT)
+    return _store
+
+
+def release_blob(db, digest: str):
+    """
+    Mark a blob as possibly unreferenced (its CV was deleted, or never
+    stored). It is not deleted here: collect_orphan_blobs() does, after the
+    grace period, if no CV references it by then.
+    """
+    now = datetime.utcnow()
+    db.blob_orphans.update_one({"_id": digest}, {"$max": {"used_at": now}}, upsert=True)
+
+
+def touch_blob(db, digest: str):
+    """Restart the grace period of a blob marked as orphan: an upload is using it."""
+    db.blob_orphans.update_one({"_id": digest}, {"$max": {"used_at": datetime.utcnow()}})
+
+
+def collect_orphan_blobs(db=None, store=None, grace_seconds: int = BLOB_GC_GRACE_SECONDS) -> int:
+    """
+    Delete the marked blobs unused for `grace_seconds` that no CV references
+    (as its file or its thumbnail). A mark is only removed if the blob was
+    not used since it was read, so an upload touching it meanwhile keeps it.
+    Returns the number of blobs deleted.
+    """
+    if db is None:
+        from db import get_db
+
+        db = get_db()
+    store = store or get_blob_store()
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    deleted = 0
+    for mark in db.blob_orphans.find({"used_at": {"$lte": cutoff}}):
+        digest = mark["_id"]
+        referenced = db.cvs.find_one(
+            {"$or": [{"file_hash": digest}, {"preview.thumbnail_hash": digest}]}, {"_id": 1}
+        )
+        if not db.blob_orphans.delete_one({"_id": digest, "used_at": mark["used_at"]}).deleted_count:
+            continue  # used since: checked again on a later sweep
+        if not referenced:
+            store.delete(digest)
+            deleted += 1
+    return deleted
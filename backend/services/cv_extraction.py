@@ -1,50 +1,155 @@
 import os
 import re
 import json
-from dotenv import load_dotenv
-import google.generativeai as genai
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from pydantic import ValidationError
 from models.cv import ExtractedCV
+from services.llm_client import generate_content, LLMError
+from services.text_compaction import split_sections
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+model_name = "gemini-2.0-flash"
+# Bump when the prompts change: CVs extracted with an older one are re-extracted by the backfill
+PROMPT_VERSION = "v2"
+
+# Above this size the CV is extracted in chunks, in parallel, then merged locally
+CHUNK_THRESHOLD_CHARS = int(os.getenv("CV_CHUNK_THRESHOLD_CHARS", 12000))
+CHUNK_SIZE_CHARS = int(os.getenv("CV_CHUNK_SIZE_CHARS", 6000))
+CHUNK_MAX_WORKERS = int(os.getenv("CV_CHUNK_MAX_WORKERS", 4))
+
+SCALAR_FIELDS = ("name", "email", "summary")
+LIST_FIELDS = ("education", "experiences", "responsabilities", "tech_skills", "soft_skills", "certificates")
+ALL_FIELDS = SCALAR_FIELDS + LIST_FIELDS
+# Filled by the heuristic extractor when it finds them; the LLM is only asked
+# for the other (semantic) fields, and for these when the heuristics found nothing
+REGULAR_FIELDS = ("name", "email", "education", "certificates")
 
 
 class CVExtractionError(Exception):
-    pass
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
 
 
-def extract_cv_details(cv_text: str) -> ExtractedCV:
+def extract_cv_details(cv_text: str, known: Optional[Dict] = None) -> ExtractedCV:
     """
     Calls Gemini to extract candidate details from CV text.
+    Fields already filled in `known` (the heuristic extractor's name, email,
+    education and certificates, validated by the caller) are neither asked
+    nor sent: the prompt only lists the remaining fields. Long CVs are split
+    into chunks extracted concurrently and merged locally, so latency is
+    bounded by the slowest chunk rather than the whole document.
+    """
+    known = {k: v for k, v in (known or {}).items() if v and k in REGULAR_FIELDS}
+    fields = [f for f in ALL_FIELDS if f not in known]
+
+    if len(cv_text) <= CHUNK_THRESHOLD_CHARS:
+        result = _extract_text(cv_text, fields)
+    else:
+        chunks = split_into_chunks(cv_text, CHUNK_SIZE_CHARS)
+        if len(chunks) == 1:
+            result = _extract_text(cv_text, fields)
+        else:
+            with ThreadPoolExecutor(max_workers=min(CHUNK_MAX_WORKERS, len(chunks))) as pool:
+                # Each chunk copies the caller's context: same LLM priority class and tenant
+                futures = [
+                    pool.submit(contextvars.copy_context().run, _extract_text, chunk, fields, f"This is part {i + 1} of {len(chunks)} of the CV. "
+                                "Only report what appears in this part; use null or [] for anything missing.")
+                    for i, chunk in enumerate(chunks)
+                ]
+                # Any failing chunk fails the whole CV: a partial profile must not look complete
+                parts = [f.result() for f in futures]
+            result = merge_extractions(parts)
+
+    if not known:
+        return result
+    # Validated again: a known value must not bypass the schema
+    merged = {**result.model_dump(), **known}
+    try:
+        return ExtractedCV.model_validate(merged)
+    except ValidationError:
+        return result
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """
+    Pack whole sections into chunks of at most `max_chars`.
+    A section larger than that is split on line boundaries.
+    """
+    pieces = []
+    for _, body in split_sections(text):
+        if len(body) <= max_chars:
+            pieces.append(body)
+            continue
+        current = []
+        size = 0
+        for line in body.split("\n"):
+            if current and size + len(line) + 1 > max_chars:
+                pieces.append("\n".join(current))
+                current, size = [], 0
+            current.append(line)
+            size += len(line) + 1
+        if current:
+            pieces.append("\n".join(current))
+
+    chunks = []
+    current, size = [], 0
+    for piece in pieces:
+        if current and size + len(piece) + 1 > max_chars:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 1
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def merge_extractions(parts: List[ExtractedCV]) -> ExtractedCV:
     """
+    Merge chunk results in document order: first non-empty value wins for
+    scalar fields, list fields are concatenated without duplicates.
+    """
+    merged = {}
+    for field in SCALAR_FIELDS:
+        merged[field] = next((getattr(p, field) for p in parts if getattr(p, field)), None)
+    for field in LIST_FIELDS:
+        seen = set()
+        items = []
+        for p in parts:
+            for item in getattr(p, field) or []:
+                key = " ".join(str(item).lower().split())
+                if key and key not in seen:
+                    seen.add(key)
+                    items.append(item)
+        merged[field] = items
+    return ExtractedCV(**merged)
+
+
+def _extract_text(cv_text: str, fields=ALL_FIELDS, note: str = "") -> ExtractedCV:
+    keys = "\n".join(
+        f"- {f}: {'string' if f in SCALAR_FIELDS else 'list of strings'}" for f in fields
+    )
     prompt = f"""
 You are an assistant that extracts structured candidate information from resumes.
 
 Return a JSON object with these keys:
-- name: string
-- email: string
-- summary: string
-- education: list of strings
-- experiences: list of strings
-- responsabilities: list of strings
-- tech_skills: list of strings
-- soft_skills: list of strings
-- certificates: list of strings
+{keys}
 
 Only return valid JSON, no markdown fences, no extra text.
-
+{note}
 CV text:
 \"\"\"{cv_text}\"\"\"
 """
 
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt)
+        response = generate_content(model_name, prompt)
         print("+++++++++++",prompt)
         print("response --",response)
 
         if not response.candidates or not response.candidates[0].content.parts:
-            raise CVExtractionError("Empty response from Gemini")
+            raise CVExtractionError("Empty response from Gemini", retryable=True)
 
         raw_text = response.candidates[0].content.parts[0].text.strip()
         print("gemini resulttt",raw_text)
@@ -61,5 +166,10 @@ CV text:
 
         return ExtractedCV(**parsed)
 
+    except LLMError as e:
+        raise CVExtractionError(str(e), retryable=e.retryable)
+    except CVExtractionError:
+        raise
     except Exception as e:
-        raise CVExtractionError(str(e))
+        # Malformed model output: a new attempt may well succeed
+        raise CVExtractionError(str(e), retryable=True)
@@ -0,0 +1,79 @@
+from datetime import datetime
+
+import pdfplumber
+from pydantic import ValidationError
+
+from models.cv import ExtractedCV
+from services.cv_extraction import extract_cv_details, CVExtractionError, model_name, PROMPT_VERSION
+from services.heuristic_extraction import extract_contact_and_education
+from services.text_compaction import compact_cv_text
+
+
+def read_pdf_text(source):
+    """
+    Returns (text, compaction_stats): the PDF text with layout noise
+    (headers/footers, page numbers, decorative glyphs...) stripped for the prompt.
+    """
+    with pdfplumber.open(source) as pdf:
+        text_pages = [page.extract_text() or "" for page in pdf.pages]
+    return compact_cv_text(text_pages)
+
+
+def _validated(fields: dict) -> dict:
+    """Heuristic fields through the schema; a value it rejects (e.g. a malformed email) is dropped."""
+    try:
+        return ExtractedCV(**fields).model_dump()
+    except ValidationError as e:
+        bad = {err["loc"][0] for err in e.errors() if err.get("loc")}
+        return ExtractedCV(**{k: v for k, v in fields.items() if k not in bad}).model_dump()
+
+
+def extract_cv_data(file_content: str, mode: str = "full"):
+    """
+    Returns (extracted_dict, meta).
+    Name, email, education and certificates found by the local heuristic
+    extractor are the whole result in "fast" mode (status "partial",
+    completed later via POST /<cv_id>/extract). In full mode Gemini is only
+    asked for the semantic fields, plus the regular ones the heuristics
+    missed; the heuristic values are checked against the schema, not sent.
+    If Gemini fails, the heuristic fields are kept and the failure is in `meta`.
+    Does NOT touch the database.
+    """
+    now = datetime.utcnow()
+    heuristic = extract_contact_and_education(file_content)
+    partial = _validated(heuristic)
+
+    if mode == "fast":
+        return partial, {
+            "status": "partial",
+            "method": "heuristic",
+            "retryable": True,
+            "extracted_at": now,
+            "error": None,
+        }
+
+    try:
+        extracted = extract_cv_details(file_content, known=partial)
+        extracted_dict = extracted.model_dump()
+        meta = {
+            "status": "succeeded",
+            "method": "heuristic+llm",
+            "model": model_name,
+            "prompt_version": PROMPT_VERSION,
+            "retryable": False,
+            "extracted_at": now,
+            "error": None,
+        }
+    except CVExtractionError as e:
+        extracted_dict = partial
+        meta = {
+            "status": "failed",
+            "method": "heuristic",
+            "model": model_name,
+            "prompt_version": PROMPT_VERSION,
+            "retryable": e.retryable,
+            "extracted_at": now,
+            "error": str(e),
+        }
+
+    return extracted_dict, meta
@@ -0,0 +1,120 @@
+import re
+from typing import Dict, List, Optional
+
+# Searched fields of `extracted`, with their text index weights: a skill or
+# name hit outranks the same word somewhere in an experience description
+SEARCH_WEIGHTS = {
+    "tech_skills": 10,
+    "name": 10,
+    "soft_skills": 5,
+    "summary": 3,
+    "experiences": 2,
+    "responsabilities": 1,
+}
+SNIPPET_CHARS = 160
+MAX_SNIPPETS = 3
+
+_TERM_RE = re.compile(r'-?"[^"]*"|-?\S+')
+
+
+def text_index_spec():
+    """(keys, options) of the `cvs` text index, created in init_db()."""
+    keys = [(f"extracted.{field}", "text") for field in SEARCH_WEIGHTS]
+    options = {
+        "weights": {f"extracted.{field}": w for field, w in SEARCH_WEIGHTS.items()},
+        "default_language": "english",
+        # CV documents have no language field: never let one change the stemming
+        "language_override": "search_language",
+        "name": "cv_search",
+    }
+    return keys, options
+
+
+def query_terms(q: str) -> List[str]:
+    """Words to highlight: the query's words and phrase words, negated ones excluded."""
+    terms = []
+    for token in _TERM_RE.findall(q or ""):
+        if token.startswith("-"):
+            continue
+        terms += [w.lower() for w in re.findall(r"\w+", token) if len(w) > 1]
+    return list(dict.fromkeys(terms))
+
+
+def _term_pattern(terms: List[str]) -> Optional[re.Pattern]:
+    if not terms:
+        return None
+    # The text index matches stems ("developer" finds "developing"): highlight
+    # any word sharing the term's stem-like prefix
+    stems = sorted({t if len(t) <= 4 else t[:max(4, len(t) - 3)] for t in terms}, key=len, reverse=True)
+    return re.compile(r"\b(?:" + "|".join(re.escape(s) for s in stems) + r")\w*", re.IGNORECASE)
+
+
+def _window(text: str, start: int, max_chars: int):
+    if len(text) <= max_chars:
+        return 0, text
+    begin = max(0, min(start - max_chars // 4, len(text) - max_chars))
+    if begin > 0:
+        space = text.find(" ", begin)
+        begin = space + 1 if 0 <= space < start else begin
+    return begin, text[begin:begin + max_chars]
+
+
+def highlight(extracted: Dict, q: str, max_chars: int = SNIPPET_CHARS, max_snippets: int = MAX_SNIPPETS) -> List[Dict]:
+    """
+    Snippets of the fields that matched, best weighted fields first, each
+    with the [start, end) offsets of the matched words in `text` (the
+    client marks them up; nothing here is HTML).
+    """
+    pattern = _term_pattern(query_terms(q))
+    if not pattern or not extracted:
+        return []
+    snippets = []
+    for field in SEARCH_WEIGHTS:
+        value = extracted.get(field)
+        values = value if isinstance(value, list) else [value]
+        for text in values:
+            if not isinstance(text, str):
+                continue
+            first = pattern.search(text)
+            if not first:
+                continue
+            offset, window = _window(text, first.start(), max_chars)
+            snippets.append({
+                "field": field,
+                "text": window,
+                "highlights": [[m.start(), m.end()] for m in pattern.finditer(window)],
+                "truncated": len(window) < len(text),
+            })
+            if len(snippets) >= max_snippets:
+                return snippets
+    return snippets
+
+
+def score_range(min_score: Optional[float] = None, max_score: Optional[float] = None) -> Optional[Dict]:
+    """Mongo condition on a score field, None when neither bound is given."""
+    bounds = {}
+    if min_score is not None:
+        bounds["$gte"] = min_score
+    if max_score is not None:
+        bounds["$lte"] = max_score
+    return bounds or None
+
+
+def search_query(q: str, job_id=None, min_score: Optional[float] = None, max_score: Optional[float] = None,
+                 linked_ids: Optional[List] = None) -> Dict:
+    """
+    Text query over `cvs`. With a job, CVs uploaded for it (score range on
+    their own score) or linked to it through `applications`: `linked_ids`
+    are those linked CVs, already filtered on their application's score.
+    """
+    query = {"$text": {"$search": q}}
+    scores = score_range(min_score, max_score)
+    if job_id is None:
+        if scores:
+            query["score"] = scores
+        return query
+    own = {"job_id": job_id}
+    if scores:
+        own["score"] = scores
+    query["$or"] = [own, {"_id": {"$in": linked_ids or []}}]
+    return query
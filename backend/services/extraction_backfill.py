@@ -0,0 +1,181 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+
+from services import cv_extraction, job_extraction
+from services.cv_ingest import extract_cv_data
+from services.job_extraction import extract_job_data
+from services.llm_client import llm_context
+from services.matching import extraction_fields
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", 20))
+# Re-extractions per minute, on top of the bulk class's share of the shared LLM budget
+BACKFILL_RATE_PER_MINUTE = float(os.getenv("BACKFILL_RATE_PER_MINUTE", 30))
+BACKFILL_CONCURRENCY = int(os.getenv("BACKFILL_CONCURRENCY", 2))
+# A document failing this many times for the same target is left for a later version
+BACKFILL_MAX_ATTEMPTS = int(os.getenv("BACKFILL_MAX_ATTEMPTS", 3))
+
+KINDS = ("jobs", "cvs")
+
+
+def current_target(kind: str) -> Dict:
+    module = job_extraction if kind == "jobs" else cv_extraction
+    return {"model": module.model_name, "prompt_version": module.PROMPT_VERSION}
+
+
+def _target_id(target: Dict) -> str:
+    return f"{target['model']}/{target['prompt_version']}"
+
+
+def outdated_query(kind: str) -> Dict:
+    """
+    Completed extractions made with another model or prompt version (CVs
+    extracted before versions were recorded have none), re-extractable from
+    the stored text.
+    """
+    target = current_target(kind)
+    return {
+        "extraction.status": "succeeded",
+        "$or": [
+            {"extraction.prompt_version": {"$ne": target["prompt_version"]}},
+            {"extraction.model": {"$ne": target["model"]}},
+        ],
+        ("description" if kind == "jobs" else "text"): {"$type": "string"},
+        "$nor": [{"backfill.target": _target_id(target), "backfill.attempts": {"$gte": BACKFILL_MAX_ATTEMPTS}}],
+    }
+
+
+def _mark_scores_stale(db, kind: str, oid) -> int:
+    """Flag the scores computed from the old extraction: needs_scoring() then picks them up."""
+    field = "job_id" if kind == "jobs" else "cv_id"
+    query = {field: oid, "score": {"$exists": True}}
+    update = {"$set": {"scoring.stale": True}}
+    n = db.applications.update_many(query, update).modified_count
+    own = {"job_id": oid} if kind == "jobs" else {"_id": oid}
+    n += db.cvs.update_many({**own, "score": {"$exists": True}}, update).modified_count
+    return n
+
+
+def reextract(db, kind: str, doc: Dict, target: Dict) -> str:
+    """
+    Re-extract one job or CV from its stored text and write the result in a
+    single update, conditioned on the extraction it was read with: a document
+    re-extracted or edited in the meantime is left alone ("conflict").
+    A failed extraction never replaces the current one; it is counted in
+    `backfill` instead. Returns "updated", "unchanged", "conflict" or "failed".
+    """
+    old_meta = doc.get("extraction") or {}
+    if kind == "jobs":
+        extracted, meta = extract_job_data(doc["description"])
+    else:
+        extracted, meta = extract_cv_data(doc["text"])
+        meta["compaction"] = old_meta.get("compaction")
+
+    collection = db[kind]
+    current = {"_id": doc["_id"], "extraction.extracted_at": old_meta.get("extracted_at")}
+    now = datetime.utcnow()
+
+    if meta["status"] != "succeeded":
+        previous = doc.get("backfill") or {}
+        attempts = previous.get("attempts", 0) + 1 if previous.get("target") == _target_id(target) else 1
+        collection.update_one(current, {"$set": {"backfill": {
+            "target": _target_id(target),
+            "attempts": attempts,
+            "error": meta.get("error"),
+            "failed_at": now,
+        }}})
+        return "failed"
+
+    res = collection.update_one(
+        current,
+        {"$set": {**extraction_fields(extracted), "extraction": meta, "updated_at": now}, "$unset": {"backfill": ""}}
+    )
+    if res.matched_count == 0:
+        return "conflict"
+    if extracted == doc.get("extracted"):
+        return "unchanged"
+    _mark_scores_stale(db, kind, doc["_id"])
+    return "updated"
+
+
+def _load_run(db, kind: str, target: Dict) -> Dict:
+    run = db.backfill_runs.find_one({"_id": kind})
+    if run and run.get("target") == _target_id(target) and not run.get("finished_at"):
+        return run  # resume after the last document of the interrupted run
+    return {
+        "_id": kind,
+        "target": _target_id(target),
+        "last_id": None,
+        "counts": {"updated": 0, "unchanged": 0, "conflict": 0, "failed": 0},
+        "started_at": datetime.utcnow(),
+        "finished_at": None,
+    }
+
+
+def run_backfill(db, kinds: Iterable[str] = KINDS, batch_size: int = BACKFILL_BATCH_SIZE,
+                 rate_per_minute: float = BACKFILL_RATE_PER_MINUTE, concurrency: int = BACKFILL_CONCURRENCY,
+                 limit: Optional[int] = None, should_stop: Callable[[], bool] = lambda: False,
+                 on_batch: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """
+    Re-extract outdated jobs, then CVs, in batches of `batch_size` paced to
+    `rate_per_minute`. LLM calls run in the bulk priority class: the budget
+    shared with the other processes (SharedQuota) caps them below what
+    interactive and scoring traffic may use. Progress is saved in
+    `backfill_runs` (one document per kind) after every batch: an interrupted
+    run resumes after the last document it finished. Returns the runs.
+    """
+    runs = {}
+    done = 0
+    for kind in kinds:
+        target = current_target(kind)
+        run = _load_run(db, kind, target)
+        runs[kind] = run
+        query = outdated_query(kind)
+        fields = {"description": 1} if kind == "jobs" else {"text": 1}
+        fields.update({"extracted": 1, "extraction": 1, "backfill": 1})
+
+        def work(doc):
+            with llm_context("bulk", tenant=f"backfill:{kind}"):
+                return reextract(db, kind, doc, target)
+
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="backfill") as pool:
+            while not should_stop():
+                if run["last_id"] is not None:
+                    query["_id"] = {"$gt": run["last_id"]}
+                size = batch_size if limit is None else min(batch_size, limit - done)
+                if size <= 0:
+                    break
+                batch = list(db[kind].find(query, fields).sort("_id", 1).limit(size))
+                if not batch:
+                    run["finished_at"] = datetime.utcnow()
+                    db.backfill_runs.replace_one({"_id": kind}, run, upsert=True)
+                    break
+
+                start = time.monotonic()
+                for outcome in pool.map(work, batch):
+                    run["counts"][outcome] += 1
+                run["last_id"] = batch[-1]["_id"]
+                run["updated_at"] = datetime.utcnow()
+                db.backfill_runs.replace_one({"_id": kind}, run, upsert=True)
+                done += len(batch)
+                if on_batch:
+                    on_batch(run)
+
+                # Pace the batches: the backfill never takes more than its share of the quota
+                if rate_per_minute > 0:
+                    time.sleep(max(0.0, len(batch) * 60 / rate_per_minute - (time.monotonic() - start)))
+    return runs
+
+
+def backfill_status(db) -> Dict:
+    """Per kind: current target, documents still outdated, and the last run's progress."""
+    return {
+        kind: {
+            "target": _target_id(current_target(kind)),
+            "outdated": db[kind].count_documents(outdated_query(kind)),
+            "run": db.backfill_runs.find_one({"_id": kind}),
+        }
+        for kind in KINDS
+    }
@@ -0,0 +1,148 @@
+import re
+from typing import Dict, List, Optional
+
+from services.text_compaction import SECTION_HEADING_RE
+
+
+EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+NAME_RE = re.compile(r"^[A-ZÀ-Þ][A-Za-zÀ-ÿ'\-.]+(\s+[A-ZÀ-Þ][A-Za-zÀ-ÿ'\-.]+){1,3}$")
+# Document titles and contact labels that sit above the name and look like one
+NOT_A_NAME_RE = re.compile(
+    r"\b(curriculum|vitae|cv|r[ée]sum[ée]|resume|portfolio|contact|address|phone|email|linkedin|github)\b",
+    re.IGNORECASE,
+)
+
+# Degree level keywords -> normalized label
+DEGREE_LEVELS = (
+    (r"\b(ph\.?\s?d|doctorate|doctorat|doctor of)\b", "PhD"),
+    (r"\b((?<!scrum )(?<!scrum-)master'?s?|m\.?sc|m\.?s\.|m\.?eng|mba|m\.?a\.|mast[eè]re|ing[eé]nieur|engineering degree)\b", "Master's"),
+    (r"\b(bachelor'?s?|b\.?sc|b\.?s\.|b\.?eng|b\.?a\.|undergraduate degree)\b", "Bachelor's"),
+    (r"\b(associate'?s? degree|a\.?a\.?s|dut|bts)\b", "Associate"),
+    (r"\b(high school|baccalaur[eé]at|ged|secondary school)\b", "High School"),
+)
+DEGREE_LEVEL_RES = [(re.compile(p, re.IGNORECASE), label) for p, label in DEGREE_LEVELS]
+# Also a driving or software licence: a degree only in an education context
+# (education section, institution on the line, "Licence en/in/professionnelle ...")
+CONTEXTUAL_DEGREE_RES = [(re.compile(r"\blicence\b", re.IGNORECASE), "Bachelor's")]
+DEGREE_PHRASE_RE = re.compile(r"\blicence\s+(en|in|of|professionnelle|fondamentale|appliqu[ée]e|d['’])", re.IGNORECASE)
+INSTITUTION_RE = re.compile(r"\b(universit(y|[ée])|facult(y|[ée])|[ée]cole|college|school|institute|institut)\b", re.IGNORECASE)
+EDUCATION_SECTIONS = ("education", "academic background")
+
+FIELDS_OF_STUDY = (
+    "computer science", "software engineering", "computer engineering", "information technology",
+    "information systems", "data science", "artificial intelligence", "machine learning",
+    "cybersecurity", "cyber security", "telecommunications", "electrical engineering",
+    "electronics", "mechanical engineering", "civil engineering", "industrial engineering",
+    "mathematics", "applied mathematics", "statistics", "physics", "chemistry", "biology",
+    "business administration", "management", "finance", "accounting", "economics", "marketing",
+    "human resources", "psychology", "law", "education", "nursing", "medicine",
+    "communication", "journalism", "graphic design", "architecture",
+    "informatique", "génie logiciel", "mathématiques", "gestion",
+)
+# Longest first: "applied mathematics" before "mathematics"
+FIELD_RES = [(re.compile(r"\b" + re.escape(f) + r"\b", re.IGNORECASE), f)
+             for f in sorted(FIELDS_OF_STUDY, key=len, reverse=True)]
+
+# Outside a certifications section only strong signals count, to avoid "certified pipelines" noise
+CERTIFICATE_RE = re.compile(
+    r"(^(certified|certification|certificate|certificat)\b|"
+    r"\b(pmp|cissp|cisa|cism|ccna|ccnp|comptia|itil|togaf|prince2|scrum master|psm|csm|"
+    r"aws certified|azure fundamentals|az-\d{3}|oracle certified|toeic|toefl|ielts)\b)",
+    re.IGNORECASE,
+)
+CERTIFICATE_SECTIONS = ("certifications", "certification", "certificates", "certificate", "training")
+
+
+def _lines(text: str) -> List[str]:
+    return [l.strip(" -\t") for l in text.split("\n") if l.strip(" -\t")]
+
+
+def extract_email(text: str) -> Optional[str]:
+    match = EMAIL_RE.search(text)
+    return match.group(0).rstrip(".") if match else None
+
+
+def extract_name(lines: List[str]) -> Optional[str]:
+    # The name is almost always one of the very first lines
+    for line in lines[:8]:
+        candidate = line.strip()
+        if SECTION_HEADING_RE.match(candidate) or NOT_A_NAME_RE.search(candidate) \
+                or any(c.isdigit() for c in candidate) or "@" in candidate:
+            continue
+        if candidate.isupper():
+            candidate = candidate.title()
+        if NAME_RE.match(candidate):
+            return candidate
+    return None
+
+
+def field_of_study(line: str) -> Optional[str]:
+    return next((f for r, f in FIELD_RES if r.search(line)), None)
+
+
+def degree_level(line: str, education_context: bool = False) -> Optional[str]:
+    """Normalized level of the highest degree named on the line, if any."""
+    level = next((label for r, label in DEGREE_LEVEL_RES if r.search(line)), None)
+    if level:
+        return level
+    if education_context or INSTITUTION_RE.search(line) or DEGREE_PHRASE_RE.search(line):
+        return next((label for r, label in CONTEXTUAL_DEGREE_RES if r.search(line)), None)
+    return None
+
+
+def _degree_line(line: str, in_section: bool) -> Optional[str]:
+    # "Certified Scrum Master", "PSM I", ...: certifications, not degrees
+    if len(line) > 200 or (CERTIFICATE_RE.search(line) and not INSTITUTION_RE.search(line)):
+        return None
+    return degree_level(line, in_section)
+
+
+def extract_education(lines: List[str]) -> List[str]:
+    """
+    Degree lines, normalized with the degree/field dictionary when the field
+    is known ("Master's in Computer Science"); the original line follows in
+    parentheses, so the institution and year are kept.
+    """
+    education = []
+    in_section = False
+    for line in lines:
+        heading = SECTION_HEADING_RE.match(line)
+        if heading:
+            in_section = heading.group(1).lower() in EDUCATION_SECTIONS
+            continue
+        level = _degree_line(line, in_section)
+        if not level:
+            continue
+        field = field_of_study(line)
+        entry = f"{level} in {field.title()} ({line})" if field else line
+        if entry not in education:
+            education.append(entry)
+    return education
+
+
+def extract_certificates(lines: List[str]) -> List[str]:
+    certificates = []
+    in_section = False
+    for line in lines:
+        heading = SECTION_HEADING_RE.match(line)
+        if heading:
+            in_section = heading.group(1).lower() in CERTIFICATE_SECTIONS
+            continue
+        if (in_section or CERTIFICATE_RE.search(line)) and len(line) <= 150 and line not in certificates:
+            certificates.append(line)
+    return certificates
+
+
+def extract_contact_and_education(cv_text: str) -> Dict:
+    """
+    Rule-based extraction of the regular fields of a CV (name, email,
+    education, certificates). Runs locally in well under a millisecond.
+    Fields it can't find are left empty so the LLM can be asked for them.
+    """
+    lines = _lines(cv_text)
+    return {
+        "name": extract_name(lines),
+        "email": extract_email(cv_text),
+        "education": extract_education(lines),
+        "certificates": extract_certificates(lines),
+    }
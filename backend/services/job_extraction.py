@@ -1,21 +1,22 @@
 import os
+from datetime import datetime
 from typing import Dict, Any
-from dotenv import load_dotenv
-import google.generativeai as genai
 from pydantic import BaseModel
 from models.job import Extracted  # reuse your Pydantic schema
+from services.llm_client import generate_content, LLMError
 import json
 import re
 
 
-load_dotenv()
-
-# Configure Gemini client
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+model_name = "gemini-2.0-flash"
+# Bump when the prompt changes: jobs extracted with an older one are re-extracted by the backfill
+PROMPT_VERSION = "v1"
 
 
 class JobExtractionError(Exception):
-    pass
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
 
 
 def extract_job_requirements(description: str) -> Extracted:
@@ -35,8 +36,7 @@ Job description:
 \"\"\"{description}\"\"\"
 """
     try:
-        model = genai.GenerativeModel("gemini-2.0-flash")  # ✅ safer model name
-        response = model.generate_content(prompt)
+        response = generate_content(model_name, prompt)
 
         # Extract usable text
         raw_text = None
@@ -63,9 +63,45 @@ Job description:
         try:
             parsed: Dict[str, Any] = json.loads(cleaned)
         except json.JSONDecodeError as e:
-            raise JobExtractionError(f"Failed to parse JSON from Gemini: {e}")
+            raise JobExtractionError(f"Failed to parse JSON from Gemini: {e}", retryable=True)
 
         return Extracted(**parsed)
 
+    except LLMError as e:
+        raise JobExtractionError(str(e), retryable=e.retryable)
+    except JobExtractionError:
+        raise
     except Exception as e:
         raise JobExtractionError(str(e))
+
+
+def extract_job_data(description: str):
+    """
+    Returns (extracted_dict, meta) from Gemini.
+    Does NOT touch the database.
+    """
+    now = datetime.utcnow()
+    try:
+        extracted = extract_job_requirements(description)
+        extracted_dict = extracted.model_dump()
+        meta = {
+            "provider": "gemini",
+            "model": model_name,
+            "prompt_version": PROMPT_VERSION,
+            "status": "succeeded",
+            "extracted_at": now,
+            "error": None,
+        }
+    except JobExtractionError as e:
+        extracted_dict = None
+        meta = {
+            "provider": "gemini",
+            "model": model_name,
+            "prompt_version": PROMPT_VERSION,
+            "status": "failed",
+            "retryable": e.retryable,
+            "extracted_at": now,
+            "error": str(e),
+        }
+
+    return extracted_dict, meta
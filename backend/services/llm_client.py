@@ -0,0 +1,616 @@
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait as wait_futures
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError, PyMongoError
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+load_dotenv()
+genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+class LLMError(Exception):
+    """Non-retryable failure of a Gemini call (bad request, auth, ...)."""
+    retryable = False
+
+
+class LLMRetryableError(LLMError):
+    """The call failed for a transient reason (quota, timeout, outage) and can be retried later."""
+    retryable = True
+
+
+class CircuitOpenError(LLMRetryableError):
+    """Dispatch is paused because the provider looks down."""
+    pass
+
+
+# 429s: the provider is healthy but we are above quota -> slow down
+THROTTLE_EXCEPTIONS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+)
+
+# Outage-like errors: they count against the circuit breaker
+OUTAGE_EXCEPTIONS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    google_exceptions.GatewayTimeout,
+    TimeoutError,
+    ConnectionError,
+)
+
+RETRYABLE_EXCEPTIONS = THROTTLE_EXCEPTIONS + OUTAGE_EXCEPTIONS
+
+
+class AdaptiveTokenBucket:
+    """
+    Thread-safe token bucket whose refill rate adapts to quota feedback (AIMD):
+    each success adds a little rate back, each 429 halves it.
+    """
+
+    def __init__(self, rate_per_minute: float, min_rate_per_minute: float, max_rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.min_rate = min_rate_per_minute / 60.0
+        self.max_rate = max_rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, reserve: float = 0.0) -> float:
+        """
+        Take a token if one is available while leaving `reserve` tokens in the
+        bucket. Returns 0 on success, otherwise the seconds to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            needed = 1 + min(reserve, self.capacity - 1)
+            if self.tokens >= needed:
+                self.tokens -= 1
+                return 0.0
+            return (needed - self.tokens) / self.rate
+
+    def refund(self):
+        """Give back a token taken by try_acquire() but not used."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            # Additive increase: +1 request/minute per success
+            self.rate = min(self.max_rate, self.rate + 1 / 60.0)
+
+    def on_throttle(self):
+        with self._lock:
+            # Multiplicative decrease, and drop the burst we were holding
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def rate_per_minute(self) -> float:
+        return self.rate * 60.0
+
+
+class SharedQuota:
+    """
+    Call budget shared by every process using the same MongoDB (API workers,
+    scoring workers, import and backfill commands): one counter document per
+    `window_seconds` window, incremented atomically. Each priority class has
+    its own ceiling in a window: interactive calls may use all of it, normal
+    calls leave `interactive_reserve` calls, bulk calls are further held to
+    `bulk_share` of the window. A bulk job in another process therefore can't
+    take the capacity interactive traffic needs.
+    If the database is not initialized or unreachable, calls are only
+    limited by the process-local bucket.
+    """
+
+    def __init__(self, rate_per_minute: float, window_seconds: float, interactive_reserve: float, bulk_share: float):
+        self.window = window_seconds
+        self.capacity = max(1, int(rate_per_minute * window_seconds / 60))
+        self.limits = {
+            "interactive": self.capacity,
+            "normal": max(1, self.capacity - int(interactive_reserve)),
+        }
+        self.limits["bulk"] = max(1, min(self.limits["normal"], int(self.capacity * bulk_share)))
+        self.unavailable = None  # last error, for limiter_stats()
+
+    @staticmethod
+    def _collection():
+        from db import get_db
+        try:
+            return get_db().llm_quota
+        except RuntimeError:
+            return None  # not initialized: a script without MongoDB
+
+    def try_acquire(self, priority: str = "normal", now: float = None) -> float:
+        """
+        Count one call in the window of `now` (default: the current one).
+        Returns 0 on success, otherwise the seconds to wait.
+        """
+        collection = self._collection()
+        if collection is None:
+            return 0.0
+        now = time.time() if now is None else now
+        window = int(now // self.window)
+        try:
+            res = collection.update_one({"_id": window, "n": {"$lt": self.limits[priority]}}, {"$inc": {"n": 1}})
+            if res.modified_count:
+                return 0.0
+            # No counter yet for this window (or it is full: duplicate key)
+            collection.insert_one({
+                "_id": window,
+                "n": 1,
+                "expires_at": datetime.utcnow() + timedelta(seconds=2 * self.window),
+            })
+            return 0.0
+        except DuplicateKeyError:
+            return (window + 1) * self.window - now
+        except PyMongoError as e:
+            self.unavailable = str(e)
+            return 0.0
+
+    def refund(self, now: float):
+        """Give back a call counted by try_acquire(priority, now) but not made."""
+        collection = self._collection()
+        if collection is None:
+            return
+        try:
+            collection.update_one({"_id": int(now // self.window), "n": {"$gt": 0}}, {"$inc": {"n": -1}})
+        except PyMongoError as e:
+            self.unavailable = str(e)
+
+    def stats(self) -> dict:
+        collection = self._collection()
+        used = None
+        if collection is not None:
+            try:
+                doc = collection.find_one({"_id": int(time.time() // self.window)})
+                used = doc["n"] if doc else 0
+            except PyMongoError:
+                pass
+        return {"window_seconds": self.window, "limits": self.limits, "used": used, "error": self.unavailable}
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive outage errors and pauses dispatch
+    for `reset_timeout` seconds. After that a single probe call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def wait_time(self) -> float:
+        """Seconds before a call may be dispatched (0 means go now)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return 0.0
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and remaining > 0:
+                return remaining
+            # Cooldown elapsed: let exactly one probe through
+            if self._probe_in_flight:
+                return min(1.0, self.reset_timeout)
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = True
+            return 0.0
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+
+PRIORITIES = ("interactive", "normal", "bulk")
+
+_priority = contextvars.ContextVar("llm_priority", default="normal")
+_tenant = contextvars.ContextVar("llm_tenant", default=None)
+
+
+@contextmanager
+def llm_context(priority: str = None, tenant: str = None):
+    """
+    Tag the LLM calls made inside the block with a priority class
+    ("interactive", "normal", "bulk") and a tenant (user or job) for fair queuing.
+    Worker threads need `contextvars.copy_context().run` to inherit it.
+    """
+    tokens = []
+    if priority is not None:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        tokens.append((_priority, _priority.set(priority)))
+    if tenant is not None:
+        tokens.append((_tenant, _tenant.set(tenant)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class FairScheduler:
+    """
+    Decides which waiting call gets the next token of the bucket:
+    - strict priority between classes (interactive > normal > bulk),
+    - round-robin between tenants inside a class, so one big import can't
+      monopolize its class,
+    - non-interactive calls leave `interactive_reserve` tokens in the bucket,
+      so an interactive call arriving during a backfill is dispatched at once.
+    This ordering is within the process. Across processes, `shared` (a
+    SharedQuota) holds each class to its ceiling of the common budget.
+    Keeps queue depth and recent wait times per class.
+    """
+
+    def __init__(self, bucket: AdaptiveTokenBucket, interactive_reserve: float, history: int = 500,
+                 shared: "SharedQuota" = None):
+        self.bucket = bucket
+        self.interactive_reserve = interactive_reserve
+        self.shared = shared
+        self._cond = threading.Condition()
+        # class -> tenant -> deque of waiter ids; class -> deque of tenants (round-robin order)
+        self._queues = {p: {} for p in PRIORITIES}
+        self._tenants = {p: deque() for p in PRIORITIES}
+        self._waits = {p: deque(maxlen=history) for p in PRIORITIES}
+        self._dispatched = {p: 0 for p in PRIORITIES}
+        self._next_id = 0
+
+    def _head(self):
+        for priority in PRIORITIES:
+            tenants = self._tenants[priority]
+            if tenants:
+                tenant = tenants[0]
+                return priority, tenant, self._queues[priority][tenant][0]
+        return None
+
+    def acquire(self, priority: str = "normal", tenant=None):
+        start = time.monotonic()
+        with self._cond:
+            waiter = self._next_id
+            self._next_id += 1
+            queue = self._queues[priority].setdefault(tenant, deque())
+            if not queue:
+                self._tenants[priority].append(tenant)
+            queue.append(waiter)
+
+            while True:
+                head_priority, head_tenant, head = self._head()
+                if head == waiter:
+                    wait = self._take(priority)
+                    if not wait:
+                        break
+                else:
+                    wait = None
+                self._cond.wait(timeout=wait)
+
+            queue.popleft()
+            tenants = self._tenants[priority]
+            tenants.popleft()
+            if queue:
+                tenants.append(tenant)  # back of the round-robin
+            else:
+                del self._queues[priority][tenant]
+            self._dispatched[priority] += 1
+            self._waits[priority].append(time.monotonic() - start)
+            self._cond.notify_all()
+
+    @contextmanager
+    def _unlocked(self):
+        self._cond.release()
+        try:
+            yield
+        finally:
+            self._cond.acquire()
+
+    def _take(self, priority: str) -> float:
+        """
+        A call of the shared budget, then a local token. Called with the lock
+        held, which is released around the database round trips so other
+        callers can queue meanwhile. Returns 0 or the seconds to wait.
+        """
+        reserve = 0.0 if priority == "interactive" else self.interactive_reserve
+        if self.shared is None:
+            return self.bucket.try_acquire(reserve)
+        now = time.time()
+        with self._unlocked():
+            wait = self.shared.try_acquire(priority, now)
+        if wait:
+            return wait
+        wait = self.bucket.try_acquire(reserve)
+        if wait:
+            with self._unlocked():
+                self.shared.refund(now)
+        return wait
+
+    def try_acquire(self, priority: str = "normal") -> bool:
+        """Take a token only if nobody is queued and one is free right now (spare capacity)."""
+        with self._cond:
+            if self._head() is not None:
+                return False
+            if self._take(priority):
+                return False
+            self._dispatched[priority] += 1
+            return True
+
+    def stats(self) -> dict:
+        with self._cond:
+            out = {}
+            for p in PRIORITIES:
+                waits = sorted(self._waits[p])
+                pct = lambda q: round(waits[min(len(waits) - 1, int(q * len(waits)))], 3) if waits else None
+                out[p] = {
+                    "queue_depth": sum(len(q) for q in self._queues[p].values()),
+                    "tenants_waiting": len(self._tenants[p]),
+                    "dispatched": self._dispatched[p],
+                    "wait_p50_seconds": pct(0.50),
+                    "wait_p95_seconds": pct(0.95),
+                }
+            return out
+
+
+class HedgePolicy:
+    """
+    Decides when a slow call gets a duplicate ("hedge") request.
+
+    The hedge delay is an adaptive percentile of the recent latencies of the
+    model; nothing is hedged until enough samples are known. Hedges are capped
+    to `budget` extra calls per call over the recent window.
+    """
+
+    def __init__(self, percentile: float, budget: float, min_delay: float, window: int = 500, min_samples: int = 20):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies = {}
+        self._window = window
+        self._decisions = deque(maxlen=window)  # True for each hedged call
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, model_name: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(model_name, deque(maxlen=self._window)).append(seconds)
+
+    def delay(self, model_name: str):
+        """Seconds to wait for the first response before hedging, None when not enough data."""
+        with self._lock:
+            samples = sorted(self._latencies.get(model_name, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return max(self.min_delay, samples[min(len(samples) - 1, int(self.percentile * len(samples)))])
+
+    def count_call(self):
+        with self._lock:
+            self._decisions.append(False)
+
+    def within_budget(self) -> bool:
+        with self._lock:
+            return sum(self._decisions) + 1 <= self.budget * max(1, len(self._decisions))
+
+    def record_hedge(self):
+        with self._lock:
+            self._decisions[-1] = True
+            self.hedges += 1
+
+    def record_win(self):
+        with self._lock:
+            self.hedge_wins += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hedges": self.hedges,
+                "hedge_wins": self.hedge_wins,
+                "recent_hedge_ratio": round(sum(self._decisions) / len(self._decisions), 3) if self._decisions else 0.0,
+            }
+
+
+MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 4))
+RETRY_BUDGET_SECONDS = float(os.getenv("GEMINI_RETRY_BUDGET_SECONDS", 60))
+BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", 1))
+BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", 20))
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("GEMINI_REQUEST_TIMEOUT_SECONDS", 60))
+# Hedging is opt-in per call site (hedge=True) and globally
+HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "0") == "1"
+
+RPM = float(os.getenv("GEMINI_RPM", 60))
+INTERACTIVE_RESERVE = float(os.getenv("GEMINI_INTERACTIVE_RESERVE", 2))
+# GEMINI_RPM is the budget of the whole deployment, counted in MongoDB across
+# processes. Without the shared counter, each of GEMINI_PROCESSES processes
+# (API workers, scoring workers, import/backfill commands) gets its share.
+SHARED_QUOTA = os.getenv("GEMINI_SHARED_QUOTA", "1") == "1"
+PROCESSES = max(1, int(os.getenv("GEMINI_PROCESSES", 1)))
+
+# One limiter and one breaker per process, shared by every LLM call site
+_bucket = AdaptiveTokenBucket(
+    rate_per_minute=RPM if SHARED_QUOTA else RPM / PROCESSES,
+    min_rate_per_minute=float(os.getenv("GEMINI_MIN_RPM", 5)),
+    max_rate_per_minute=float(os.getenv("GEMINI_MAX_RPM", 1000)),
+    burst=int(os.getenv("GEMINI_BURST", 10)),
+)
+_shared = SharedQuota(
+    RPM,
+    window_seconds=float(os.getenv("GEMINI_QUOTA_WINDOW_SECONDS", 10)),
+    interactive_reserve=INTERACTIVE_RESERVE,
+    bulk_share=float(os.getenv("GEMINI_BULK_SHARE", 0.5)),
+) if SHARED_QUOTA else None
+_scheduler = FairScheduler(_bucket, interactive_reserve=INTERACTIVE_RESERVE, shared=_shared)
+_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv("GEMINI_BREAKER_THRESHOLD", 5)),
+    reset_timeout=float(os.getenv("GEMINI_BREAKER_COOLDOWN_SECONDS", 30)),
+)
+_hedging = HedgePolicy(
+    percentile=float(os.getenv("GEMINI_HEDGE_PERCENTILE", 0.95)),
+    budget=float(os.getenv("GEMINI_HEDGE_BUDGET", 0.05)),
+    min_delay=float(os.getenv("GEMINI_HEDGE_MIN_DELAY_SECONDS", 0.5)),
+)
+_hedge_pool = ThreadPoolExecutor(max_workers=int(os.getenv("GEMINI_HEDGE_WORKERS", 16)), thread_name_prefix="llm-hedge")
+
+
+def _backoff_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+
+def _timed(model_name: str, call):
+    start = time.monotonic()
+    response = call()
+    _hedging.record(model_name, time.monotonic() - start)
+    return response
+
+
+def _hedged(model_name: str, call, validate=None):
+    """
+    Run `call`; if it is slower than the model's hedge delay and the budget and
+    spare quota allow it, issue a duplicate and return the first valid response.
+    The loser is cancelled if it has not started; a request already in flight
+    can't be aborted with the sync SDK, its response is simply dropped.
+    """
+    _hedging.count_call()
+    delay = _hedging.delay(model_name)
+    if delay is None:
+        return _timed(model_name, call)
+
+    # Each thread runs in its own copy of the caller's context (priority, tenant)
+    futures = {_hedge_pool.submit(contextvars.copy_context().run, _timed, model_name, call)}
+    done, _ = wait_futures(futures, timeout=delay)
+    if done or not _hedging.within_budget() or not _scheduler.try_acquire(_priority.get()):
+        return next(iter(futures)).result()
+    _hedging.record_hedge()
+    hedge = _hedge_pool.submit(contextvars.copy_context().run, _timed, model_name, call)
+    futures.add(hedge)
+
+    error, invalid = None, None
+    while futures:
+        done, futures = wait_futures(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                response = future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            if validate:
+                try:
+                    validate(response)
+                except Exception:
+                    # Unusable output: the other copy may still do better
+                    if invalid is None:
+                        invalid = response
+                    continue
+            for loser in futures:
+                loser.cancel()
+            if future is hedge:
+                _hedging.record_win()
+            return response
+    if invalid is not None:
+        return invalid
+    raise error
+
+
+def generate_content(model_name: str, contents, system_instruction=None, generation_config=None,
+                     hedge: bool = False, validate=None):
+    """
+    Single entry point for Gemini calls: rate limited, retried with jittered
+    exponential backoff inside a bounded time budget, and guarded by the
+    circuit breaker.
+
+    `hedge=True` lets a call that is slower than usual be duplicated (see
+    `_hedged`, enabled with GEMINI_HEDGE_ENABLED); `validate` raises on a
+    response that must not win the race.
+
+    Raises LLMRetryableError when the call should be retried later,
+    LLMError when retrying would not help.
+    """
+    deadline = time.monotonic() + RETRY_BUDGET_SECONDS
+    attempt = 0
+
+    while True:
+        wait = _breaker.wait_time()
+        if wait > 0:
+            if time.monotonic() + wait > deadline:
+                raise CircuitOpenError("Gemini unavailable, dispatch paused by circuit breaker")
+            time.sleep(wait)
+            continue
+
+        _scheduler.acquire(_priority.get(), _tenant.get())
+        try:
+            model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+            call = lambda: model.generate_content(
+                contents,
+                generation_config=generation_config,
+                request_options={"timeout": REQUEST_TIMEOUT_SECONDS},
+            )
+            response = _hedged(model_name, call, validate) if hedge and HEDGE_ENABLED else _timed(model_name, call)
+        except RETRYABLE_EXCEPTIONS as e:
+            if isinstance(e, THROTTLE_EXCEPTIONS):
+                _bucket.on_throttle()
+                # Quota errors mean the provider is up: don't keep a probe hanging
+                _breaker.record_success()
+            else:
+                _breaker.record_failure()
+
+            delay = _backoff_delay(attempt)
+            attempt += 1
+            if attempt > MAX_RETRIES or time.monotonic() + delay > deadline:
+                raise LLMRetryableError(f"Gemini call failed after {attempt} attempt(s): {e}") from e
+            time.sleep(delay)
+            continue
+        except Exception as e:
+            _breaker.record_success()
+            raise LLMError(str(e)) from e
+
+        _bucket.on_success()
+        _breaker.record_success()
+        return response
+
+
+def limiter_stats() -> dict:
+    return {
+        "rate_per_minute": round(_bucket.rate_per_minute(), 2),
+        "circuit": _breaker.state,
+        "consecutive_failures": _breaker.failures,
+        "scheduler": _scheduler.stats(),
+        "shared_quota": _shared.stats() if _shared else None,
+        "hedging": {"enabled": HEDGE_ENABLED, **_hedging.stats()},
+    }
@@ -1,18 +1,33 @@
-from typing import Dict
-import google.generativeai as genai
+from typing import Dict, Optional
+import hashlib
 import json
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from services.llm_client import generate_content, LLMError
+from services.skill_similarity import score_skills, SkillSimilarityError
 model_name="gemini-2.5-flash"
+# Bump whenever a scoring prompt or rule changes: every stored score becomes stale
+PROMPT_VERSION = "v3"
+# "lazy": scoring asks for the numeric score only, justifications are written
+# on demand (justify_subscores); "eager": every score comes with its justification
+JUSTIFICATIONS = os.getenv("SCORING_JUSTIFICATIONS", "lazy")
+
+
+class MatchingError(Exception):
+    """
+    Scoring could not produce a trustworthy score. Never persisted as a score:
+    the CV keeps no `score` so the next run picks it up again.
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
 
 
 def _parse_gemini_response(response):
     """
     Helper to safely parse Gemini response into JSON.
-    Always returns a dict with {score: float, short_justification: str}.
+    Returns a dict with {score: float, short_justification: str},
+    raises MatchingError if the output can't be trusted.
     """
     text_output = ""
     try:
@@ -26,25 +41,50 @@ def _parse_gemini_response(response):
         parsed = json.loads(text_output)
 
         # Normalize result
-        score = parsed.get("score", 0.0)
-        if isinstance(score, str):
-            try:
-                score = float(score)
-            except Exception:
-                score = 0.0  # fallback if "null" or bad string
+        score = float(parsed["score"])
+        if not 0.0 <= score <= 1.0:
+            raise ValueError(f"score out of range: {score}")
         return {
-            "score": float(score),
-            "short_justification": parsed.get("short_justification", "")
+            "score": score,
+            # None in scores-only mode: written later by justify_subscores
+            "short_justification": parsed.get("short_justification")
         }
 
     except Exception as e:
         print("⚠️ Error parsing Gemini response:", e)
         print("Raw text output:", text_output)
-        return {"score": 0.0, "short_justification": "Parsing failed"}
+        raise MatchingError(f"Parsing failed: {e}")
+
 
+def _generate(prompt, system_instruction):
+    try:
+        # Scores wait on their slowest dimension: hedge slow calls, unparsable answers can't win
+        return generate_content(model_name, prompt, system_instruction=system_instruction,
+                                hedge=True, validate=_parse_gemini_response)
+    except LLMError as e:
+        raise MatchingError(str(e), retryable=e.retryable) from e
+
+
+def _output_format(justify: bool, score: Optional[float] = None) -> str:
+    if score is not None:
+        # On-demand justification: explain the stored score, don't score again
+        return f"""
+    The score has already been computed: {score}. Return exactly this score and justify it.
+    Return JSON only, no markdown fences, no extra text, in this format:
+    {{ "score": {score} , "short_justification": string }}
+    """
+    if justify:
+        return """
+    Return JSON only, no markdown fences, no extra text result should be in this format
+    { "score": 0.xx , "short_justification": string }
+    """
+    return """
+    Return JSON only, no markdown fences, no extra text, no justification, in this format:
+    { "score": 0.xx }
+    """
 
 
-def calculate_score_experience(job_experiences, cv_experiences):
+def calculate_score_experience(job_experiences, cv_experiences, justify=True, score=None):
     prompt = f"""
     Job experiences: {job_experiences}
     CV experiences: {cv_experiences}
@@ -64,21 +104,14 @@ def calculate_score_experience(job_experiences, cv_experiences):
     - Combine years (70%) and role match (30%) to produce each subscore.
     - Average across all job requirements.
     - Always return the SAME score for the same input (no randomness).
-
-    Return JSON only, no markdown fences, no extra text result should be in this format
-    { "score": 0.xx , "short_justification": string }
-    """
-
-
-    model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
-
-    response = model.generate_content(prompt)
+    """ + _output_format(justify, score)
+    response = _generate(prompt, system_instruction)
     result = _parse_gemini_response(response)
   
     return result
 
 
-def calculate_score_education(job_education, cv_education):
+def calculate_score_education(job_education, cv_education, justify=True, score=None):
 
     print("job_education",job_education)
     print("cv_education",cv_education)
@@ -109,140 +142,173 @@ Rules:
     - Job requires [Bachelor’s in Math], CV has Master’s in Biology → 0
 - If no explicit requirement in job → score 1.
 - Always return the SAME score for the same input (no randomness).
-
-Return JSON only, no markdown fences, no extra text.
-Format:
-{ "score": 0.xx , "short_justification": string }
-"""
-    
-
-    model = genai.GenerativeModel(
-        model_name,
-        system_instruction=system_instruction
-    )
-
-    response = model.generate_content(prompt)
+""" + _output_format(justify, score)
+    response = _generate(prompt, system_instruction)
     print("response resu",response)
     result = _parse_gemini_response(response)
 
     return result
 
 
-def calculate_score_tech_skills(job_skills, cv_skills):
-    prompt = f"""
-    Job required technical skills: {job_skills}
-    CV technical skills: {cv_skills}
+def calculate_score_tech_skills(job_skills, cv_skills, justify=True, score=None):
+    """
+    Scored locally from the persistent skill-pair memo: only (job skill, CV skill)
+    pairs never seen before are sent to Gemini, in one batched request.
+    Its justification is built locally, so it is always included.
     """
+    return _score_skills(job_skills, cv_skills, "technical")
 
-    system_instruction = """
-You are an assistant that calculates how well a candidate's CV technical skills match a job's required technical skills.
-Return a JSON with a single numeric score between 0 and 1.
 
-Rules:
-- The job may list multiple required technical skills. Treat each as a separate condition.
-- Subscore rules:
-    * If CV contains the exact skill → 1
-    * If CV contains a related/close skill (e.g., TensorFlow vs PyTorch, Java vs Kotlin) → 0.5
-    * If CV does not contain the skill at all → 0
-- Average across all required skills.
-- If job does not list any required skills → score 1.
-- Always return the SAME score for the same input (no randomness).
+def calculate_score_soft_skills(job_soft_skills, cv_soft_skills, justify=True, score=None):
+    return _score_skills(job_soft_skills, cv_soft_skills, "soft")
 
-Return JSON only, no markdown fences, no extra text.
-Format:
-{ "score": 0.xx ,"short_justification": string }
-"""
-    
-    model = genai.GenerativeModel(
-       model_name,
-        system_instruction=system_instruction
-    )
-
-    response = model.generate_content(prompt)
-    result = _parse_gemini_response(response)
 
-    return result
+def _score_skills(job_skills, cv_skills, kind):
+    try:
+        return score_skills(job_skills, cv_skills, kind)
+    except SkillSimilarityError as e:
+        raise MatchingError(str(e), retryable=e.retryable) from e
 
-def calculate_score_soft_skills(job_soft_skills, cv_soft_skills):
-    prompt = f"""
-    Job required soft skills: {job_soft_skills}
-    CV soft skills: {cv_soft_skills}
-    """
 
-    system_instruction = """
-You are an assistant that calculates how well a candidate's CV soft skills match a job's required soft skills.
-Return a JSON with a single numeric score between 0 and 1.
+# Weights
+WEIGHTS = {
+    "education": 0.15,
+    "experiences": 0.25,
+    "tech_skills": 0.50,
+    "soft_skills": 0.10
+}
 
-Rules:
-- The job may list multiple required soft skills. Treat each as a separate condition.
-- Subscore rules:
-    * If CV contains the exact skill → 1
-    * If CV contains a related/close skill (e.g., communication vs team player) → 0.5
-    * If CV does not contain the skill at all → 0
-- Average across all required skills.
-- If job does not list any required skills → score 1.
-- Always return the SAME score for the same input (no randomness).
+# weight key -> (subscore key, scoring function); job and CV use the weight key as field name
+DIMENSIONS = {
+    "experiences": ("experience", calculate_score_experience),
+    "education": ("education", calculate_score_education),
+    "tech_skills": ("tech_skills", calculate_score_tech_skills),
+    "soft_skills": ("soft_skills", calculate_score_soft_skills),
+}
 
-Return JSON only, no markdown fences, no extra text.
-Format:
-{ "score": 0.xx , "short_justification": string }
-"""
-    
-    model = genai.GenerativeModel(
-        model_name,
-        system_instruction=system_instruction
-    )
-
-    response = model.generate_content(prompt)
-    result = _parse_gemini_response(response)
 
-    return result
+def normalize_weights(weights: Optional[Dict] = None) -> Dict:
+    """Job weight profile (or the defaults) scaled to sum to 1."""
+    weights = {k: float((weights or WEIGHTS).get(k, 0)) for k in WEIGHTS}
+    total = sum(weights.values())
+    return {k: v / total for k, v in weights.items()}
 
 
-def score_calculate(job: Dict, cv: Dict) -> float:
+def score_expression(weights: Optional[Dict] = None) -> Dict:
     """
-    Calculate global matching score between a job and a CV.
+    Mongo aggregation expression recomputing the global score from the
+    persisted `subscores.*.score`, so a weight change needs no LLM call.
     """
-    # Extract fields
-    job_experience = job.get("experiences", [])
-    cv_experience = cv.get("experiences", [])
-    job_education = job.get("education", [])
-    cv_education = cv.get("education", [])
-    job_skills = job.get("tech_skills", [])
-    cv_skills = cv.get("tech_skills", [])
-    job_soft_skills = job.get("soft_skills", [])
-    cv_soft_skills = cv.get("soft_skills", [])
-
-
-
-    experience = calculate_score_experience(job_experience, cv_experience)
-    education = calculate_score_education(job_education, cv_education)
-    tech = calculate_score_tech_skills(job_skills, cv_skills)
-    soft = calculate_score_soft_skills(job_soft_skills, cv_soft_skills)
-
-    # Weights
-    weights = {
-        "education": 0.15,
-        "experiences": 0.25,
-        "tech_skills": 0.50,
-        "soft_skills": 0.10
-    }
-
+    weights = normalize_weights(weights)
+    return {"$round": [
+        {"$add": [
+            {"$multiply": [w, {"$ifNull": [f"$subscores.{DIMENSIONS[k][0]}.score", 0]}]}
+            for k, w in weights.items()
+        ]},
+        2
+    ]}
+
+
+def score_calculate(job: Dict, cv: Dict, threshold: Optional[float] = None, weights: Optional[Dict] = None,
+                    justify: Optional[bool] = None) -> Dict:
+    """
+    Calculate global matching score between a job and a CV.
 
+    With a `threshold`, dimensions are scored by decreasing weight and scoring
+    stops as soon as the best reachable global score (everything left scored 1)
+    falls below it. The result then has status "below_threshold", no global
+    score, the subscores computed so far and the `upper_bound` that was reached.
 
-    global_score = (
-        weights["education"] * education["score"] +
-        weights["experiences"] * experience["score"] +
-        weights["tech_skills"] * tech["score"] +
-        weights["soft_skills"] * soft["score"]
-    )
+    `weights` is the job's weight profile; defaults to WEIGHTS.
+    `justify` asks the LLM scorers for their justification too (defaults to
+    the JUSTIFICATIONS mode); otherwise see justify_subscores.
+    """
+    weights = normalize_weights(weights)
+    if justify is None:
+        justify = JUSTIFICATIONS == "eager"
+    subscores = {}
+    global_score = 0.0
+    remaining = 1.0
+
+    for key in sorted(DIMENSIONS, key=lambda k: weights[k], reverse=True):
+        subscore_key, scorer = DIMENSIONS[key]
+        result = scorer(job.get(key, []), cv.get(key, []), justify)
+        subscores[subscore_key] = result
+        global_score += weights[key] * result["score"]
+        remaining -= weights[key]
+
+        upper_bound = global_score + remaining
+        if threshold is not None and remaining > 1e-9 and upper_bound < threshold:
+            return {
+                "status": "below_threshold",
+                "score": None,
+                "upper_bound": round(upper_bound, 4),
+                "threshold": threshold,
+                "subscores": subscores
+            }
 
     return {
+        "status": "scored",
         "score": round(global_score, 2),  # ✅ global score
-        "subscores": {
-            "experience": experience,
-            "education": education,
-            "tech_skills": tech,
-            "soft_skills": soft
-        }
+        "subscores": subscores
     }
+
+
+def _sha256(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def input_hash(extracted: Optional[Dict]) -> Optional[str]:
+    """
+    Hash of the extracted fields scoring reads, stored as `extracted_hash`
+    on a job or CV whenever its extraction is written (extraction_fields).
+    """
+    if not extracted:
+        return None
+    return _sha256({k: extracted.get(k) or [] for k in DIMENSIONS})
+
+
+def extraction_fields(extracted: Optional[Dict]) -> Dict:
+    """`extracted` with its `extracted_hash`, for the write storing an extraction."""
+    return {"extracted": extracted, "extracted_hash": input_hash(extracted)}
+
+
+def scorer_version() -> str:
+    """
+    What produced a score besides its inputs: model, prompt version and
+    justification mode (lazy and eager scores come from different prompts).
+    """
+    return f"{model_name}/{PROMPT_VERSION}/{JUSTIFICATIONS}"
+
+
+def pair_key(job_hash: Optional[str], cv_hash: Optional[str]) -> str:
+    """
+    Provenance key of a score: the input hashes of the job requirements and
+    CV fields it was computed from, plus the scorer version. Identical inputs
+    give the same key, so their subscores can be reused instead of rescored.
+    Weights are not part of it: the global score is recomputed from subscores.
+    """
+    return _sha256({"job": job_hash, "cv": cv_hash, "scorer": scorer_version()})
+
+
+def global_score(subscores: Dict, weights: Optional[Dict] = None) -> float:
+    weights = normalize_weights(weights)
+    return round(sum(w * subscores[DIMENSIONS[k][0]]["score"] for k, w in weights.items()), 2)
+
+
+def justify_subscores(job: Dict, cv: Dict, subscores: Dict) -> Dict:
+    """
+    Fill in the missing `short_justification` of stored subscores (scored in
+    scores-only mode). The LLM is asked to explain the stored score, never to
+    rescore, so the justification matches what the recruiter sees.
+    Returns only the subscores that were completed.
+    """
+    completed = {}
+    for key, (subscore_key, scorer) in DIMENSIONS.items():
+        subscore = subscores.get(subscore_key)
+        if not subscore or subscore.get("short_justification"):
+            continue
+        result = scorer(job.get(key, []), cv.get(key, []), True, subscore["score"])
+        completed[subscore_key] = {**subscore, "short_justification": result["short_justification"]}
+    return completed
@@ -0,0 +1,186 @@
+import hashlib
+import os
+import random
+import re
+from typing import Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard share a band with high probability
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERM // LSH_BANDS
+SHINGLE_WORDS = 3
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", 0.8))
+# Bucket holding more CVs than this is a template shared by many, not a duplicate signal
+MAX_BUCKET_SIZE = int(os.getenv("NEAR_DUPLICATE_MAX_BUCKET", 50))
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(0x5EED)  # fixed: signatures must stay comparable across processes and releases
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big") & _MERSENNE
+
+
+def shingles(text: Optional[str], extracted: Optional[Dict] = None) -> set:
+    """
+    Word 3-grams of the CV text, plus the identifying extracted fields
+    (name, email, skills) as tokens of their own: re-exports of the same
+    CV with a few edits keep most of them.
+    """
+    words = _WORD_RE.findall((text or "").lower())
+    out = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    extracted = extracted or {}
+    for field in ("name", "email"):
+        if extracted.get(field):
+            out.add(f"{field}:{str(extracted[field]).strip().lower()}")
+    for field in ("tech_skills", "soft_skills"):
+        out.update(f"{field}:{s.strip().lower()}" for s in extracted.get(field) or [] if s)
+    out.discard("")
+    return out
+
+
+def signature(features: Iterable[str]) -> List[int]:
+    hashes = [_hash64(f) for f in features]
+    if not hashes:
+        return []
+    return [min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def band_keys(sig: List[int]) -> List[int]:
+    """One key per LSH band (signed 64-bit, indexable), prefixed by the band number."""
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(repr((band, rows)).encode(), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def minhash_doc(text: Optional[str], extracted: Optional[Dict] = None) -> Optional[Dict]:
+    """The `minhash` field stored on a CV, or None when it has no usable text."""
+    sig = signature(shingles(text, extracted))
+    if not sig:
+        return None
+    return {"signature": sig, "bands": band_keys(sig)}
+
+
+def similarity(a: List[int], b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two CVs' shingle sets."""
+    if not a or not b:
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def find_near_duplicates(db, minhash: Optional[Dict], exclude_id=None,
+                         threshold: float = NEAR_DUPLICATE_THRESHOLD, limit: int = 10) -> List[Dict]:
+    """
+    Stored CVs similar to `minhash`: one indexed lookup on the band keys
+    (cost independent of the pool size), then a signature comparison of the
+    few candidates sharing a band.
+    """
+    if not minhash:
+        return []
+    query = {"minhash.bands": {"$in": minhash["bands"]}}
+    if exclude_id is not None:
+        query["_id"] = {"$ne": exclude_id}
+    matches = []
+    for doc in db.cvs.find(query, {"minhash.signature": 1, "filename": 1, "job_id": 1, "extracted.name": 1}):
+        score = similarity(minhash["signature"], doc["minhash"]["signature"])
+        if score >= threshold:
+            matches.append({
+                "cv_id": str(doc["_id"]),
+                "job_id": str(doc["job_id"]) if doc.get("job_id") else None,
+                "filename": doc.get("filename"),
+                "name": (doc.get("extracted") or {}).get("name"),
+                "similarity": round(score, 3),
+            })
+    matches.sort(key=lambda m: -m["similarity"])
+    return matches[:limit]
+
+
+def ensure_signatures(db, batch_size: int = 500) -> int:
+    """Compute the signatures of CVs stored before they existed. Returns how many were added."""
+    added = 0
+    cursor = db.cvs.find({"minhash": {"$exists": False}, "text": {"$type": "string"}}, {"text": 1, "extracted": 1})
+    ops = []
+    for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"minhash": minhash_doc(doc["text"], doc.get("extracted"))}}))
+        if len(ops) >= batch_size:
+            added += db.cvs.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        added += db.cvs.bulk_write(ops, ordered=False).modified_count
+    return added
+
+
+def duplicate_clusters(db, threshold: float = NEAR_DUPLICATE_THRESHOLD, job_id=None) -> List[Dict]:
+    """
+    Groups of near-duplicate CVs. Candidate pairs come from the LSH buckets
+    (CVs sharing a band key), grouped in the database; only those pairs are
+    compared, then merged transitively (union-find). Optionally restricted
+    to the CVs uploaded for one job.
+    """
+    match = {"minhash.bands": {"$exists": True}}
+    if job_id is not None:
+        match["job_id"] = job_id
+    buckets = db.cvs.aggregate([
+        {"$match": match},
+        {"$project": {"bands": "$minhash.bands"}},
+        {"$unwind": "$bands"},
+        {"$group": {"_id": "$bands", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1, "$lte": MAX_BUCKET_SIZE}}},
+    ], allowDiskUse=True)
+
+    pairs = set()
+    for bucket in buckets:
+        ids = sorted(bucket["ids"])
+        pairs.update((a, b) for i, a in enumerate(ids) for b in ids[i + 1:])
+    if not pairs:
+        return []
+
+    ids = {i for pair in pairs for i in pair}
+    docs = {
+        d["_id"]: d
+        for d in db.cvs.find({"_id": {"$in": list(ids)}},
+                             {"minhash.signature": 1, "filename": 1, "job_id": 1, "extracted.name": 1})
+    }
+    parent = {i: i for i in ids}
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    best = {}
+    for a, b in pairs:
+        score = similarity(docs[a]["minhash"]["signature"], docs[b]["minhash"]["signature"])
+        if score >= threshold:
+            ra, rb = root(a), root(b)
+            if ra != rb:
+                parent[rb] = ra
+            best[a] = max(best.get(a, 0), score)
+            best[b] = max(best.get(b, 0), score)
+
+    clusters = {}
+    for i in best:
+        clusters.setdefault(root(i), []).append(i)
+    out = []
+    for members in clusters.values():
+        members.sort(key=lambda i: i.generation_time)
+        out.append({
+            "size": len(members),
+            "cvs": [{
+                "cv_id": str(i),
+                "job_id": str(docs[i]["job_id"]) if docs[i].get("job_id") else None,
+                "filename": docs[i].get("filename"),
+                "name": (docs[i].get("extracted") or {}).get("name"),
+                "best_similarity": round(best[i], 3),
+            } for i in members],
+        })
+    out.sort(key=lambda c: -c["size"])
+    return out
@@ -0,0 +1,45 @@
+import io
+import os
+import re
+from typing import BinaryIO, Dict, Optional
+
+import pdfplumber
+
+PREVIEW_WIDTH = int(os.getenv("CV_PREVIEW_WIDTH", 240))
+SNIPPET_CHARS = int(os.getenv("CV_SNIPPET_CHARS", 300))
+
+
+def text_snippet(text: str, max_chars: int = SNIPPET_CHARS) -> str:
+    """First words of the (compacted) CV text, cut on a word boundary."""
+    text = re.sub(r"\s+", " ", text or "").strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def render_thumbnail(source: BinaryIO, width: int = PREVIEW_WIDTH) -> bytes:
+    """First page as a small PNG (pdfplumber renders through pypdfium2/Pillow)."""
+    with pdfplumber.open(source) as pdf:
+        if not pdf.pages:
+            raise ValueError("PDF has no pages")
+        image = pdf.pages[0].to_image(width=width).original
+    out = io.BytesIO()
+    image.convert("L").save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def build_preview(store, file_hash: str, text: Optional[str]) -> Dict:
+    """
+    Preview stage of ingestion: first-page thumbnail kept in the blob store
+    (itself content addressed) and a text snippet for list views. A PDF that
+    can't be rendered only loses its thumbnail.
+    """
+    preview = {"snippet": text_snippet(text), "thumbnail_hash": None, "thumbnail_error": None}
+    try:
+        with store.open(file_hash) as source:
+            png = render_thumbnail(source)
+        preview["thumbnail_hash"], preview["thumbnail_size"] = store.put(io.BytesIO(png))
+    except Exception as e:
+        preview["thumbnail_error"] = str(e)
+    return preview
@@ -0,0 +1,288 @@
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from db import get_db
+from services.matching import (
+    score_calculate, input_hash, pair_key, scorer_version, global_score, justify_subscores, MatchingError,
+    model_name, PROMPT_VERSION
+)
+from services.llm_client import CircuitOpenError
+from services.write_batcher import WriteBatcher
+
+
+def stored_hash(doc: Dict) -> Optional[str]:
+    """Input hash of a job or CV: its stored `extracted_hash`, computed for documents without one."""
+    return doc.get("extracted_hash") or input_hash(doc.get("extracted"))
+
+
+def ensure_input_hashes(db=None, batch_size: int = 500) -> int:
+    """
+    Store the `extracted_hash` of jobs and CVs extracted before it existed,
+    so the stale selections can compare it in the database. Returns how many were added.
+    """
+    db = db or get_db()
+    added = 0
+    for collection in (db.jobs, db.cvs):
+        ops = []
+        for doc in collection.find({"extracted_hash": {"$exists": False}}, {"extracted": 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"extracted_hash": input_hash(doc.get("extracted"))}}))
+            if len(ops) >= batch_size:
+                added += collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            added += collection.bulk_write(ops, ordered=False).modified_count
+    return added
+
+
+def needs_scoring(job: Dict, cv: Dict, threshold: Optional[float] = None, record: Optional[Dict] = None) -> bool:
+    """
+    A CV needs (re)scoring when it has no score, or when its score was computed
+    from different inputs (requirements, CV fields, model or prompt version).
+    Scores saved before provenance keys existed are kept as they are, unless
+    flagged `stale` (their job or CV was re-extracted by the backfill).
+    Same rules as stale_query(), for one pair already loaded.
+
+    `record` is the document holding the score: the CV itself for the job it
+    was uploaded for, an `applications` document for any other job.
+    """
+    record = cv if record is None else record
+    scoring = record.get("scoring") or {}
+    key = pair_key(stored_hash(job), stored_hash(cv))
+
+    if scoring.get("status") == "failed" or scoring.get("stale"):
+        return True
+    if "score" in record:
+        return bool(scoring.get("key")) and scoring["key"] != key
+    if scoring.get("status") == "below_threshold" and scoring.get("key") == key:
+        # Already proven unable to reach this threshold
+        return scoring.get("upper_bound", 1) >= (threshold if threshold is not None else 0)
+    return True
+
+
+def stale_query(job_hash: Optional[str], cv_hash: str, threshold: Optional[float] = None) -> Dict:
+    """
+    Filter on the documents holding scores (CVs or joined applications)
+    matching those needs_scoring() would rescore. A score is current when the
+    job hash, CV hash and scorer version recorded with it are the ones of
+    today; `cv_hash` is the expression of the CV's stored `extracted_hash`.
+    """
+    not_current = {"$expr": {"$or": [
+        {"$ne": ["$scoring.job_hash", job_hash]},
+        {"$ne": ["$scoring.scorer", scorer_version()]},
+        {"$ne": ["$scoring.cv_hash", cv_hash]},
+    ]}}
+    return {"$or": [
+        {"scoring.status": "failed"},
+        {"scoring.stale": True},
+        {"score": {"$exists": True}, "scoring.key": {"$exists": True}, **not_current},
+        {"score": {"$exists": False}, "scoring.status": {"$ne": "below_threshold"}},
+        {"score": {"$exists": False}, "scoring.status": "below_threshold", "$or": [
+            {"scoring.upper_bound": {"$not": {"$lt": threshold if threshold is not None else 0}}},
+            not_current,
+        ]},
+    ]}
+
+
+def stale_cvs(db, job: Dict, threshold: Optional[float] = None, cv_ids=None) -> List[Dict]:
+    """CVs uploaded for the job (or those of `cv_ids`) whose score is missing or stale, selected in the database."""
+    query = {"job_id": job["_id"], **stale_query(stored_hash(job), "$extracted_hash", threshold)}
+    if cv_ids is not None:
+        query["_id"] = {"$in": list(cv_ids)}
+    return list(db.cvs.find(query, {"extracted_hash": 1}))
+
+
+def stale_applications(db, job: Dict, threshold: Optional[float] = None, cv_ids=None) -> List[Dict]:
+    """
+    (application, cv) pairs of CVs linked to the job through `applications`
+    whose score is missing or stale, selected in the database: each
+    application is joined with its CV's `extracted_hash` only.
+    """
+    match = {"job_id": job["_id"]}
+    if cv_ids is not None:
+        match["cv_id"] = {"$in": list(cv_ids)}
+    rows = db.applications.aggregate([
+        {"$match": match},
+        {"$lookup": {
+            "from": "cvs",
+            "let": {"cvId": "$cv_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$_id", "$$cvId"]}}},
+                {"$project": {"extracted_hash": 1}},
+            ],
+            "as": "cv",
+        }},
+        {"$unwind": "$cv"},
+        {"$match": stale_query(stored_hash(job), "$cv.extracted_hash", threshold)},
+    ])
+    return [(row, row.pop("cv")) for row in rows]
+
+
+def _update(db, writes: Optional[WriteBatcher], collection: str, filter: Dict, update: Dict, upsert: bool = False):
+    if writes is None:
+        db[collection].update_one(filter, update, upsert=upsert)
+    else:
+        writes.update(collection, filter, update, upsert)
+
+
+def score_cv(db, job: Dict, cv: Dict, threshold: Optional[float] = None, application: Optional[Dict] = None,
+             writes: Optional[WriteBatcher] = None, lease: Optional[str] = None,
+             lease_alive: Optional[Callable[[], bool]] = None) -> Dict:
+    """
+    Score one CV against a job, persist the outcome and return a result row.
+    The outcome goes on the CV for the job it was uploaded for, or on the
+    `application` document linking it to another job.
+    Subscores already computed for the same provenance key (same
+    requirements, CV fields, model and prompt) are reused without any LLM call.
+
+    A MatchingError caused by an open circuit is re-raised (after persisting
+    the failure) so callers can stop their batch while the provider is down.
+    With `writes`, the outcome is buffered in that batcher instead of written
+    now; the shared subscores are still written at once.
+
+    From a queue task, `lease` is the token the task's worker tagged the scored
+    document with (`scoring_lease`): the outcome is only written while the tag
+    is unchanged, i.e. no other worker took the task over. `lease_alive` is
+    checked before the LLM calls and before the writes; a lost lease returns
+    "lease_lost" with nothing written.
+    """
+    cv_id = str(cv["_id"])
+    target, target_id = ("applications", application["_id"]) if application else ("cvs", cv["_id"])
+    target_filter = {"_id": target_id, **({"scoring_lease": lease} if lease else {})}
+    release = {"scoring_lease": ""} if lease else {}
+    row = {"cv_id": cv_id, **({"application_id": str(application["_id"])} if application else {})}
+    cv_extracted = cv.get("extracted") or {}
+    extraction_status = (cv.get("extraction") or {}).get("status", "succeeded")
+    if not cv_extracted or extraction_status != "succeeded":
+        # Partial (fast ingest) or failed extractions would score as near zero
+        return {**row, "status": "skipped", "error": "CV extraction is not complete"}
+
+    job_extracted = job.get("extracted") or {}
+    weights = job.get("weights")
+    job_hash, cv_hash = stored_hash(job), stored_hash(cv)
+    key = pair_key(job_hash, cv_hash)
+    now = datetime.utcnow()
+    provenance = {
+        "key": key, "job_hash": job_hash, "cv_hash": cv_hash, "scorer": scorer_version(),
+        "model": model_name, "prompt_version": PROMPT_VERSION
+    }
+
+    cached = db.score_results.find_one({"_id": key})
+    if cached:
+        score_details = {
+            "status": "scored",
+            "score": global_score(cached["subscores"], weights),
+            "subscores": cached["subscores"],
+        }
+    elif lease_alive and not lease_alive():
+        return {**row, "status": "lease_lost"}
+    else:
+        try:
+            score_details = score_calculate(job_extracted, cv_extracted, threshold, weights)
+        except MatchingError as e:
+            # No `score` is written: the CV stays in the "to score" set
+            _update(
+                db, writes, target,
+                target_filter,
+                {"$set": {"scoring": {
+                    **provenance,
+                    "status": "failed",
+                    "retryable": e.retryable,
+                    "error": str(e),
+                    "failed_at": now
+                }}, **({"$unset": release} if release else {})}
+            )
+            if isinstance(e.__cause__, CircuitOpenError):
+                raise
+            return {**row, "status": "failed", "retryable": e.retryable, "error": str(e)}
+
+    if not cached and score_details["status"] != "below_threshold":
+        # Shared by every CV/job pair with identical inputs. Never buffered:
+        # a later pair of the same batch must find it before its LLM calls
+        db.score_results.update_one(
+            {"_id": key},
+            {"$setOnInsert": {**provenance, "subscores": score_details["subscores"], "created_at": now}},
+            upsert=True
+        )
+
+    if lease_alive and not lease_alive():
+        return {**row, "status": "lease_lost"}  # the subscores above still spare the next worker its LLM calls
+
+    if score_details["status"] == "below_threshold":
+        # Kept apart from `subscores`, which always holds the four dimensions
+        _update(
+            db, writes, target,
+            target_filter,
+            {"$set": {"scoring": {
+                **provenance,
+                "status": "below_threshold",
+                "threshold": threshold,
+                "upper_bound": score_details["upper_bound"],
+                "partial_subscores": score_details["subscores"],
+                "scored_at": now
+            }}, "$unset": {"score": "", "subscores": "", **release}}
+        )
+        return {
+            **row,
+            "status": "below_threshold",
+            "upper_bound": score_details["upper_bound"],
+            "subscores": score_details["subscores"]
+        }
+
+    _update(
+        db, writes, target,
+        target_filter,
+        {"$set": {
+            "score": score_details["score"],      # ✅ global score
+            "subscores": score_details["subscores"],  # ✅ detailed breakdown
+            "scoring": {**provenance, "status": "succeeded", "reused": bool(cached), "scored_at": now}
+        }, **({"$unset": release} if release else {})}
+    )
+    return {
+        **row,
+        "status": "succeeded",
+        "reused": bool(cached),
+        "score": score_details["score"],
+        "subscores": score_details["subscores"]
+    }
+
+
+def justify_scores(db, job: Dict, cv: Dict, application: Optional[Dict] = None) -> Dict:
+    """
+    Subscores of a scored pair with every justification filled in. Missing ones
+    (scores-only mode) are generated now and cached on the scored document and
+    on the shared `score_results` entry, so they are written once per key.
+    """
+    record = application if application is not None else cv
+    stored = record.get("subscores") or {}
+    if not stored:
+        return stored
+
+    subscores = stored
+    key = (record.get("scoring") or {}).get("key")
+    cached = db.score_results.find_one({"_id": key}, {"subscores": 1}) if key else None
+    if cached:
+        # Another pair with the same inputs may have been justified already
+        subscores = {
+            k: v if v.get("short_justification") else {
+                **v, "short_justification": (cached["subscores"].get(k) or {}).get("short_justification")
+            }
+            for k, v in stored.items()
+        }
+
+    completed = justify_subscores(job.get("extracted") or {}, cv.get("extracted") or {}, subscores)
+    subscores = {**subscores, **completed}
+    update = {
+        f"subscores.{k}.short_justification": v["short_justification"]
+        for k, v in subscores.items() if v.get("short_justification") != stored[k].get("short_justification")
+    }
+    if update:
+        target = db.applications if application is not None else db.cvs
+        target.update_one({"_id": record["_id"]}, {"$set": update})
+    if key and completed:
+        db.score_results.update_one(
+            {"_id": key},
+            {"$set": {f"subscores.{k}.short_justification": v["short_justification"] for k, v in completed.items()}}
+        )
+    return subscores
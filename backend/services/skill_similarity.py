@@ -0,0 +1,172 @@
+import json
+import re
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from pymongo import UpdateOne
+
+from db import get_db
+from services.llm_client import generate_content, LLMError
+
+model_name = "gemini-2.5-flash"
+
+# Max pairs sent to the model in one request
+BATCH_SIZE = 200
+
+# Same scale the per-list prompts used: exact, related/close, unrelated
+ALLOWED_SIMILARITIES = (0.0, 0.5, 1.0)
+
+
+class SkillSimilarityError(Exception):
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def normalize_skill(skill) -> str:
+    skill = " ".join(str(skill or "").lower().split())
+    return skill.strip(" .,;:-*()[]")
+
+
+def pair_key(a: str, b: str) -> str:
+    # Similarity is symmetric: one entry serves both directions
+    return "|".join(sorted((a, b)))
+
+
+# In-process layer in front of the `skill_pairs` collection
+_memo: Dict[str, float] = {}
+_memo_lock = threading.Lock()
+
+
+def _lookup(keys: Iterable[str]) -> Dict[str, float]:
+    keys = set(keys)
+    with _memo_lock:
+        found = {k: _memo[k] for k in keys if k in _memo}
+    missing = keys - found.keys()
+    if missing:
+        for doc in get_db().skill_pairs.find({"_id": {"$in": list(missing)}}, {"similarity": 1}):
+            found[doc["_id"]] = doc["similarity"]
+        with _memo_lock:
+            _memo.update({k: found[k] for k in missing if k in found})
+    return found
+
+
+def _store(similarities: Dict[Tuple[str, str], float]):
+    if not similarities:
+        return
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"_id": pair_key(a, b)},
+            {"$setOnInsert": {"skills": sorted((a, b)), "similarity": sim, "model": model_name, "created_at": now}},
+            upsert=True,
+        )
+        for (a, b), sim in similarities.items()
+    ]
+    get_db().skill_pairs.bulk_write(ops, ordered=False)
+    with _memo_lock:
+        _memo.update({pair_key(a, b): sim for (a, b), sim in similarities.items()})
+
+
+def _ask_model(pairs: List[Tuple[str, str]], kind: str) -> Dict[Tuple[str, str], float]:
+    listing = "\n".join(f"{i}. {a} <> {b}" for i, (a, b) in enumerate(pairs))
+    system_instruction = f"""
+You compare pairs of {kind} skills from a job offer and a CV.
+For each pair return a similarity:
+- 1 if they are the same skill (synonyms, abbreviations, spelling variants)
+- 0.5 if they are related/close (e.g., TensorFlow vs PyTorch, Java vs Kotlin, communication vs team player)
+- 0 if they are unrelated
+Always return the SAME value for the same pair (no randomness).
+
+Return JSON only, no markdown fences, no extra text: a list of numbers, one per pair, in order.
+"""
+    try:
+        response = generate_content(model_name, listing, system_instruction=system_instruction)
+        text = response.candidates[0].content.parts[0].text.strip()
+    except LLMError as e:
+        raise SkillSimilarityError(str(e), retryable=e.retryable) from e
+    except Exception as e:
+        raise SkillSimilarityError(f"Empty response from Gemini: {e}")
+
+    text = re.sub(r"^```[a-zA-Z]*\s*|\s*```$", "", text).strip()
+    try:
+        values = [float(v) for v in json.loads(text)]
+    except Exception as e:
+        raise SkillSimilarityError(f"Failed to parse similarities: {e}")
+    if len(values) != len(pairs):
+        raise SkillSimilarityError(f"Expected {len(pairs)} similarities, got {len(values)}")
+
+    # Snap to the allowed scale so stored values stay consistent
+    return {
+        pair: min(ALLOWED_SIMILARITIES, key=lambda allowed: abs(allowed - v))
+        for pair, v in zip(pairs, values)
+    }
+
+
+def similarities_for(job_skills: List[str], cv_skills: List[str], kind: str) -> Dict[Tuple[str, str], float]:
+    """
+    Similarity of every (job skill, CV skill) pair that matters, keyed on
+    normalized skills. Exact matches are free, known pairs come from the memo,
+    and only never-seen pairs go to the model, in batched requests whose
+    answers are stored for reuse.
+    """
+    job_norm = {normalize_skill(s) for s in job_skills} - {""}
+    cv_norm = {normalize_skill(s) for s in cv_skills} - {""}
+
+    result = {}
+    pairs = []
+    for j in job_norm:
+        if j in cv_norm:
+            result[(j, j)] = 1.0
+            continue  # best possible match already found for this requirement
+        pairs.extend((j, c) for c in cv_norm)
+
+    known = _lookup(pair_key(a, b) for a, b in pairs)
+    unknown = []
+    for a, b in pairs:
+        key = pair_key(a, b)
+        if key in known:
+            result[(a, b)] = known[key]
+        else:
+            unknown.append((a, b))
+
+    for start in range(0, len(unknown), BATCH_SIZE):
+        learned = _ask_model(unknown[start:start + BATCH_SIZE], kind)
+        _store(learned)
+        result.update(learned)
+
+    return result
+
+
+def score_skills(job_skills: List[str], cv_skills: List[str], kind: str) -> Dict:
+    """
+    Same contract as the LLM scorers: {score, short_justification}.
+    Each required skill gets its best similarity against the CV skills,
+    the score is the average (1 when the job lists no skills).
+    """
+    job_norm = list(dict.fromkeys(s for s in (normalize_skill(x) for x in job_skills or []) if s))
+    if not job_norm:
+        return {"score": 1.0, "short_justification": f"The job does not list any required {kind} skills."}
+
+    cv_norm = list(dict.fromkeys(s for s in (normalize_skill(x) for x in cv_skills or []) if s))
+    sims = similarities_for(job_norm, cv_norm, kind)
+
+    exact, related, missing = [], [], []
+    total = 0.0
+    for j in job_norm:
+        best = max((sims.get((j, c), 0.0) for c in cv_norm), default=0.0)
+        total += best
+        (exact if best >= 1.0 else related if best > 0 else missing).append(j)
+
+    parts = []
+    if exact:
+        parts.append(f"matched: {', '.join(exact)}")
+    if related:
+        parts.append(f"related: {', '.join(related)}")
+    if missing:
+        parts.append(f"missing: {', '.join(missing)}")
+    return {
+        "score": round(total / len(job_norm), 2),
+        "short_justification": f"{len(exact)}/{len(job_norm)} required {kind} skills matched ({'; '.join(parts)}).",
+    }
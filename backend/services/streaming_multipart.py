@@ -0,0 +1,96 @@
+from typing import BinaryIO, Iterator, Tuple, Union
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+CHUNK_SIZE = 64 * 1024
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class MultipartError(Exception):
+    pass
+
+
+class FilePart:
+    """File-like view of one file part: its bytes are decoded as they are read."""
+
+    def __init__(self, reader: "StreamingMultipartReader", name: str, filename: str):
+        self._reader = reader
+        self.name = name
+        self.filename = filename
+
+    def read(self, size: int = -1) -> bytes:
+        return self._reader._read_file(size)
+
+
+class StreamingMultipartReader:
+    """
+    Pull parser over a multipart/form-data request body, built on Werkzeug's
+    sans-IO decoder. Parts are handed out in the order they arrive, and a file
+    part is read straight from the request stream, CHUNK_SIZE at a time:
+    nothing is spooled, so memory stays flat whatever the size of the body.
+    Fields must come before the files that need them.
+    """
+
+    def __init__(self, stream: BinaryIO, content_type: str, chunk_size: int = CHUNK_SIZE):
+        mimetype, options = parse_options_header(content_type or "")
+        if mimetype != "multipart/form-data" or not options.get("boundary"):
+            raise MultipartError("expected a multipart/form-data body")
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = MultipartDecoder(options["boundary"].encode("latin-1"))
+        self._buffer = bytearray()
+        self._file_done = True
+
+    def _next_event(self):
+        while True:
+            try:
+                event = self.decoder.next_event()
+            except ValueError as e:
+                raise MultipartError(f"malformed multipart body: {e}")
+            if not isinstance(event, NeedData):
+                return event
+            chunk = self.stream.read(self.chunk_size)
+            self.decoder.receive_data(chunk or None)  # None: end of the body
+
+    def _read_file(self, size: int) -> bytes:
+        while not self._file_done and (size < 0 or len(self._buffer) < size):
+            event = self._next_event()
+            if not isinstance(event, Data):
+                raise MultipartError("truncated file part")
+            self._buffer += event.data
+            if not event.more_data:
+                self._file_done = True
+        n = len(self._buffer) if size < 0 else min(size, len(self._buffer))
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    def parts(self) -> Iterator[Tuple[str, str, Union[str, FilePart]]]:
+        """
+        Yield ("field", name, value) and ("file", name, FilePart). A file part
+        not read to the end by the caller is skipped when the next part is asked for.
+        """
+        while True:
+            while not self._file_done:
+                self._read_file(self.chunk_size)
+            self._buffer.clear()
+
+            event = self._next_event()
+            if isinstance(event, Epilogue):
+                return
+            if isinstance(event, Field):
+                value = bytearray()
+                while True:
+                    data = self._next_event()
+                    if not isinstance(data, Data):
+                        raise MultipartError("truncated form field")
+                    value += data.data
+                    if len(value) > MAX_FIELD_BYTES:
+                        raise MultipartError(f"form field {event.name} is too large")
+                    if not data.more_data:
+                        break
+                yield "field", event.name, value.decode("utf-8", "replace")
+            elif isinstance(event, File):
+                self._file_done = False
+                yield "file", event.name, FilePart(self, event.name, event.filename)
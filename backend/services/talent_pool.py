@@ -0,0 +1,266 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from services.heuristic_extraction import DEGREE_LEVEL_RES, degree_level
+from services.matching import normalize_weights
+from services.skill_similarity import normalize_skill
+
+# Changes made by other processes (uploads, import_cvs.py, the backfill) are
+# pulled from the database at most this often, before ranking
+SYNC_INTERVAL_SECONDS = float(os.getenv("TALENT_POOL_SYNC_SECONDS", 2))
+# Re-read CVs updated this long before the last sync: covers writes stamped
+# before it but committed after (buffered inserts, clock skew between hosts)
+SYNC_OVERLAP_SECONDS = float(os.getenv("TALENT_POOL_SYNC_OVERLAP_SECONDS", 30))
+# Deleted CV ids are kept this long in `cv_deletions` for the other processes
+DELETION_RETENTION_SECONDS = int(os.getenv("TALENT_POOL_DELETION_RETENTION_SECONDS", 86400))
+
+CV_FIELDS = {"extracted.tech_skills": 1, "extracted.soft_skills": 1, "extracted.education": 1}
+
+# Highest first, as listed in DEGREE_LEVEL_RES
+LEVEL_RANK = {label: len(DEGREE_LEVEL_RES) - i for i, (_, label) in enumerate(DEGREE_LEVEL_RES)}
+
+
+def education_level(education: List[str]) -> int:
+    # Extracted education entries: every line is in an education context
+    levels = [LEVEL_RANK[label] for label in (degree_level(line, True) for line in education or []) if label]
+    return max(levels, default=0)
+
+
+def cv_features(extracted: Dict) -> Dict:
+    extracted = extracted or {}
+    return {
+        "tech": {normalize_skill(s) for s in extracted.get("tech_skills") or []} - {""},
+        "soft": {normalize_skill(s) for s in extracted.get("soft_skills") or []} - {""},
+        "level": education_level(extracted.get("education")),
+    }
+
+
+class _Ranking:
+    """
+    Sorted (-score, cv_id) rows of one job. `live` maps each ranked CV to its
+    row's -score: removing a CV only drops it from the map, and rows no longer
+    in it are compacted away on the next read.
+    """
+
+    def __init__(self, key, requirements, weights, rows):
+        self.key = key
+        self.requirements = requirements
+        self.weights = weights
+        self._rows = rows
+        self.live = {cv_id: neg for neg, cv_id in rows}
+        self.stale = 0
+
+    def add(self, cv_id: str, score: float):
+        self.discard(cv_id)
+        bisect.insort(self._rows, (-score, cv_id))
+        self.live[cv_id] = -score
+
+    def discard(self, cv_id: str):
+        if self.live.pop(cv_id, None) is not None:
+            self.stale += 1
+
+    @property
+    def rows(self) -> List[tuple]:
+        if self.stale:
+            seen = set()
+            rows = []
+            for neg, cv_id in self._rows:
+                if self.live.get(cv_id) == neg and cv_id not in seen:
+                    seen.add(cv_id)
+                    rows.append((neg, cv_id))
+            self._rows = rows
+            self.stale = 0
+        return self._rows
+
+
+class TalentPoolIndex:
+    """
+    In-process index of every stored CV's cheap local features (normalized
+    tech/soft skills, highest degree level) with inverted skill postings.
+
+    Ranking a job only touches the postings of its required skills, so the
+    cost grows with the number of matching candidates, not the pool size.
+    Ranked rows are cached per job and kept up to date as CVs are added or
+    removed, here or, through sync(), by any other process. The local score approximates the LLM score: exact skill overlap
+    and degree level, weighted with the job's profile (experience is left to
+    full LLM scoring).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._synced_at: Optional[datetime] = None
+        self._checked_at = 0.0
+        self.features: Dict[str, Dict] = {}
+        self.postings = {"tech": {}, "soft": {}}
+        self._rankings: Dict[str, _Ranking] = {}
+
+    def ensure_loaded(self, db):
+        """Load the index on first use, then pull the changes made since the last sync."""
+        with self._lock:
+            if self._loaded:
+                self.sync(db)
+                return
+            started = datetime.utcnow()
+            self.features.clear()
+            self.postings = {"tech": {}, "soft": {}}
+            self._rankings.clear()
+            for doc in db.cvs.find({"extracted": {"$ne": None}}, CV_FIELDS):
+                self._add(str(doc["_id"]), doc.get("extracted"))
+            self._loaded = True
+            self._synced_at = started
+            self._checked_at = time.monotonic()
+
+    def sync(self, db, force: bool = False):
+        """
+        Apply the CVs stored, re-extracted or deleted by any process since the
+        last sync: those with a newer `updated_at`, and the ids recorded in
+        `cv_deletions`. An index idle for longer than deletions are kept is
+        reloaded instead.
+        """
+        with self._lock:
+            if not self._loaded:
+                return self.ensure_loaded(db)
+            if not force and time.monotonic() - self._checked_at < SYNC_INTERVAL_SECONDS:
+                return
+            started = datetime.utcnow()
+            if started - self._synced_at > timedelta(seconds=DELETION_RETENTION_SECONDS):
+                self._loaded = False
+                return self.ensure_loaded(db)
+
+            since = self._synced_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)
+            for doc in db.cvs.find({"updated_at": {"$gte": since}}, CV_FIELDS):
+                if doc.get("extracted"):
+                    self.add_cv(doc["_id"], doc["extracted"])
+                else:
+                    self.remove_cv(doc["_id"])
+            for doc in db.cv_deletions.find({"deleted_at": {"$gte": since}}, {"cv_id": 1}):
+                self.remove_cv(doc["cv_id"])
+            self._synced_at = started
+            self._checked_at = time.monotonic()
+
+    def _add(self, cv_id: str, extracted: Dict):
+        self._remove(cv_id)
+        features = cv_features(extracted)
+        self.features[cv_id] = features
+        for kind in ("tech", "soft"):
+            for skill in features[kind]:
+                self.postings[kind].setdefault(skill, set()).add(cv_id)
+
+    def _remove(self, cv_id: str):
+        features = self.features.pop(cv_id, None)
+        if not features:
+            return
+        for kind in ("tech", "soft"):
+            for skill in features[kind]:
+                ids = self.postings[kind].get(skill)
+                if ids:
+                    ids.discard(cv_id)
+                    if not ids:
+                        del self.postings[kind][skill]
+
+    def add_cv(self, cv_id, extracted: Dict):
+        cv_id = str(cv_id)
+        with self._lock:
+            if not self._loaded:
+                return  # picked up when the index is first loaded
+            self._add(cv_id, extracted)
+            for ranking in self._rankings.values():
+                score = self._score(ranking.requirements, ranking.weights, self.features[cv_id])
+                if score is None:
+                    ranking.discard(cv_id)
+                else:
+                    ranking.add(cv_id, score)
+
+    def remove_cv(self, cv_id):
+        cv_id = str(cv_id)
+        with self._lock:
+            self._remove(cv_id)
+            for ranking in self._rankings.values():
+                ranking.discard(cv_id)
+
+    @staticmethod
+    def _requirements(job_extracted: Dict) -> Dict:
+        req = cv_features(job_extracted)
+        return {"tech": sorted(req["tech"]), "soft": sorted(req["soft"]), "level": req["level"]}
+
+    @staticmethod
+    def _score(requirements: Dict, weights: Dict, features: Dict) -> Optional[float]:
+        """Local score of one CV, None when it shares no required skill."""
+        tech, soft = requirements["tech"], requirements["soft"]
+        tech_hits = len(features["tech"].intersection(tech))
+        soft_hits = len(features["soft"].intersection(soft))
+        if (tech or soft) and not (tech_hits or soft_hits):
+            return None
+        level = requirements["level"]
+        parts = {
+            "tech_skills": tech_hits / len(tech) if tech else 1.0,
+            "soft_skills": soft_hits / len(soft) if soft else 1.0,
+            "education": min(1.0, features["level"] / level) if level else 1.0,
+        }
+        total = sum(weights[k] for k in parts)
+        return round(sum(weights[k] * v for k, v in parts.items()) / total, 4) if total else 0.0
+
+    def rank(self, job_id, job_extracted: Dict, weights: Optional[Dict] = None) -> List[tuple]:
+        """All candidates sharing at least one required skill, as sorted (-score, cv_id) rows."""
+        job_id = str(job_id)
+        requirements = self._requirements(job_extracted or {})
+        weights = normalize_weights(weights)
+        key = hashlib.sha256(json.dumps([requirements, weights], sort_keys=True).encode()).hexdigest()
+
+        with self._lock:
+            cached = self._rankings.get(job_id)
+            if cached and cached.key == key:
+                return cached.rows
+
+            tech, soft, level = requirements["tech"], requirements["soft"], requirements["level"]
+            if tech or soft:
+                # Only candidates found in the postings of a required skill;
+                # posting hits are the skill overlap counts, no set intersection needed
+                hits = {kind: Counter() for kind in ("tech", "soft")}
+                for kind in ("tech", "soft"):
+                    for skill in requirements[kind]:
+                        hits[kind].update(self.postings[kind].get(skill, ()))
+                candidates = hits["tech"].keys() | hits["soft"].keys()
+            else:
+                hits = {"tech": Counter(), "soft": Counter()}
+                candidates = self.features.keys()
+
+            w_tech, w_soft, w_edu = weights["tech_skills"], weights["soft_skills"], weights["education"]
+            total = (w_tech + w_soft + w_edu) or 1.0
+            tech_hits, soft_hits, features = hits["tech"], hits["soft"], self.features
+            rows = []
+            for cv_id in candidates:
+                score = (
+                    w_tech * (tech_hits[cv_id] / len(tech) if tech else 1.0)
+                    + w_soft * (soft_hits[cv_id] / len(soft) if soft else 1.0)
+                    + w_edu * (min(1.0, features[cv_id]["level"] / level) if level else 1.0)
+                ) / total
+                rows.append((-round(score, 4), cv_id))
+            rows.sort()
+            self._rankings[job_id] = _Ranking(key, requirements, weights, rows)
+            return rows
+
+    def forget_job(self, job_id):
+        with self._lock:
+            self._rankings.pop(str(job_id), None)
+
+
+def record_deletion(db, cv_id):
+    """Let the other processes' indexes drop a deleted CV on their next sync."""
+    now = datetime.utcnow()
+    db.cv_deletions.insert_one({
+        "cv_id": cv_id,
+        "deleted_at": now,
+        "expires_at": now + timedelta(seconds=DELETION_RETENTION_SECONDS)
+    })
+
+
+talent_pool = TalentPoolIndex()
@@ -0,0 +1,214 @@
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+
+# Rough Gemini tokenizer ratio for Latin text; good enough for reporting savings
+CHARS_PER_TOKEN = 4
+
+# How many lines at the top/bottom of each page are header/footer candidates
+EDGE_LINES = 3
+
+MAX_CHARS = int(os.getenv("CV_TEXT_MAX_CHARS", 0))  # 0 = no cap
+
+BULLET_CHARS = "•●○◦▪▫■□◆◇►▶▸‣⁃∙·✓✔✗✘★☆➢➤➔→⇒❖♦"
+DECORATIVE_RE = re.compile("[\u2500-\u259f\ue000-\uf8ff\ufffd]")  # box drawing, blocks, private use
+RULE_LINE_RE = re.compile(r"^[\s\-_=~*.·•|#+]{3,}$")
+# Short numbers only ("3", "- 3 -", "3/5", "page 3 of 5"): a phone number or a year is content
+PAGE_NUMBER_RE = re.compile(
+    r"^(page\s*\d{1,3}(\s*(/|of|sur)\s*\d{1,3})?|[-–(\[]?\s*\d{1,3}\s*[-–)\]]?|\d{1,3}\s*(/|of|sur)\s*\d{1,3})$",
+    re.IGNORECASE,
+)
+SOFT_HYPHEN_BREAK_RE = re.compile("(\\w)\u00ad\n(\\w)")
+HYPHEN_BREAK_RE = re.compile("(\\w+)-\n([a-z\u00e0-\u00ff]\\w*)")
+WORD_RE = re.compile(r"\w+")
+# Optional word list (one word per line, e.g. /usr/share/dict/words) to recognise split words
+HYPHEN_WORDLIST = os.getenv("CV_HYPHEN_WORDLIST", "")
+SPACES_RE = re.compile("[ \t\u00a0\u2000-\u200b\u3000]+")
+
+# Sections in the order we give them up when a length cap applies (first = dropped first)
+LOW_PRIORITY_SECTIONS = (
+    "references", "interests", "hobbies", "publications", "conferences",
+    "activities", "volunteer", "awards", "projects", "languages",
+)
+SECTION_HEADING_RE = re.compile(
+    r"^(profile|summary|objective|about me|experience|work experience|professional experience|employment|"
+    r"education|academic background|skills|technical skills|soft skills|competencies|certifications?|"
+    r"certificates?|training|projects|publications|conferences|references|interests|hobbies|"
+    r"activities|volunteer(ing)?|awards|honors|languages|accomplishments)\s*:?$",
+    re.IGNORECASE,
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _normalize_line(line: str) -> str:
+    line = unicodedata.normalize("NFKC", line)
+    line = DECORATIVE_RE.sub(" ", line)
+    stripped = line.strip()
+    if stripped and stripped[0] in BULLET_CHARS:
+        stripped = "- " + stripped[1:].lstrip()
+    for ch in BULLET_CHARS:
+        if ch in stripped:
+            stripped = stripped.replace(ch, " ")
+    return SPACES_RE.sub(" ", stripped).strip()
+
+
+def _edge_key(line: str) -> str:
+    # Page numbers change from page to page: ignore digits when matching headers/footers
+    return re.sub(r"\d+", "#", line.lower())
+
+
+def _repeated_edge_lines(pages: List[List[str]]) -> set:
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for lines in pages:
+        edges = {_edge_key(l) for l in lines[:EDGE_LINES] + lines[-EDGE_LINES:] if l}
+        counts.update(edges)
+    min_pages = max(2, (len(pages) + 1) // 2)
+    return {key for key, n in counts.items() if n >= min_pages}
+
+
+_wordlist = None
+
+
+def _dictionary() -> set:
+    global _wordlist
+    if _wordlist is None:
+        _wordlist = set()
+        if HYPHEN_WORDLIST and os.path.exists(HYPHEN_WORDLIST):
+            with open(HYPHEN_WORDLIST, encoding="utf-8", errors="ignore") as f:
+                _wordlist = {w.strip().lower() for w in f if w.strip()}
+    return _wordlist
+
+
+def join_hyphen_breaks(text: str) -> str:
+    """
+    Undo line-end hyphenation. A soft hyphen is always a break. A real hyphen
+    is kept ("full-\nstack" -> "full-stack", "Self-\nmotivated" ->
+    "Self-motivated") unless the joined word is known, from the document
+    itself or the word list, and the hyphenated form is not.
+    """
+    text = SOFT_HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    lower = text.lower()
+    vocabulary = set(WORD_RE.findall(lower))
+
+    def join(match):
+        head, tail = match.group(1), match.group(2)
+        joined = (head + tail).lower()
+        hyphenated = f"{head}-{tail}".lower()
+        if (joined in vocabulary or joined in _dictionary()) and hyphenated not in lower:
+            return head + tail
+        return f"{head}-{tail}"
+
+    return HYPHEN_BREAK_RE.sub(join, text)
+
+
+def split_sections(text: str) -> List[Tuple[Optional[str], str]]:
+    sections = [(None, [])]
+    for line in text.split("\n"):
+        match = SECTION_HEADING_RE.match(line.strip())
+        if match:
+            sections.append((match.group(1).lower(), [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(name, "\n".join(lines)) for name, lines in sections if lines]
+
+
+def _section_priority(name: Optional[str]) -> int:
+    if name is None:
+        return len(LOW_PRIORITY_SECTIONS) + 1  # header block: name, contact details
+    for i, low in enumerate(LOW_PRIORITY_SECTIONS):
+        if name.startswith(low):
+            return i
+    return len(LOW_PRIORITY_SECTIONS)
+
+
+def truncate_by_section(text: str, max_chars: int) -> str:
+    """
+    Shrink `text` to at most `max_chars`, dropping low-value sections
+    (references, hobbies, publications...) before touching the core ones,
+    then trimming the tail of each remaining section proportionally.
+    Section order is preserved.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+
+    sections = split_sections(text)
+    kept = list(range(len(sections)))
+    size = lambda idx: sum(len(sections[i][1]) + 1 for i in idx)
+
+    for i in sorted(kept, key=lambda i: _section_priority(sections[i][0])):
+        if size(kept) <= max_chars:
+            break
+        if _section_priority(sections[i][0]) < len(LOW_PRIORITY_SECTIONS):
+            kept.remove(i)
+
+    total = size(kept)
+    if total > max_chars:
+        ratio = max_chars / total
+        trimmed = []
+        for i in kept:
+            body = sections[i][1]
+            trimmed.append(body[:max(0, int(len(body) * ratio) - 1)].rstrip())
+        return "\n".join(t for t in trimmed if t)[:max_chars]
+
+    return "\n".join(sections[i][1] for i in kept)
+
+
+def compact_cv_text(pages: List[str], max_chars: Optional[int] = None) -> Tuple[str, Dict]:
+    """
+    Remove layout noise from the per-page text returned by pdfplumber before it
+    goes into a prompt: repeated headers/footers, page numbers, decorative glyphs,
+    hyphenation breaks and whitespace runs. Optionally caps the length.
+
+    Returns (compacted_text, stats).
+    """
+    if max_chars is None:
+        max_chars = MAX_CHARS
+    raw = "\n".join(p or "" for p in pages)
+
+    page_lines = [[_normalize_line(l) for l in (p or "").split("\n")] for p in pages]
+    page_lines = [[l for l in lines if l and not RULE_LINE_RE.match(l)] for lines in page_lines]
+    repeated = _repeated_edge_lines(page_lines)
+
+    seen_edges = set()
+    removed_lines = 0
+    kept_lines = []
+    for lines in page_lines:
+        last = len(lines) - 1
+        for i, line in enumerate(lines):
+            at_edge = i < EDGE_LINES or i > last - EDGE_LINES
+            if at_edge and PAGE_NUMBER_RE.match(line):
+                removed_lines += 1
+                continue
+            key = _edge_key(line)
+            if at_edge and key in repeated:
+                # Keep the first occurrence: the header often carries the candidate's name
+                if key in seen_edges:
+                    removed_lines += 1
+                    continue
+                seen_edges.add(key)
+            kept_lines.append(line)
+
+    text = join_hyphen_breaks("\n".join(kept_lines))
+    compacted_chars = len(text)
+    text = truncate_by_section(text, max_chars)
+
+    tokens_before = estimate_tokens(raw)
+    tokens_after = estimate_tokens(text)
+    stats = {
+        "chars_before": len(raw),
+        "chars_after": len(text),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "lines_removed": removed_lines,
+        "truncated": len(text) < compacted_chars,
+    }
+    return text, stats
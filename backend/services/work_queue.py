@@ -0,0 +1,276 @@
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from services.llm_client import PRIORITIES, llm_context
+from services.matching import MatchingError, pair_key
+from services.scoring import stale_cvs, stale_applications, stored_hash, needs_scoring, score_cv
+from services.write_batcher import WriteBatcher
+
+LEASE_SECONDS = int(os.getenv("SCORING_LEASE_SECONDS", 120))
+MAX_ATTEMPTS = int(os.getenv("SCORING_MAX_ATTEMPTS", 5))
+# A requeued task waits base * 2^(attempts-1) seconds (capped) before it can be claimed again
+RETRY_BASE_SECONDS = float(os.getenv("SCORING_RETRY_BASE_SECONDS", 10))
+RETRY_MAX_SECONDS = float(os.getenv("SCORING_RETRY_MAX_SECONDS", 600))
+
+DUPLICATE_KEY = 11000
+
+
+class JobNotReady(Exception):
+    """The job's requirements are not extracted (yet): scoring it would compare CVs against nothing."""
+    pass
+
+
+def extraction_ready(job: Dict) -> bool:
+    # Jobs saved before extraction metadata existed only have `extracted`
+    status = (job.get("extraction") or {}).get("status", "succeeded")
+    return status == "succeeded" and bool(job.get("extracted"))
+
+
+def new_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def enqueue_scoring(db, job: Dict, threshold: Optional[float] = None, cv_ids=None, priority: str = "normal") -> int:
+    """
+    Queue one `scoring_tasks` document per stale (job, CV) pair.
+    A pair has at most one active (queued or leased) task, enforced by a unique
+    partial index, so concurrent calls never queue the same pair twice.
+    `cv_ids` restricts the queueing to those CVs. `priority` is the LLM class
+    ("interactive", "normal", "bulk") the task is scored with; claims serve
+    higher classes first. Returns the number of new tasks.
+    Raises JobNotReady while the job's extraction has not succeeded.
+    """
+    if not extraction_ready(job):
+        raise JobNotReady(f"Job requirements are not extracted (status: {(job.get('extraction') or {}).get('status')})")
+    pairs = [(None, cv) for cv in stale_cvs(db, job, threshold, cv_ids)]
+    pairs += stale_applications(db, job, threshold, cv_ids)
+    if not pairs:
+        return 0
+
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"job_id": job["_id"], "cv_id": cv["_id"], "active": True},
+            {"$setOnInsert": {
+                "job_id": job["_id"],
+                "cv_id": cv["_id"],
+                "application_id": application["_id"] if application else None,
+                "key": pair_key(stored_hash(job), stored_hash(cv)),
+                "threshold": threshold,
+                "priority": priority,
+                "priority_rank": PRIORITIES.index(priority),
+                "active": True,
+                "status": "queued",
+                "attempts": 0,
+                "created_at": now,
+                "updated_at": now,
+            }},
+            upsert=True
+        )
+        for application, cv in pairs
+    ]
+    try:
+        return db.scoring_tasks.bulk_write(ops, ordered=False).upserted_count
+    except BulkWriteError as e:
+        # Lost an upsert race to another process: the pair is queued anyway
+        if any(err["code"] != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nUpserted", 0)
+
+
+def fail_exhausted(db, now: Optional[datetime] = None) -> int:
+    """
+    Fail the tasks whose lease expired on their last allowed attempt: a pair
+    that crashes or hangs its worker every time is not leased again forever.
+    """
+    now = now or datetime.utcnow()
+    res = db.scoring_tasks.update_many(
+        {"active": True, "status": "leased", "lease_expires_at": {"$lt": now}, "attempts": {"$gte": MAX_ATTEMPTS}},
+        {
+            "$set": {"status": "failed", "error": "Lease expired on every attempt", "updated_at": now},
+            "$unset": {"active": "", "lease_expires_at": ""}
+        }
+    )
+    return res.modified_count
+
+
+def claim(db, worker_id: str, job_id=None, cv_ids=None, exclude_ids=None) -> Optional[Dict]:
+    """
+    Atomically lease the oldest queued task of the highest priority class (or
+    one whose lease expired, i.e. its worker died, with attempts left). A
+    requeued task is not claimable before its `not_before` backoff. Optionally restricted to one
+    job and some CVs; `exclude_ids` skips tasks (e.g. the caller already
+    tried them).
+    """
+    now = datetime.utcnow()
+    fail_exhausted(db, now)
+    query = {
+        "active": True,
+        "$or": [
+            {"status": "queued", "not_before": {"$not": {"$gt": now}}},
+            {"status": "leased", "lease_expires_at": {"$lt": now}, "attempts": {"$lt": MAX_ATTEMPTS}},
+        ]
+    }
+    if job_id is not None:
+        query["job_id"] = job_id
+    if cv_ids is not None:
+        query["cv_id"] = {"$in": list(cv_ids)}
+    if exclude_ids:
+        query["_id"] = {"$nin": list(exclude_ids)}
+    return db.scoring_tasks.find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": "leased",
+                "lease_owner": worker_id,
+                "lease_expires_at": now + timedelta(seconds=LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("priority_rank", 1), ("created_at", 1)],
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def heartbeat(db, task: Dict, worker_id: str) -> bool:
+    """Extend the lease; False means it was lost (expired and taken by another worker)."""
+    res = db.scoring_tasks.update_one(
+        {"_id": task["_id"], "lease_owner": worker_id, "status": "leased"},
+        {"$set": {"lease_expires_at": datetime.utcnow() + timedelta(seconds=LEASE_SECONDS)}}
+    )
+    return res.modified_count == 1
+
+
+def _update_task(db, writes: Optional[WriteBatcher], filter: Dict, update: Dict):
+    if writes is None:
+        db.scoring_tasks.update_one(filter, update)
+    else:
+        writes.update("scoring_tasks", filter, update)
+
+
+def _finish(db, task: Dict, worker_id: str, fields: Dict, writes: Optional[WriteBatcher] = None):
+    _update_task(
+        db, writes,
+        {"_id": task["_id"], "lease_owner": worker_id, "status": "leased"},
+        {"$set": {**fields, "updated_at": datetime.utcnow()}, "$unset": {"active": "", "lease_expires_at": ""}}
+    )
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter, so requeued tasks don't all come back at once."""
+    delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def _requeue(db, task: Dict, worker_id: str, error: str, writes: Optional[WriteBatcher] = None):
+    now = datetime.utcnow()
+    _update_task(
+        db, writes,
+        {"_id": task["_id"], "lease_owner": worker_id, "status": "leased"},
+        {
+            "$set": {
+                "status": "queued",
+                "error": error,
+                "not_before": now + timedelta(seconds=retry_delay(task.get("attempts", 1))),
+                "updated_at": now
+            },
+            "$unset": {"lease_owner": "", "lease_expires_at": ""}
+        }
+    )
+
+
+def release(db, task: Dict, worker_id: str, error: str, writes: Optional[WriteBatcher] = None) -> bool:
+    """
+    Give back a leased task that could not be scored: requeued with backoff
+    while it has attempts left, failed after that. Returns True if requeued.
+    """
+    if task.get("attempts", 1) < MAX_ATTEMPTS:
+        _requeue(db, task, worker_id, error, writes)
+        return True
+    _finish(db, task, worker_id, {"status": "failed", "error": error}, writes)
+    return False
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, db, task, worker_id):
+        super().__init__(daemon=True)
+        self.db, self.task, self.worker_id = db, task, worker_id
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(LEASE_SECONDS / 3):
+            if not heartbeat(self.db, self.task, self.worker_id):
+                return
+
+
+def process_task(db, task: Dict, worker_id: str, priority: Optional[str] = None,
+                 writes: Optional[WriteBatcher] = None) -> Dict:
+    """
+    Score the task's pair while heartbeating its lease, then record the outcome.
+    Re-checks staleness first so a pair scored in the meantime costs no LLM call.
+    LLM calls run in the task's priority class (or `priority`, for a recruiter
+    waiting on the result) and are queued fairly per job.
+    With `writes`, the score and the task outcome are buffered in that batcher;
+    the task stays leased by this worker until they are flushed. A worker
+    whose lease was lost stops before its LLM calls and writes nothing.
+    """
+    job = db.jobs.find_one({"_id": task["job_id"]})
+    cv = db.cvs.find_one({"_id": task["cv_id"]}, {"extracted": 1, "extracted_hash": 1, "extraction": 1, "scoring": 1, "score": 1})
+    application = db.applications.find_one({"_id": task["application_id"]}) if task.get("application_id") else None
+    if not job or not cv or (task.get("application_id") and not application):
+        _finish(db, task, worker_id, {"status": "cancelled", "error": "Job, CV or association no longer exists"}, writes)
+        return {"cv_id": str(task["cv_id"]), "status": "cancelled"}
+
+    if not extraction_ready(job):
+        # Description edited after queueing: requirements are being re-extracted
+        _finish(db, task, worker_id, {"status": "cancelled", "error": "Job requirements are not extracted"}, writes)
+        return {"cv_id": str(task["cv_id"]), "status": "cancelled"}
+
+    if not needs_scoring(job, cv, task.get("threshold"), record=application):
+        _finish(db, task, worker_id, {"status": "done", "result": {"status": "already_scored"}}, writes)
+        return {"cv_id": str(cv["_id"]), "status": "already_scored"}
+
+    if writes is not None:
+        # Don't hold earlier outcomes (and their leases) through the LLM calls
+        writes.flush_due()
+    # Tag the scored document with this lease: once the task is taken over
+    # (lease expired), this worker's LLM calls and writes stop
+    lease = f"{worker_id}/{task['attempts']}"
+    target = db.applications if application else db.cvs
+    target.update_one({"_id": (application or cv)["_id"]}, {"$set": {"scoring_lease": lease}})
+    beat = _Heartbeat(db, task, worker_id)
+    beat.start()
+    try:
+        with llm_context(priority or task.get("priority", "normal"), tenant=f"job:{job['_id']}"):
+            result = score_cv(db, job, cv, task.get("threshold"), application, writes,
+                              lease=lease, lease_alive=lambda: heartbeat(db, task, worker_id))
+    except MatchingError as e:
+        # Provider outage: give the task back, another worker (or we) will retry later
+        _requeue(db, task, worker_id, str(e), writes)
+        raise
+    finally:
+        beat.stopped.set()
+
+    if result["status"] == "lease_lost":
+        return result  # the task belongs to another worker now
+    if result["status"] == "failed" and result.get("retryable") and task["attempts"] < MAX_ATTEMPTS:
+        _requeue(db, task, worker_id, result.get("error"), writes)
+        result = {**result, "requeued": True}
+    else:
+        _finish(db, task, worker_id, {"status": "failed" if result["status"] == "failed" else "done", "result": result}, writes)
+    return result
+
+
+def queue_stats(db, job_id=None) -> Dict:
+    match = {"job_id": job_id} if job_id is not None else {}
+    rows = db.scoring_tasks.aggregate([{"$match": match}, {"$group": {"_id": "$status", "n": {"$sum": 1}}}])
+    return {r["_id"]: r["n"] for r in rows}
@@ -0,0 +1,96 @@
+import os
+import time
+from typing import Dict, List, Optional
+
+from bson import ObjectId
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+BATCH_MAX_OPS = int(os.getenv("WRITE_BATCH_MAX_OPS", 500))
+BATCH_MAX_DELAY_SECONDS = float(os.getenv("WRITE_BATCH_MAX_DELAY_SECONDS", 1.0))
+
+
+class WriteResult:
+    """Outcome of one buffered write, known once its batch is flushed."""
+
+    def __init__(self, doc: Optional[Dict] = None):
+        self.doc = doc
+        self.error: Optional[str] = None
+        self.flushed = False
+
+    @property
+    def ok(self) -> bool:
+        return self.flushed and self.error is None
+
+
+class WriteBatcher:
+    """
+    Buffers inserts and updates and writes them as unordered `bulk_write`
+    batches, one round trip per collection, when `max_ops` writes are pending,
+    when the oldest one waited `max_delay` seconds, or on `flush()` (and on
+    leaving a `with` block).
+
+    Inserted documents get their `_id` client side, so the caller already has
+    the stored document and needs no read-back. A failing write (duplicate
+    key, validation, ...) only fails its own WriteResult.
+    """
+
+    def __init__(self, db, max_ops: int = BATCH_MAX_OPS, max_delay: float = BATCH_MAX_DELAY_SECONDS):
+        self.db = db
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self._pending: Dict[str, List[tuple]] = {}
+        self._count = 0
+        self._oldest = None
+        self.round_trips = 0
+        self.db_seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def insert(self, collection: str, doc: Dict) -> WriteResult:
+        doc.setdefault("_id", ObjectId())
+        return self._add(collection, InsertOne(doc), WriteResult(doc))
+
+    def update(self, collection: str, filter: Dict, update: Dict, upsert: bool = False) -> WriteResult:
+        return self._add(collection, UpdateOne(filter, update, upsert=upsert), WriteResult())
+
+    def _add(self, collection: str, op, result: WriteResult) -> WriteResult:
+        self._pending.setdefault(collection, []).append((op, result))
+        self._count += 1
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if self._count >= self.max_ops:
+            self.flush()
+        else:
+            self.flush_due()
+        return result
+
+    def flush_due(self):
+        """Flush if the oldest pending write waited `max_delay`; call before slow work."""
+        if self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, {}
+        self._count, self._oldest = 0, None
+        for collection, items in pending.items():
+            start = time.perf_counter()
+            try:
+                self.db[collection].bulk_write([op for op, _ in items], ordered=False)
+            except BulkWriteError as e:
+                # Unordered: every other write of the batch went through
+                for err in e.details.get("writeErrors", []):
+                    items[err["index"]][1].error = err.get("errmsg", "write failed")
+            except Exception as e:
+                for _, result in items:
+                    result.error = str(e)
+                raise
+            finally:
+                self.round_trips += 1
+                self.db_seconds += time.perf_counter() - start
+                for _, result in items:
+                    result.flushed = True
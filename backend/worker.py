@@ -0,0 +1,56 @@
+"""
+Standalone scoring worker. Run as many as needed, on as many machines as
+needed, against the same MongoDB:
+
+    python worker.py
+
+Each worker leases tasks from `scoring_tasks` one at a time, heartbeats the
+lease while the LLM calls run, and records the outcome. Tasks of a worker
+that dies are picked up by another one once their lease expires, until they
+reach SCORING_MAX_ATTEMPTS; a task that raises is given back at once.
+"""
+import os
+import time
+import traceback
+from dotenv import load_dotenv
+
+from db import init_db
+from services.matching import MatchingError
+from services.work_queue import claim, process_task, new_worker_id, release
+
+IDLE_SLEEP_SECONDS = float(os.getenv("WORKER_IDLE_SLEEP_SECONDS", 2))
+OUTAGE_SLEEP_SECONDS = float(os.getenv("WORKER_OUTAGE_SLEEP_SECONDS", 30))
+
+
+def main():
+    load_dotenv()
+    db = init_db()
+    worker_id = new_worker_id()
+    print(f"Scoring worker {worker_id} started")
+
+    while True:
+        task = claim(db, worker_id)
+        if not task:
+            time.sleep(IDLE_SLEEP_SECONDS)
+            continue
+        try:
+            result = process_task(db, task, worker_id)
+            print(f"task {task['_id']} cv {task['cv_id']}: {result['status']}")
+        except MatchingError as e:
+            print(f"task {task['_id']} requeued, provider unavailable: {e}")
+            time.sleep(OUTAGE_SLEEP_SECONDS)
+        except Exception as e:
+            # Database error or bug: give the task back now instead of holding
+            # its lease until it expires, and keep serving the queue
+            traceback.print_exc()
+            error = f"{type(e).__name__}: {e}"
+            try:
+                requeued = release(db, task, worker_id, error)
+                print(f"task {task['_id']} {'requeued' if requeued else 'failed'}: {error}")
+            except Exception:
+                traceback.print_exc()
+            time.sleep(IDLE_SLEEP_SECONDS)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 "use client"
 
+import type React from "react"
+
 import { useState, useEffect } from "react"
 import { Button } from "@/components/ui/button"
 import {
@@ -16,7 +18,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@
 import { Badge } from "@/components/ui/badge"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
 import { Sheet, SheetContent, SheetDescription, SheetHeader, SheetTitle, SheetTrigger } from "@/components/ui/sheet"
-import { Trash2, Upload, FileText, Eye, Info, GraduationCap, Briefcase, Code, Heart, Filter } from "lucide-react"
+import { Trash2, Upload, FileText, Eye, Info, GraduationCap, Briefcase, Code, Heart, Filter, Search } from "lucide-react"
 import { useToast } from "@/hooks/use-toast"
 import { useAuth } from "@/contexts/auth-context"
 
@@ -41,6 +43,43 @@ interface CV {
     soft_skills?: string[]
     error?: string
   }
+  extraction?: {
+    status: string
+    retryable?: boolean
+    error?: string | null
+  } | null
+  preview?: {
+    snippet: string | null
+    has_thumbnail: boolean
+  } | null
+  relevance?: number
+  snippets?: SearchSnippet[]
+}
+
+interface SearchSnippet {
+  field: string
+  text: string
+  highlights: [number, number][]
+  truncated: boolean
+}
+
+function HighlightedSnippet({ snippet }: { snippet: SearchSnippet }) {
+  const parts: React.ReactNode[] = []
+  let last = 0
+  snippet.highlights.forEach(([start, end], i) => {
+    parts.push(snippet.text.slice(last, start))
+    parts.push(<mark key={i}>{snippet.text.slice(start, end)}</mark>)
+    last = end
+  })
+  parts.push(snippet.text.slice(last))
+  return (
+    <div className="text-xs text-muted-foreground max-w-md">
+      <span className="font-medium">{snippet.field.replace("_", " ")}: </span>
+      {snippet.truncated ? "…" : ""}
+      {parts}
+      {snippet.truncated ? "…" : ""}
+    </div>
+  )
 }
 
 interface Job {
@@ -59,6 +98,7 @@ export function CVsManager() {
   const [selectedFiles, setSelectedFiles] = useState<FileList | null>(null)
   const [uploadDialogOpen, setUploadDialogOpen] = useState(false)
   const [filterJobId, setFilterJobId] = useState<string>("all")
+  const [searchQuery, setSearchQuery] = useState<string>("")
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false)
   const [cvToDelete, setCvToDelete] = useState<CV | null>(null)
   const [validationErrors, setValidationErrors] = useState<{ jobId?: boolean; files?: boolean }>({})
@@ -69,14 +109,20 @@ export function CVsManager() {
     fetchJobs()
   }, [])
 
-  const fetchCVs = async (jobId?: string) => {
+  const fetchCVs = async (jobId?: string, query: string = searchQuery) => {
     try {
-      const url = jobId && jobId !== "all" ? `${API_URL}/api/cvs/job/${jobId}` : `${API_URL}/api/cvs`
+      let url = jobId && jobId !== "all" ? `${API_URL}/api/cvs/job/${jobId}` : `${API_URL}/api/cvs`
+      if (query.trim()) {
+        const params = new URLSearchParams({ q: query.trim(), limit: "100" })
+        if (jobId && jobId !== "all") params.set("job_id", jobId)
+        url = `${API_URL}/api/cvs/search?${params}`
+      }
 
       const response = await fetch(url)
       if (response.ok) {
         const data = await response.json()
-        setCvs(data)
+        // Search results are paginated, best match first
+        setCvs(query.trim() ? data.items : data)
       } else {
         toast({
           title: "Error",
@@ -219,6 +265,12 @@ export function CVsManager() {
     fetchCVs(jobId === "all" ? undefined : jobId)
   }
 
+  const handleSearch = (e: React.FormEvent) => {
+    e.preventDefault()
+    setLoading(true)
+    fetchCVs(filterJobId === "all" ? undefined : filterJobId)
+  }
+
   const handleViewPDF = (cvId: string) => {
     window.open(`${API_URL}/api/cvs/${cvId}/file`, "_blank")
   }
@@ -319,6 +371,17 @@ export function CVsManager() {
             ))}
           </SelectContent>
         </Select>
+        <form onSubmit={handleSearch} className="flex items-center gap-2 ml-auto">
+          <Input
+            placeholder="Search skills, experience..."
+            value={searchQuery}
+            onChange={(e) => setSearchQuery(e.target.value)}
+            className="w-[260px]"
+          />
+          <Button type="submit" variant="outline" size="sm">
+            <Search className="h-4 w-4" />
+          </Button>
+        </form>
       </div>
 
       {cvs.length > 0 ? (
@@ -339,6 +402,10 @@ export function CVsManager() {
                   <TableCell>
                     <div className="space-y-1">
                       <div className="font-medium">{cv.extracted.name || cv.filename || `CV ${cv.id.slice(-6)}`}</div>
+                      {cv.snippets?.map((snippet, i) => <HighlightedSnippet key={i} snippet={snippet} />)}
+                      {!cv.snippets?.length && cv.preview?.snippet && (
+                        <div className="text-xs text-muted-foreground line-clamp-2 max-w-md">{cv.preview.snippet}</div>
+                      )}
                       <div className="flex items-center gap-2">
                         <Badge variant={cv.job_id ? "default" : "secondary"} className="text-xs">
                           {getJobName(cv.job_id)}
@@ -371,9 +438,17 @@ export function CVsManager() {
                             </SheetDescription>
                           </SheetHeader>
                           <div className="mt-6 space-y-6 pb-6">
-                            {cv.extracted.error ? (
+                            {cv.preview?.has_thumbnail && (
+                              <img
+                                src={`${API_URL}/api/cvs/${cv.id}/preview`}
+                                alt="First page of the CV"
+                                loading="lazy"
+                                className="w-40 border rounded"
+                              />
+                            )}
+                            {cv.extracted.error || cv.extraction?.status === "failed" ? (
                               <div className="p-4 bg-destructive/10 border border-destructive/20 rounded-lg">
-                                <p className="text-sm text-destructive">{cv.extracted.error}</p>
+                                <p className="text-sm text-destructive">{cv.extracted.error || cv.extraction?.error}</p>
                               </div>
                             ) : (
                               <>
@@ -405,8 +405,20 @@ export function JobsManager() {
                   <div className="flex items-center gap-2">
                     <Badge variant={job.status === "open" ? "default" : "secondary"}>{job.status}</Badge>
                     {job.extraction && (
-                      <Badge variant={job.extraction.status === "succeeded" ? "default" : "destructive"}>
-                        {job.extraction.status === "succeeded" ? "Extracted" : "Failed"}
+                      <Badge
+                        variant={
+                          job.extraction.status === "succeeded"
+                            ? "default"
+                            : job.extraction.status === "pending"
+                              ? "secondary"
+                              : "destructive"
+                        }
+                      >
+                        {job.extraction.status === "succeeded"
+                          ? "Extracted"
+                          : job.extraction.status === "pending"
+                            ? "Extracting..."
+                            : "Failed"}
                       </Badge>
                     )}
                   </div>
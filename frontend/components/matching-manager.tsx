@@ -27,10 +27,10 @@ interface CV {
   job_id: string
   score: number | null | undefined
   subscores: {
-    education: { score: number; short_justification: string }
-    experience: { score: number; short_justification: string }
-    soft_skills: { score: number; short_justification: string }
-    tech_skills: { score: number; short_justification: string }
+    education: { score: number; short_justification: string | null }
+    experience: { score: number; short_justification: string | null }
+    soft_skills: { score: number; short_justification: string | null }
+    tech_skills: { score: number; short_justification: string | null }
   } | null
   extracted: {
     name: string
@@ -170,6 +170,20 @@ export function MatchingManager() {
     }
   }
 
+  // Scores are computed without justifications; they are written on first view
+  const loadJustifications = async (cv: CV) => {
+    if (!cv.subscores || Object.values(cv.subscores).every((s) => s?.short_justification)) return
+
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/matchings/details/${selectedJobId}/${cv.id}`)
+      if (!response.ok) return
+      const data = await response.json()
+      setCvs((prev) => prev.map((c) => (c.id === cv.id ? { ...c, subscores: data.subscores } : c)))
+    } catch (error) {
+      console.error("Error loading score justifications:", error)
+    }
+  }
+
   const isEmptyObject = (obj: any) => {
     return obj && typeof obj === "object" && Object.keys(obj).length === 0
   }
@@ -249,7 +263,7 @@ export function MatchingManager() {
                     <TableCell>{new Date(cv.created_at).toLocaleDateString()}</TableCell>
                     <TableCell>{formatScore(cv.score)}</TableCell>
                     <TableCell>
-                      <Sheet>
+                      <Sheet onOpenChange={(open) => open && loadJustifications(cv)}>
                         <SheetTrigger asChild>
                           <Button variant="outline" size="sm">
                             <Eye className="h-4 w-4" />